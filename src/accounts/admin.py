@@ -1,7 +1,15 @@
 from django.contrib import admin
-from .models import CustomUser, Appointment, MedicalRecord  
+from .models import (CustomUser, Appointment, MedicalRecord, ArchivedAppointment, ArchivedMedicalRecord, UserPurge,
+                     RecordAccessLog, RequestProfile, SlowQuery)
 from django.contrib.auth.models import Group, Permission
 from django.contrib.auth.hashers import make_password
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+from .paginators import EstimatedCountPaginator
+from .purge import soft_delete_user
+from .search import matching
 
 class CustomUserAdmin(admin.ModelAdmin):
     list_display = ('full_name', 'email', 'role',  'created_at', 'updated_at')
@@ -25,6 +33,35 @@ class CustomUserAdmin(admin.ModelAdmin):
         }),
     )
     
+    # Autocomplete fields on appointments and records that only accept one role
+    AUTOCOMPLETE_ROLES = {
+        ('appointment', 'doctor'): 'doctor',
+        ('appointment', 'patient'): 'patient',
+        ('medicalrecord', 'doctor'): 'doctor',
+        ('medicalrecord', 'patient'): 'patient',
+    }
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        # Restrict autocomplete suggestions to the role the target field accepts
+        role = self.AUTOCOMPLETE_ROLES.get((request.GET.get('model_name'), request.GET.get('field_name')))
+        if role:
+            queryset = queryset.filter(role=role)
+        return queryset, may_have_duplicates
+
+    # Deleting a user is a soft delete: their appointments, records and files
+    # are removed in batches by the purge_users command (accounts.purge)
+    def get_deleted_objects(self, objs, request):
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        return [str(obj) for obj in objs], {self.opts.verbose_name_plural: len(objs)}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        soft_delete_user(obj, requested_by=request.user)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            soft_delete_user(user, requested_by=request.user)
+
     # To hash the password before saving it
     def save_model(self, request, obj, form, change):
         if form.cleaned_data.get('password'):
@@ -35,8 +72,15 @@ class CustomUserAdmin(admin.ModelAdmin):
 
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ('doctor', 'patient', 'scheduled_at', 'created_at', 'status')
+    list_select_related = ('doctor', 'patient')
     search_fields = ('doctor__full_name', 'patient__full_name')
-    list_filter = ('scheduled_at', 'doctor', 'patient')
+    list_filter = ('status',)
+    date_hierarchy = 'scheduled_at'
+    autocomplete_fields = ('doctor', 'patient')
+
+    # Avoid full-table COUNT(*) queries on large tables
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         ('Appointment Information', {
@@ -45,18 +89,36 @@ class AppointmentAdmin(admin.ModelAdmin):
         ,
     )
 
+    def get_queryset(self, request):
+        # Appointment.__str__ (used by record autocomplete results) shows doctor and patient
+        return super().get_queryset(request).select_related('doctor', 'patient')
+
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
-        # Filter the queryset for doctors and patients
+        # Filter the queryset for doctors and patients (the autocomplete widgets
+        # only render the selected option, so this just restricts validation)
         form.base_fields['doctor'].queryset = CustomUser.objects.filter(role='doctor')
         form.base_fields['patient'].queryset = CustomUser.objects.filter(role='patient')
         return form
 
 class MedicalRecordAdmin(admin.ModelAdmin):
     list_display = ('doctor', 'patient', 'appointment', 'diagnosis', 'created_at', 'updated_at')
-    search_fields = ('doctor__full_name', 'patient__full_name', 'diagnosis')
-    
-    list_filter = ('created_at', 'doctor', 'patient')
+    # Appointment.__str__ shows the appointment's doctor and patient
+    list_select_related = ('doctor', 'patient', 'appointment__doctor', 'appointment__patient')
+    search_fields = ('doctor__full_name', 'patient__full_name')
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ('doctor', 'patient', 'appointment')
+
+    # Avoid full-table COUNT(*) queries on large tables
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Record text is matched through the full-text index (accounts.search)
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            results |= matching(queryset, search_term)
+        return results, may_have_duplicates
 
     fieldsets = (
         ('Appointment Information', {
@@ -72,7 +134,8 @@ class MedicalRecordAdmin(admin.ModelAdmin):
 
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
-        # Filter the queryset for doctors and patients
+        # Filter the queryset for doctors and patients (the autocomplete widgets
+        # only render the selected option, so this just restricts validation)
         form.base_fields['doctor'].queryset = CustomUser.objects.filter(role='doctor')
         form.base_fields['patient'].queryset = CustomUser.objects.filter(role='patient')
         return form
@@ -84,9 +147,135 @@ class MedicalRecordAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+class ArchiveAdminMixin:
+    """Archived rows are written only by the archive_appointments command."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class ArchivedAppointmentAdmin(ArchiveAdminMixin, admin.ModelAdmin):
+    list_display = ('doctor', 'patient', 'scheduled_at', 'status', 'archived_at')
+    list_select_related = ('doctor', 'patient')
+    search_fields = ('doctor__full_name', 'patient__full_name')
+    list_filter = ('status',)
+    date_hierarchy = 'scheduled_at'
+
+class ArchivedMedicalRecordAdmin(ArchiveAdminMixin, admin.ModelAdmin):
+    list_display = ('doctor', 'patient', 'diagnosis', 'created_at', 'archived_at')
+    list_select_related = ('doctor', 'patient')
+    search_fields = ('doctor__full_name', 'patient__full_name', 'diagnosis')
+    date_hierarchy = 'created_at'
+
+class UserPurgeAdmin(admin.ModelAdmin):
+    """Progress of the purges of deleted users, written by the purge_users command."""
+    list_display = ('label', 'role', 'status', 'appointments_deleted', 'records_deleted', 'files_deleted',
+                    'created_at', 'finished_at')
+    list_filter = ('status', 'role')
+    search_fields = ('label',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class RecordAccessLogAdmin(admin.ModelAdmin):
+    """The record access audit log. Append-only: entries cannot be changed or deleted."""
+    list_display = ('accessed_at', 'user_id', 'action', 'patient_id', 'appointment_id', 'record_id', 'ip_address')
+    list_filter = ('action',)
+    search_fields = ('=patient_id', '=user_id')
+    date_hierarchy = 'accessed_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Requests profiled by accounts.profiling, with their profile and SQL queries for download."""
+    list_display = ('created_at', 'method', 'path', 'status_code', 'trigger', 'duration_ms', 'query_count', 'query_ms')
+    list_filter = ('trigger', 'method')
+    search_fields = ('path', 'view')
+    exclude = ('data', 'queries')
+    readonly_fields = ('downloads', 'query_list')
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/<str:kind>/', self.admin_site.admin_view(self.download),
+                 name='accounts_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download(self, request, pk, kind):
+        """The profile as a ``.prof`` file, or the SQL queries as JSON."""
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if kind == 'sql':
+            response = JsonResponse(profile.queries, safe=False, json_dumps_params={'indent': 2})
+            response['Content-Disposition'] = f'attachment; filename="profile-{pk}-sql.json"'
+            return response
+        response = HttpResponse(bytes(profile.data), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile-{pk}.prof"'
+        return response
+
+    @admin.display(description='Downloads')
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">Profile (.prof)</a> · <a href="{}">SQL queries (JSON)</a>',
+            reverse('admin:accounts_requestprofile_download', args=[obj.pk, 'prof']),
+            reverse('admin:accounts_requestprofile_download', args=[obj.pk, 'sql']),
+        )
+
+    @admin.display(description='SQL queries')
+    def query_list(self, obj):
+        return format_html('<ol>{}</ol>', format_html_join(
+            '', '<li>{} ms [{}] <code>{}</code></li>',
+            ((query['ms'], query['alias'], query['sql']) for query in obj.queries)))
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Slow SQL queries recorded by accounts.slow_queries; see also the slow_queries command."""
+    list_display = ('created_at', 'duration_ms', 'view', 'fingerprint', 'sql')
+    list_filter = ('alias',)
+    search_fields = ('=fingerprint', 'view', 'sql')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(Appointment, AppointmentAdmin)
 admin.site.register(CustomUser, CustomUserAdmin)
 admin.site.register(MedicalRecord, MedicalRecordAdmin)
+admin.site.register(ArchivedAppointment, ArchivedAppointmentAdmin)
+admin.site.register(ArchivedMedicalRecord, ArchivedMedicalRecordAdmin)
+admin.site.register(UserPurge, UserPurgeAdmin)
+admin.site.register(RecordAccessLog, RecordAccessLogAdmin)
+admin.site.register(RequestProfile, RequestProfileAdmin)
+admin.site.register(SlowQuery, SlowQueryAdmin)
 
 try:
     admin.site.unregister(Group)
@@ -0,0 +1,176 @@
+"""
+Doctor utilization, completion / cancellation / no-show rates and weekday x
+hour heatmaps for a period of appointments.
+
+The appointments of the period (live and archived) are fetched with a single
+indexed ``values_list`` query returning only the doctor, status and time. The
+columns are converted to NumPy arrays and every statistic, including the
+local weekday and hour of each appointment, is computed with vectorized
+binning (``np.unique`` / ``np.bincount``) instead of Python loops, so a period
+spanning years of appointments costs one query and a few array passes.
+Results are cached per period under the appointments cache version.
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .caching import get_version
+from .models import Appointment, ArchivedAppointment, CustomUser
+from .signals import APPOINTMENTS_VERSION
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+HOURS = 24
+
+# Status codes used in the arrays (the order of Appointment.STATUS_CHOICES)
+STATUS_CODES = {value: code for code, (value, _label) in enumerate(Appointment.STATUS_CHOICES)}
+
+DEFAULT_PERIOD_DAYS = 90
+CACHE_TIMEOUT = 60 * 60
+
+
+def default_period():
+    """The last ``DEFAULT_PERIOD_DAYS`` days, ending today."""
+    end = timezone.localdate()
+    return end - timedelta(days=DEFAULT_PERIOD_DAYS - 1), end
+
+
+def period_bounds(start, end):
+    """
+    The aware datetimes bounding the dates ``start`` to ``end`` (inclusive) in
+    the current time zone. Filtering on these instead of ``scheduled_at__date``
+    lets the database use the ``scheduled_at`` index.
+    """
+    return (timezone.make_aware(datetime.combine(start, time.min)),
+            timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+
+
+def fetch_appointment_columns(start, end):
+    """
+    Fetch ``(doctor_id, status, scheduled_at)`` for every live and archived
+    appointment scheduled between ``start`` and ``end`` (inclusive dates) with
+    one query, as NumPy arrays: doctor ids, status codes (``STATUS_CODES``)
+    and POSIX timestamps.
+    """
+    lower, upper = period_bounds(start, end)
+
+    def columns(model):
+        return (model.objects
+                .filter(scheduled_at__gte=lower, scheduled_at__lt=upper)
+                .values_list('doctor_id', 'status', 'scheduled_at')
+                .order_by())
+
+    rows = list(columns(Appointment).union(columns(ArchivedAppointment), all=True))
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.astype(np.int8), empty
+
+    doctor_ids, statuses, scheduled = zip(*rows)
+    return (np.asarray(doctor_ids, dtype=np.int64),
+            np.fromiter((STATUS_CODES[status] for status in statuses), dtype=np.int8, count=len(rows)),
+            np.fromiter((int(moment.timestamp()) for moment in scheduled), dtype=np.int64, count=len(rows)))
+
+
+def local_weekday_hour(timestamps):
+    """
+    Return the weekday (0 = Monday) and hour, in the current time zone, of an
+    array of POSIX timestamps.
+    """
+    tz = timezone.get_current_timezone()
+    # Offsets only change on whole UTC hours: look them up once per distinct hour
+    utc_hours, index = np.unique(timestamps // 3600, return_inverse=True)
+    offsets = np.fromiter(
+        (datetime.fromtimestamp(hour * 3600, tz).utcoffset().total_seconds() for hour in utc_hours.tolist()),
+        dtype=np.int64, count=len(utc_hours))
+    local = timestamps + offsets[index]
+    # 1970-01-01 was a Thursday (weekday 3)
+    return (local // 86400 + 3) % 7, (local % 86400) // 3600
+
+
+def _rate(counts, totals):
+    return np.divide(counts, totals, out=np.zeros(len(totals)), where=totals > 0)
+
+
+def compute_analytics(start, end):
+    """
+    Compute the analytics of the appointments scheduled between ``start`` and
+    ``end`` (inclusive dates). Returns a JSON-serializable dict.
+
+    A no-show is an appointment left ``overdue``. Utilization is the share of
+    the doctor's capacity (``settings.DOCTOR_DAILY_CAPACITY`` appointments per
+    working day) taken by appointments that were not cancelled.
+    """
+    doctor_ids, statuses, timestamps = fetch_appointment_columns(start, end)
+    weekdays, hours = local_weekday_hour(timestamps)
+    completed = statuses == STATUS_CODES['completed']
+    cancelled = statuses == STATUS_CODES['cancelled']
+    no_show = statuses == STATUS_CODES['overdue']
+
+    doctors, doctor_index = np.unique(doctor_ids, return_inverse=True)
+    totals = np.bincount(doctor_index, minlength=len(doctors))
+    completed_counts = np.bincount(doctor_index, weights=completed, minlength=len(doctors))
+    cancelled_counts = np.bincount(doctor_index, weights=cancelled, minlength=len(doctors))
+    no_show_counts = np.bincount(doctor_index, weights=no_show, minlength=len(doctors))
+
+    working_days = int(np.busday_count(start, end + timedelta(days=1)))
+    capacity = working_days * settings.DOCTOR_DAILY_CAPACITY
+    utilization = (totals - cancelled_counts) / capacity if capacity else np.zeros(len(doctors))
+
+    # Cell (weekday, hour) of the flattened 7 x 24 grid
+    cells = weekdays * HOURS + hours
+    heatmap = np.bincount(cells, minlength=len(WEEKDAYS) * HOURS).reshape(len(WEEKDAYS), HOURS)
+    no_show_heatmap = np.bincount(cells, weights=no_show, minlength=len(WEEKDAYS) * HOURS).reshape(len(WEEKDAYS), HOURS)
+
+    names = dict(CustomUser.objects.filter(pk__in=doctors.tolist()).values_list('pk', 'full_name'))
+    rows = zip(doctors.tolist(), totals.tolist(), completed_counts.tolist(), cancelled_counts.tolist(),
+               no_show_counts.tolist(), _rate(completed_counts, totals).tolist(),
+               _rate(cancelled_counts, totals).tolist(), _rate(no_show_counts, totals).tolist(),
+               utilization.tolist())
+    doctor_stats = [
+        {
+            'id': doctor_id,
+            'full_name': names.get(doctor_id),
+            'appointments': total,
+            'completed': int(completed_count),
+            'cancelled': int(cancelled_count),
+            'no_shows': int(no_show_count),
+            'completion_rate': round(completion_rate, 4),
+            'cancellation_rate': round(cancellation_rate, 4),
+            'no_show_rate': round(no_show_rate, 4),
+            'utilization': round(doctor_utilization, 4),
+        }
+        for (doctor_id, total, completed_count, cancelled_count, no_show_count,
+             completion_rate, cancellation_rate, no_show_rate, doctor_utilization) in rows
+    ]
+    doctor_stats.sort(key=lambda stats: stats['appointments'], reverse=True)
+
+    return {
+        'period': {'start': start.isoformat(), 'end': end.isoformat(), 'working_days': working_days},
+        'totals': {
+            'appointments': int(len(statuses)),
+            'completed': int(completed.sum()),
+            'cancelled': int(cancelled.sum()),
+            'no_shows': int(no_show.sum()),
+        },
+        'doctors': doctor_stats,
+        'heatmap': {
+            'weekdays': WEEKDAYS,
+            'appointments': heatmap.tolist(),
+            'no_shows': no_show_heatmap.astype(np.int64).tolist(),
+        },
+    }
+
+
+def get_analytics(start, end):
+    """
+    Return the analytics of the period, cached until an appointment changes.
+    """
+    version = get_version(APPOINTMENTS_VERSION)
+    cache_key = f'doctor_analytics_{start.isoformat()}_{end.isoformat()}_{version}'
+    data = cache.get(cache_key)
+    if data is None:
+        data = compute_analytics(start, end)
+        cache.set(cache_key, data, timeout=CACHE_TIMEOUT)
+    return data
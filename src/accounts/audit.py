@@ -0,0 +1,100 @@
+"""
+Access audit log: who viewed which patient's medical records, and when.
+
+Writing an audit row in every record view would add a write to each read.
+Instead, ``record_access()`` only appends the entry to an in-process buffer.
+The buffer is written to ``RecordAccessLog`` with a single bulk insert when
+a request finishes (after its response has been sent) and the buffer holds
+``settings.AUDIT_FLUSH_SIZE`` entries or its oldest entry is
+``settings.AUDIT_FLUSH_SECONDS`` old, and when the process exits.
+
+Entries are timestamped when the access happens, not when they are written.
+A process killed without running its exit handlers loses its unwritten
+entries, at most one flush's worth.
+
+Query the log with ``manage.py audit_log --patient <id>``.
+"""
+import atexit
+import threading
+import time
+from django.conf import settings
+from django.utils import timezone
+from .models import RecordAccessLog
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Entries kept for a later flush when writing them fails, in flushes' worth
+MAX_PENDING_FLUSHES = 10
+
+_lock = threading.Lock()
+_buffer = []
+_oldest = None
+
+
+def record_access(request, action, patient_id=None, appointment_id=None, record_id=None):
+    """Buffer an access to a patient's records by the user of ``request``."""
+    global _oldest
+    entry = RecordAccessLog(
+        user_id=request.user.pk,
+        patient_id=patient_id,
+        appointment_id=appointment_id,
+        record_id=record_id,
+        action=action,
+        ip_address=request.META.get('REMOTE_ADDR') or None,
+        accessed_at=timezone.now(),
+    )
+    with _lock:
+        if not _buffer:
+            _oldest = time.monotonic()
+        _buffer.append(entry)
+
+
+def pending():
+    """The number of buffered entries not yet written."""
+    return len(_buffer)
+
+
+def flush_due():
+    """Whether the buffer is full or old enough to be written."""
+    # Read both under the lock: a concurrent flush empties the buffer and resets _oldest
+    with _lock:
+        size, oldest = len(_buffer), _oldest
+    if not size or oldest is None:
+        return False
+    return size >= settings.AUDIT_FLUSH_SIZE or time.monotonic() - oldest >= settings.AUDIT_FLUSH_SECONDS
+
+
+def flush():
+    """Write the buffered entries in one bulk insert. Returns the number written."""
+    global _oldest
+    with _lock:
+        entries = _buffer[:]
+        _buffer.clear()
+        _oldest = None
+    if not entries:
+        return 0
+
+    try:
+        RecordAccessLog.objects.bulk_create(entries, batch_size=500)
+    except Exception as e:
+        logger.error(f"Error writing {len(entries)} access log entries: {e}")
+        with _lock:
+            # Put them back in front of the newer entries, within a bound
+            keep = settings.AUDIT_FLUSH_SIZE * MAX_PENDING_FLUSHES - len(_buffer)
+            if keep < len(entries):
+                logger.error(f"Dropping {len(entries) - max(keep, 0)} access log entries")
+            if keep > 0:
+                _buffer[:0] = entries[-keep:]
+                _oldest = time.monotonic()
+        return 0
+    return len(entries)
+
+
+def flush_if_due():
+    """Write the buffer if it is full or old enough."""
+    if flush_due():
+        flush()
+
+
+atexit.register(flush)
@@ -0,0 +1,51 @@
+"""
+Helpers for version-keyed caching.
+
+A version is a counter kept in the cache under a well-known key. Cached
+entries (querysets, template fragments) include the current version in their
+key, so bumping the counter invalidates every entry derived from it without
+having to know or delete the individual keys.
+"""
+import time
+from django.core.cache import cache
+
+
+def _version_key(name):
+    return f'version_{name}'
+
+
+def _initial_version():
+    # Seed from the clock so that a version key evicted from the cache never
+    # restarts at a value that older, still-cached entries were built with.
+    return int(time.time() * 1000)
+
+
+def get_version(name):
+    """Return the current version for ``name``, initialising it if needed."""
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Invalidate every cache entry built from the current version of ``name``."""
+    key = _version_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The key was missing or evicted; any fresh seed invalidates old entries.
+        cache.set(key, _initial_version(), timeout=None)
+        return cache.get(key)
+
+
+async def aget_version(name):
+    """Async variant of ``get_version`` for use in async views."""
+    key = _version_key(name)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, _initial_version(), timeout=None)
+        version = await cache.aget(key)
+    return version
@@ -0,0 +1,93 @@
+"""
+Response compression for the API and HTML pages.
+
+``CompressionMiddleware`` extends Django's ``GZipMiddleware`` with Brotli,
+used for API responses (JSON, MessagePack, NDJSON) when the client accepts
+``br`` and the ``brotli`` package is installed, and gzip otherwise. Streaming
+responses (sync and async) are compressed as they are streamed, so they are
+never buffered whole.
+
+Brotli is kept off HTML pages because of BREACH: pages embed secrets (the
+CSRF token) next to reflected input, and ``GZipMiddleware`` randomly pads
+the gzip output against length-based guessing where Brotli has no such
+mitigation. API responses carry no CSRF token and authenticate with a
+header, so Brotli is only used for them.
+
+Left uncompressed:
+* server-sent events (``text/event-stream``): a compressor in the way
+  delays or batches events, and a proxy buffering compressed streams would
+  hold them back;
+* content that is already compressed (ZIP exports, images, PDFs);
+* responses under 200 bytes, as with ``GZipMiddleware``.
+"""
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+SKIPPED_CONTENT_TYPES = ('text/event-stream', 'application/zip', 'application/pdf', 'image/', 'video/', 'audio/')
+
+# API formats, which may be Brotli-compressed; everything else gets gzip and its BREACH padding
+BROTLI_CONTENT_TYPES = ('application/json', 'application/msgpack', 'application/x-ndjson')
+
+# Brotli quality for complete and streamed responses (0-11; higher is much slower)
+BROTLI_QUALITY = 5
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+
+def brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def abrotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    async for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Compress API responses with Brotli or gzip, depending on the client's Accept-Encoding, and pages with gzip."""
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if content_type.startswith(SKIPPED_CONTENT_TYPES):
+            return response
+        accepts_brotli = brotli is not None and re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if not accepts_brotli or not content_type.startswith(BROTLI_CONTENT_TYPES) or response.has_header('Content-Encoding'):
+            return super().process_response(request, response)
+        if not response.streaming and len(response.content) < 200:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = abrotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = brotli_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(response.content))
+
+        # The compressed body differs byte for byte: the ETag can only be weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,120 @@
+"""
+Read-replica routing.
+
+Reads go to the replica (``settings.READ_REPLICA_ALIAS``) only inside
+``read_from_replica()`` blocks: read-only views opt in with
+``ReplicaReadMixin`` and background report jobs wrap their work in the
+context manager. All other reads, and every write, use the primary.
+
+After a client performs a write, its requests are pinned to the primary for
+``settings.REPLICA_PIN_SECONDS`` (tracked with a short-lived cookie rather
+than the session), so users always see their own writes despite replication lag.
+"""
+import contextvars
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+_pinned_to_primary = contextvars.ContextVar('pinned_to_primary', default=False)
+
+
+@contextmanager
+def read_from_replica():
+    """Route the reads made inside the block to the read replica, if one is configured."""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+@contextmanager
+def pinned_to_primary(pinned=True):
+    """Force the reads made inside the block to use the primary."""
+    token = _pinned_to_primary.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Database router sending opted-in reads to the read replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = settings.READ_REPLICA_ALIAS
+        if alias and _use_replica.get() and not _pinned_to_primary.get():
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives the schema through replication
+        if db == settings.READ_REPLICA_ALIAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    View mixin serving GET and HEAD requests from the read replica.
+
+    Template responses are rendered inside the replica block so that lazy
+    querysets evaluated by the template are routed there too.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        with read_from_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response.render()
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pin a client's reads to the primary for a few seconds after it writes.
+
+    Removed from the middleware chain when no read replica is configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.READ_REPLICA_ALIAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with pinned_to_primary(PIN_COOKIE in request.COOKIES):
+            response = self.get_response(request)
+        return self.pin_after_write(request, response)
+
+    async def __acall__(self, request):
+        with pinned_to_primary(PIN_COOKIE in request.COOKIES):
+            response = await self.get_response(request)
+        return self.pin_after_write(request, response)
+
+    def pin_after_write(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
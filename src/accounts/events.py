@@ -0,0 +1,159 @@
+"""
+Live appointment events for dashboards (server-sent events).
+
+When an appointment change commits, its outbox event (see ``accounts.outbox``)
+is published to the channel of the appointment's doctor and to the admins'
+channel. The async SSE view subscribes to those channels and pushes the
+events to open dashboards, so they update without polling.
+
+Two brokers are available, selected by ``settings.EVENT_BROKER``:
+
+* ``memory`` (default): an in-process broker. Events only reach clients
+  connected to the process that made the change, so it suits a single ASGI
+  worker (or development).
+* ``redis``: Redis pub/sub on ``settings.EVENT_REDIS_URL``, for several workers.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+import logging
+
+logger = logging.getLogger(__name__)
+
+ADMINS_CHANNEL = 'admins'
+
+# Events buffered per subscriber; a client this far behind misses events
+QUEUE_SIZE = 100
+
+
+def doctor_channel(doctor_id):
+    return f'doctor:{doctor_id}'
+
+
+def event_message(event):
+    """
+    The JSON message published for an appointment outbox event, given as a
+    dict with ``id``, ``action``, ``object_id``, ``doctor_id``, ``patient_id``
+    and ``payload``. A status change to ``cancelled`` is reported as a
+    ``cancelled`` event.
+    """
+    event_type = event['action']
+    if event_type == 'updated' and event['payload'].get('status') == 'cancelled':
+        event_type = 'cancelled'
+    return json.dumps({
+        'seq': event['id'],
+        'type': event_type,
+        'appointment_id': event['object_id'],
+        'doctor_id': event['doctor_id'],
+        'patient_id': event['patient_id'],
+        'appointment': event['payload'],
+    }, cls=DjangoJSONEncoder)
+
+
+class InMemoryBroker:
+    """Publishes to subscribers running on event loops of this process."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        # May be called from any thread: hand the message to each subscriber's loop
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, message)
+
+    @staticmethod
+    def _offer(queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Dropping live event for a slow subscriber")
+
+    @asynccontextmanager
+    async def subscribe(self, channels):
+        """Subscribe to ``channels``; yields an asyncio.Queue of messages."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                for channel in channels:
+                    self._subscribers[channel].discard(subscriber)
+                    if not self._subscribers[channel]:
+                        del self._subscribers[channel]
+
+
+class RedisBroker:
+    """Publishes through Redis pub/sub, reaching subscribers in every process."""
+
+    def __init__(self, url):
+        import redis
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        self.client.publish(channel, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channels):
+        """Subscribe to ``channels``; yields an asyncio.Queue of messages."""
+        import redis.asyncio
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(*channels)
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        pump = asyncio.ensure_future(self._pump(pubsub, queue))
+        try:
+            yield queue
+        finally:
+            pump.cancel()
+            await pubsub.aclose()
+            await client.aclose()
+
+    async def _pump(self, pubsub, queue):
+        async for message in pubsub.listen():
+            if message['type'] == 'message':
+                InMemoryBroker._offer(queue, message['data'].decode())
+
+
+_broker = None
+
+
+def get_broker():
+    """The process-wide broker configured by ``settings.EVENT_BROKER``."""
+    global _broker
+    if _broker is None:
+        if settings.EVENT_BROKER == 'redis':
+            _broker = RedisBroker(settings.EVENT_REDIS_URL)
+        else:
+            _broker = InMemoryBroker()
+    return _broker
+
+
+def publish_appointment_event(event):
+    """
+    Publish an appointment ``OutboxEvent`` to its doctor's and the admins'
+    channels. Called once the change has committed; never raises.
+    """
+    try:
+        message = event_message({
+            'id': event.pk, 'action': event.action, 'object_id': event.object_id,
+            'doctor_id': event.doctor_id, 'patient_id': event.patient_id, 'payload': event.payload,
+        })
+        broker = get_broker()
+        # Reassignment events name only the previous owners, maybe not a doctor
+        if event.doctor_id is not None:
+            broker.publish(doctor_channel(event.doctor_id), message)
+        broker.publish(ADMINS_CHANNEL, message)
+    except Exception as e:
+        # Dashboards catch up from the outbox when they reconnect
+        logger.error(f"Error publishing appointment event {event.pk}: {e}")
@@ -0,0 +1,190 @@
+"""
+Patient bundle export: a ZIP archive of a patient's chart, streamed.
+
+The archive holds ``appointments.csv`` and ``medical_records.csv`` (live and
+archived rows, oldest first), every report file under ``reports/`` and a
+``summary.json`` with the patient's details and counts. It is generated
+while it is sent: ``iter_patient_bundle()`` yields the compressed bytes as
+``zipfile`` produces them, so neither the archive nor a report file is ever
+held whole in memory or copied to disk, and a multi-gigabyte chart costs
+the same memory as a small one.
+
+Under ASGI, Django consumes a sync iterator whole before sending anything,
+so ASGI requests get ``patient_bundle()``, an async generator producing
+each chunk in a worker thread with ``sync_to_async``. Rows are read from the
+read replica in keyset batches; no database cursor or replica routing is
+held open between chunks.
+"""
+import csv
+import io
+import json
+import os
+import zipfile
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+from .db_routing import read_from_replica
+from .models import Appointment, ArchivedAppointment, ArchivedMedicalRecord, MedicalRecord
+import logging
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Bytes read from a report file at a time
+FILE_CHUNK_SIZE = 64 * 1024
+
+APPOINTMENT_COLUMNS = ['id', 'scheduled_at', 'status', 'doctor', 'notes', 'created_at', 'archived']
+RECORD_COLUMNS = ['id', 'appointment_id', 'created_at', 'doctor', 'diagnosis', 'treatment', 'notes',
+                  'report', 'archived']
+
+
+class _ZipStream:
+    """
+    A write-only file collecting what ``zipfile`` writes until it is drained.
+    Not seekable: ``zipfile`` then writes each entry's sizes after its data.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_rows(queryset, timestamp_field):
+    """
+    Yield the rows of ``queryset`` ordered by ``(timestamp_field, id)``, read
+    from the replica in keyset batches of ``BATCH_SIZE``.
+    """
+    queryset = queryset.order_by(timestamp_field, 'pk')
+    last = None
+    while True:
+        batch = queryset
+        if last is not None:
+            timestamp, pk = getattr(last, timestamp_field), last.pk
+            batch = batch.filter(Q(**{f'{timestamp_field}__gt': timestamp}) | Q(**{timestamp_field: timestamp, 'pk__gt': pk}))
+        with read_from_replica():
+            rows = list(batch[:BATCH_SIZE])
+        yield from rows
+        if len(rows) < BATCH_SIZE:
+            return
+        last = rows[-1]
+
+
+def report_name(record):
+    """The path of a record's report inside the archive."""
+    return f'reports/{record.pk}-{os.path.basename(record.report.name)}'
+
+
+def iter_patient_bundle(patient):
+    """Yield the bytes of the ZIP bundle of ``patient``'s chart."""
+    stream = _ZipStream()
+    for _ in _write_bundle(patient, stream):
+        data = stream.drain()
+        if data:
+            yield data
+    # The central directory, written when the archive is closed
+    yield stream.drain()
+
+
+async def patient_bundle(patient):
+    """Async variant of ``iter_patient_bundle``: each chunk is produced by one ``sync_to_async`` call."""
+    chunks = iter_patient_bundle(patient)
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+def _write_bundle(patient, stream):
+    """Write the bundle to ``stream``, yielding whenever it can be drained."""
+    counts = {'appointments': 0, 'medical_records': 0, 'reports': 0, 'missing_reports': 0}
+
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open('appointments.csv', 'w', force_zip64=True) as entry:
+            text = io.TextIOWrapper(entry, encoding='utf-8', newline='')
+            writer = csv.writer(text)
+            writer.writerow(APPOINTMENT_COLUMNS)
+            for model in (Appointment, ArchivedAppointment):
+                appointments = model.objects.filter(patient=patient).select_related('doctor')
+                for appointment in iter_rows(appointments, 'scheduled_at'):
+                    writer.writerow([appointment.pk, appointment.scheduled_at.isoformat(), appointment.status,
+                                     appointment.doctor.full_name, appointment.notes or '',
+                                     appointment.created_at.isoformat(), model is ArchivedAppointment])
+                    counts['appointments'] += 1
+                    if counts['appointments'] % BATCH_SIZE == 0:
+                        text.flush()
+                        yield
+            text.flush()
+            text.detach()
+        yield
+
+        with archive.open('medical_records.csv', 'w', force_zip64=True) as entry:
+            text = io.TextIOWrapper(entry, encoding='utf-8', newline='')
+            writer = csv.writer(text)
+            writer.writerow(RECORD_COLUMNS)
+            for model in (MedicalRecord, ArchivedMedicalRecord):
+                records = model.objects.filter(patient=patient).select_related('doctor')
+                for record in iter_rows(records, 'created_at'):
+                    writer.writerow([record.pk, record.appointment_id, record.created_at.isoformat(),
+                                     record.doctor.full_name, record.diagnosis, record.treatment,
+                                     record.notes or '', report_name(record) if record.report else '',
+                                     model is ArchivedMedicalRecord])
+                    counts['medical_records'] += 1
+                    if counts['medical_records'] % BATCH_SIZE == 0:
+                        text.flush()
+                        yield
+            text.flush()
+            text.detach()
+        yield
+
+        # A second pass over the records with a report copies the files
+        for model in (MedicalRecord, ArchivedMedicalRecord):
+            records = (model.objects.filter(patient=patient).exclude(report='').exclude(report__isnull=True)
+                       .only('pk', 'created_at', 'report'))
+            for record in iter_rows(records, 'created_at'):
+                try:
+                    record.report.open('rb')
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping missing report {record.report.name} of record {record.pk}: {e}")
+                    counts['missing_reports'] += 1
+                    continue
+                # Reports (PDFs, images) are already compressed: store them as is
+                info = zipfile.ZipInfo(report_name(record), timezone.localtime(record.created_at).timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                try:
+                    with archive.open(info, 'w', force_zip64=True) as entry:
+                        for chunk in record.report.chunks(FILE_CHUNK_SIZE):
+                            entry.write(chunk)
+                            yield
+                finally:
+                    record.report.close()
+                counts['reports'] += 1
+                yield
+
+        summary = {
+            'patient': {
+                'id': patient.pk,
+                'full_name': patient.full_name,
+                'email': patient.email,
+                'phone_number': patient.phone_number,
+                'date_of_birth': patient.date_of_birth,
+                'gender': patient.gender,
+            },
+            'exported_at': timezone.now(),
+            'counts': counts,
+        }
+        archive.writestr('summary.json', json.dumps(summary, cls=DjangoJSONEncoder, indent=2))
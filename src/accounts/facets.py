@@ -0,0 +1,35 @@
+"""
+Facet counts for list filters.
+
+The counts of every option of a filter (doctor specializations, patient
+genders, appointment statuses) come from one ``GROUP BY`` query per list,
+instead of one ``COUNT`` per option, and are cached under the version of the
+underlying model, so they stay valid until a row of that model changes.
+"""
+from django.core.cache import cache
+from django.db.models import Count
+from .caching import get_version
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def facet_counts(queryset, field, version_name, cache_key):
+    """
+    Return ``[{'value': ..., 'count': ...}]`` for each distinct non-empty value
+    of ``field`` among the rows of ``queryset``, ordered by value.
+
+    ``cache_key`` must identify the queryset's filters; the result is cached
+    under it and the current version of ``version_name``.
+    """
+    key = f'facets_{cache_key}_{field}_{get_version(version_name)}'
+    facets = cache.get(key)
+    if facets is None:
+        rows = (queryset
+                .exclude(**{f'{field}__isnull': True})
+                .exclude(**{field: ''})
+                .order_by(field)
+                .values_list(field)
+                .annotate(count=Count('pk')))
+        facets = [{'value': value, 'count': count} for value, count in rows]
+        cache.set(key, facets, timeout=CACHE_TIMEOUT)
+    return facets
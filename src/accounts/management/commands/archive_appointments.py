@@ -0,0 +1,91 @@
+"""
+Move completed and cancelled appointments older than the retention window,
+together with their medical records, from the hot tables to the archive tables.
+
+    python manage.py archive_appointments [--days 365] [--batch-size 500] [--pause 0]
+
+Rows are moved in batches of ``--batch-size`` appointments, each batch in its
+own short transaction (copy to the archive, then delete from the hot tables),
+so the command never holds long locks and can be interrupted and re-run at
+any point.
+
+A batch locks its appointments and their records (``SELECT ... FOR UPDATE``
+on PostgreSQL) before copying them: concurrent updates, and inserts of
+records, which lock the parent appointment through the foreign key, wait
+for the batch, so nothing changes between the copy and the delete. Only the
+copied records are deleted, and a batch whose appointments still have
+records afterwards is rolled back rather than deleting them uncopied.
+"""
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from ...models import Appointment, ArchivedAppointment, ArchivedMedicalRecord, MedicalRecord
+from ...outbox import ARCHIVED, deletes_recorded_as
+
+ARCHIVABLE_STATUSES = ('completed', 'cancelled')
+
+APPOINTMENT_FIELDS = ('id', 'doctor_id', 'patient_id', 'scheduled_at', 'status', 'notes', 'created_at', 'updated_at')
+RECORD_FIELDS = ('id', 'doctor_id', 'patient_id', 'appointment_id', 'diagnosis', 'treatment', 'notes', 'report',
+                 'created_at', 'updated_at')
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move one batch of archivable appointments and their records to the
+    archive tables. Returns ``(appointments, records)`` moved.
+    """
+    with transaction.atomic():
+        ids = list(Appointment.objects
+                   .select_for_update()
+                   .filter(status__in=ARCHIVABLE_STATUSES, scheduled_at__lt=cutoff)
+                   .order_by('pk')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return 0, 0
+
+        appointments = Appointment.objects.filter(pk__in=ids).values(*APPOINTMENT_FIELDS)
+        ArchivedAppointment.objects.bulk_create(ArchivedAppointment(**row) for row in appointments)
+        records = MedicalRecord.objects.select_for_update().filter(appointment_id__in=ids).values(*RECORD_FIELDS)
+        archived_records = ArchivedMedicalRecord.objects.bulk_create(ArchivedMedicalRecord(**row) for row in records)
+
+        # The outbox receivers record these deletions as 'archived' events
+        with deletes_recorded_as(ARCHIVED):
+            MedicalRecord.objects.filter(pk__in=[record.pk for record in archived_records]).delete()
+            # Deleting the appointments would cascade to records that were not copied
+            if MedicalRecord.objects.filter(appointment_id__in=ids).exists():
+                raise CommandError('Medical records were added to appointments being archived; run the command again.')
+            Appointment.objects.filter(pk__in=ids).delete()
+    return len(ids), len(archived_records)
+
+
+class Command(BaseCommand):
+    help = 'Move old completed and cancelled appointments and their medical records to the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.APPOINTMENT_ARCHIVE_DAYS,
+                            help='archive appointments scheduled more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=500, help='appointments moved per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must be >= 0 and --batch-size must be >= 1.')
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        total_appointments = total_records = 0
+        while True:
+            appointments, records = archive_batch(cutoff, options['batch_size'])
+            if not appointments:
+                break
+            total_appointments += appointments
+            total_records += records
+            self.stdout.write(f'Archived {total_appointments} appointments, {total_records} records...')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {total_appointments} appointments and {total_records} medical records '
+            f'scheduled before {cutoff:%Y-%m-%d}.'))
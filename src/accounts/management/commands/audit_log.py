@@ -0,0 +1,69 @@
+"""
+List who accessed a patient's medical records.
+
+    python manage.py audit_log --patient ID [--user ID] [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--csv]
+
+Reads ``RecordAccessLog`` (see ``accounts.audit``), oldest first. ``--since``
+and ``--until`` are inclusive days in the site's time zone. Accesses made in
+the last ``AUDIT_FLUSH_SECONDS`` may still be buffered by the web processes.
+"""
+import csv
+from datetime import datetime, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from ...models import CustomUser, RecordAccessLog
+
+COLUMNS = ['accessed_at', 'user_id', 'user', 'action', 'patient_id', 'appointment_id', 'record_id', 'ip_address']
+
+
+class Command(BaseCommand):
+    help = "List the accesses to a patient's medical records, by date."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patient', type=int, help='id of the patient whose records were accessed')
+        parser.add_argument('--user', type=int, help='id of the user who accessed them')
+        parser.add_argument('--since', help='first day (YYYY-MM-DD)')
+        parser.add_argument('--until', help='last day (YYYY-MM-DD)')
+        parser.add_argument('--csv', action='store_true', help='write CSV instead of a table')
+
+    def start_of_day(self, value, option):
+        day = parse_date(value) if value else None
+        if day is None:
+            raise CommandError(f'--{option} must be a date (YYYY-MM-DD).')
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def handle(self, *args, **options):
+        if options['patient'] is None and options['user'] is None:
+            raise CommandError('Give --patient, --user or both.')
+
+        entries = RecordAccessLog.objects.order_by('accessed_at', 'pk')
+        if options['patient'] is not None:
+            entries = entries.filter(patient_id=options['patient'])
+        if options['user'] is not None:
+            entries = entries.filter(user_id=options['user'])
+        if options['since']:
+            entries = entries.filter(accessed_at__gte=self.start_of_day(options['since'], 'since'))
+        if options['until']:
+            entries = entries.filter(accessed_at__lt=self.start_of_day(options['until'], 'until') + timedelta(days=1))
+
+        entries = list(entries)
+        # Users may since have been deleted; their accesses are still listed
+        users = CustomUser.all_objects.only('username', 'full_name').in_bulk({entry.user_id for entry in entries})
+
+        rows = []
+        for entry in entries:
+            user = users.get(entry.user_id)
+            rows.append([timezone.localtime(entry.accessed_at).isoformat(timespec='seconds'), entry.user_id,
+                         (user.full_name or user.username or '') if user else '(deleted)', entry.action,
+                         entry.patient_id, entry.appointment_id or '', entry.record_id or '', entry.ip_address or ''])
+
+        if options['csv']:
+            writer = csv.writer(self.stdout)
+            writer.writerow(COLUMNS)
+            writer.writerows(rows)
+            return
+
+        for row in rows:
+            self.stdout.write('  '.join(str(value) for value in row))
+        self.stdout.write(self.style.SUCCESS(f'{len(rows)} accesses.'))
@@ -0,0 +1,41 @@
+"""
+Generate the OpenAPI schema served by the API docs.
+
+    python manage.py build_openapi_schema [--output-dir DIR]
+
+Run at build or deploy time, with drf_yasg installed. Writes ``schema.json``
+and ``schema.yaml`` to ``settings.OPENAPI_SCHEMA_DIR``; each file is replaced
+atomically, so workers never serve a partly written schema.
+"""
+import os
+import tempfile
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from hospital_management_system.api_docs import SCHEMA_FORMATS, encode_schema, generate_schema, schema_etag
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema (JSON and YAML) served at /swagger/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=settings.OPENAPI_SCHEMA_DIR,
+                            help='directory the schema files are written to')
+
+    def handle(self, *args, **options):
+        if not apps.is_installed('drf_yasg'):
+            raise CommandError("drf_yasg must be in INSTALLED_APPS to generate the schema "
+                               "(use the development settings).")
+
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        schema = generate_schema()
+        for fmt in SCHEMA_FORMATS:
+            content = encode_schema(schema, fmt)
+            with tempfile.NamedTemporaryFile(dir=output_dir, suffix=f'.{fmt}', delete=False) as schema_file:
+                schema_file.write(content)
+            os.chmod(schema_file.name, 0o644)
+            os.replace(schema_file.name, os.path.join(output_dir, f'schema.{fmt}'))
+            self.stdout.write(f'Wrote schema.{fmt} (version {schema_etag(content)}).')
+
+        self.stdout.write(self.style.SUCCESS(f'OpenAPI schema written to {output_dir}.'))
@@ -0,0 +1,186 @@
+"""
+Bulk-create doctors and patients from a CSV file.
+
+    python manage.py import_users users.csv [--role patient] [--batch-size 1000] [--workers 4]
+
+The CSV header names the fields of ``DoctorProfileForm`` / ``PatientProfileForm``
+(``full_name``, ``username``, ``email``, ``password``, ``phone_number``,
+``date_of_birth``, ``gender`` and, for doctors, ``specialization``), plus an
+optional ``role`` column overriding ``--role`` per row.
+
+The file is streamed: rows are validated with the profile forms as they are
+read and collected into batches. For each batch, usernames and emails are
+checked against the database with one query, passwords are hashed in a process
+pool (hashing dominates the cost of creating a user), and the users are
+inserted with a single ``bulk_create``. Invalid rows are reported with their
+line number and skipped; the rest of the file is still imported.
+"""
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from ...caching import bump_version
+from ...forms import DoctorProfileForm, PatientProfileForm
+from ...models import CustomUser
+from ...signals import USERS_VERSION
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLE_FORMS = {
+    'doctor': DoctorProfileForm,
+    'patient': PatientProfileForm,
+}
+
+
+def _import_form(form_class):
+    """
+    Return a subclass of ``form_class`` that skips the per-row uniqueness
+    queries; uniqueness is checked for a whole batch at once instead.
+    """
+    return type(f'Import{form_class.__name__}', (form_class,), {'validate_unique': lambda self: None})
+
+
+IMPORT_FORMS = {role: _import_form(form_class) for role, form_class in ROLE_FORMS.items()}
+
+
+def _init_worker():
+    # Worker processes need configured settings to pick the password hasher
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_management_system.settings')
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Import doctors and patients from a CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='path of the CSV file to import')
+        parser.add_argument('--role', choices=sorted(ROLE_FORMS),
+                            help='role of the imported users, unless the CSV has a role column')
+        parser.add_argument('--batch-size', type=int, default=1000, help='users inserted per batch')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='password hashing processes (1 hashes in this process)')
+        parser.add_argument('--dry-run', action='store_true', help='validate the file without creating users')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be >= 1.')
+
+        self.dry_run = options['dry_run']
+        self.workers = options['workers']
+        self.created = self.failed = 0
+        self.seen_usernames, self.seen_emails = set(), set()
+
+        pool = None
+        if options['workers'] > 1 and not self.dry_run:
+            pool = ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker)
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as csv_file:
+                batch = []
+                for line, user in self.read_users(csv.DictReader(csv_file), options['role']):
+                    batch.append((line, user))
+                    if len(batch) >= options['batch_size']:
+                        self.import_batch(batch, pool)
+                        batch = []
+                if batch:
+                    self.import_batch(batch, pool)
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["csv_file"]}: {e}')
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if self.created and not self.dry_run:
+                # bulk_create sends no post_save signals, so invalidate cached user reads here
+                try:
+                    bump_version(USERS_VERSION)
+                except Exception as e:
+                    logger.error(f"Error invalidating user caches: {e}")
+
+        action = 'Validated' if self.dry_run else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f'{action} {self.created} users, {self.failed} rows failed.'))
+
+    def report_error(self, line, message):
+        self.failed += 1
+        self.stderr.write(f'Line {line}: {message}')
+
+    def read_users(self, reader, default_role):
+        """
+        Validate the CSV rows, yielding ``(line, user)`` for each valid row.
+        The users' ``password`` still holds the raw password.
+        """
+        for row in reader:
+            line = reader.line_num
+            role = (row.pop('role', None) or default_role or '').strip()
+            if role not in IMPORT_FORMS:
+                self.report_error(line, f'unknown role "{role}"' if role else 'no role given')
+                continue
+
+            form = IMPORT_FORMS[role](data=row)
+            if not form.is_valid():
+                errors = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in form.errors.items())
+                self.report_error(line, errors)
+                continue
+
+            user = form.instance
+            user.role = role
+            # Duplicates within the file; duplicates of existing users are checked per batch
+            if user.username and user.username in self.seen_usernames:
+                self.report_error(line, f'username "{user.username}" appears more than once in the file')
+                continue
+            if user.email in self.seen_emails:
+                self.report_error(line, f'email "{user.email}" appears more than once in the file')
+                continue
+            if user.username:
+                self.seen_usernames.add(user.username)
+            self.seen_emails.add(user.email)
+            yield line, user
+
+    def import_batch(self, batch, pool):
+        usernames = [user.username for _, user in batch if user.username]
+        emails = [user.email for _, user in batch]
+        existing = CustomUser.objects.filter(username__in=usernames) | CustomUser.objects.filter(email__in=emails)
+        taken_usernames, taken_emails = set(), set()
+        for username, email in existing.values_list('username', 'email'):
+            # Users without a username must not make every username-less row a duplicate
+            if username:
+                taken_usernames.add(username)
+            taken_emails.add(email)
+
+        users = []
+        for line, user in batch:
+            if user.username in taken_usernames:
+                self.report_error(line, f'a user with username "{user.username}" already exists')
+            elif user.email in taken_emails:
+                self.report_error(line, f'a user with email "{user.email}" already exists')
+            else:
+                users.append((line, user))
+
+        if self.dry_run:
+            self.created += len(users)
+            return
+
+        passwords = [user.password for _, user in users]
+        if pool is None:
+            hashes = map(make_password, passwords)
+        else:
+            hashes = pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (self.workers * 4)))
+        for (_, user), password in zip(users, hashes):
+            user.password = password
+
+        try:
+            with transaction.atomic():
+                CustomUser.objects.bulk_create([user for _, user in users])
+            self.created += len(users)
+        except IntegrityError:
+            # Rows created concurrently by someone else: insert one by one to find them
+            for line, user in users:
+                try:
+                    with transaction.atomic():
+                        user.save(force_insert=True)
+                    self.created += 1
+                except IntegrityError as e:
+                    self.report_error(line, f'could not be created: {e}')
+        self.stdout.write(f'{self.created} users imported...')
@@ -0,0 +1,35 @@
+"""
+Mark pending appointments whose scheduled time has passed as overdue.
+
+    python manage.py mark_overdue [--batch-size 500]
+
+Runs one indexed ``UPDATE`` per batch of ``--batch-size`` appointments, each
+batch in its own transaction (see ``AppointmentQuerySet.mark_overdue``);
+schedule it every few minutes, e.g. with cron.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from ...caching import bump_version
+from ...models import Appointment
+from ...signals import APPOINTMENTS_VERSION
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Mark past-due pending appointments as overdue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='appointments marked per transaction')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be >= 1.')
+        marked = Appointment.objects.mark_overdue(batch_size=options['batch_size'])
+        if marked:
+            # update() sends no post_save signals, so invalidate cached reads here
+            try:
+                bump_version(APPOINTMENTS_VERSION)
+            except Exception as e:
+                logger.error(f"Error invalidating appointment caches: {e}")
+        self.stdout.write(self.style.SUCCESS(f'Marked {marked} appointments as overdue.'))
@@ -0,0 +1,50 @@
+"""
+Delete change feed events older than the retention window.
+
+    python manage.py prune_outbox [--days 7] [--batch-size 5000]
+
+Events are deleted in sequence order, in batches, and the run is recorded in
+``OutboxPrune`` so the change feed can tell consumers that fell behind to resync.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from ...models import OutboxEvent, OutboxPrune
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed (outbox) events older than the retention window.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.OUTBOX_RETENTION_DAYS,
+                            help='keep events from the last DAYS days')
+        parser.add_argument('--batch-size', type=int, default=5000, help='events deleted per transaction')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must be >= 0 and --batch-size must be >= 1.')
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        through = OutboxEvent.objects.filter(created_at__lt=cutoff).aggregate(seq=Max('pk'))['seq']
+        if through is None:
+            self.stdout.write('No events to prune.')
+            return
+
+        # Record the horizon first: consumers are told to resync as soon as deletion starts
+        prune = OutboxPrune.objects.create(pruned_through=through, deleted=0)
+        while True:
+            with transaction.atomic():
+                # Events get their sequence number and created_at in commit order, so every event
+                # up to `through` is older than the cutoff; filtering on both keeps that explicit
+                ids = list(OutboxEvent.objects.filter(pk__lte=through, created_at__lt=cutoff).order_by('pk')
+                           .values_list('pk', flat=True)[:options['batch_size']])
+                if not ids:
+                    break
+                deleted, _ = OutboxEvent.objects.filter(pk__in=ids).delete()
+            prune.deleted += deleted
+        prune.save(update_fields=['deleted'])
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {prune.deleted} events up to #{through}.'))
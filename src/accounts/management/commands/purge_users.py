@@ -0,0 +1,51 @@
+"""
+Remove the data of soft-deleted doctors and patients.
+
+    python manage.py purge_users [--batch-size 500] [--pause 0]
+
+Works through the queued ``UserPurge`` jobs (see ``accounts.purge``),
+deleting each user's medical records, appointments and report files in
+batches of one short transaction each, then the user. Interrupted and failed
+jobs are resumed on the next run. Run it from a single scheduler.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from ...models import UserPurge
+from ...purge import DEFAULT_BATCH_SIZE, purge_user
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Delete the appointments, records, files and rows of soft-deleted users in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='rows deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['pause'] < 0:
+            raise CommandError('--batch-size must be >= 1 and --pause must be >= 0.')
+
+        jobs = UserPurge.objects.exclude(status=UserPurge.DONE).order_by('pk')
+        if not jobs:
+            self.stdout.write('No users to purge.')
+            return
+
+        failed = 0
+        for job in jobs:
+            try:
+                purge_user(job, options['batch_size'], options['pause'])
+            except Exception as e:
+                logger.error(f"Error purging user {job.user_id} (job {job.pk}): {e}")
+                job.status = UserPurge.FAILED
+                job.error = str(e)
+                job.save(update_fields=['status', 'error'])
+                failed += 1
+                continue
+            self.stdout.write(f'Purged {job}: {job.appointments_deleted} appointments, '
+                              f'{job.records_deleted} records, {job.files_deleted} files.')
+
+        if failed:
+            raise CommandError(f'{failed} purge jobs failed; they are retried on the next run.')
+        self.stdout.write(self.style.SUCCESS('Purge complete.'))
@@ -0,0 +1,24 @@
+"""
+Recreate the medical record search index and reindex every record.
+
+    python manage.py rebuild_record_search
+
+Needed on SQLite after a migration that alters ``MedicalRecord``: Django
+rebuilds the table to alter it, which drops the triggers keeping the index
+in sync (see ``accounts.search``).
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+from ...models import MedicalRecord
+from ...search import create_search_index, drop_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recreate the medical record full-text search index.'
+
+    def handle(self, *args, **options):
+        with connection.schema_editor() as schema_editor:
+            drop_search_index(schema_editor, MedicalRecord)
+            create_search_index(schema_editor, MedicalRecord)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the search index of {MedicalRecord.objects.count()} records.'))
@@ -0,0 +1,72 @@
+"""
+Report the slowest query shapes recorded by the slow query log.
+
+    python manage.py slow_queries [--days 7] [--limit 20] [--view NAME] [--prune]
+
+Occurrences are grouped by fingerprint (see ``accounts.slow_queries``) and
+ranked by total time, each with the views and code locations that ran it
+and its ``EXPLAIN`` plan: a full scan ("SCAN <table>" on SQLite, "Seq Scan"
+on PostgreSQL) on a large table usually means a missing index. ``--prune``
+deletes the occurrences older than the report window.
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Avg, Count, Max, Sum
+from django.utils import timezone
+from ...models import SlowQuery
+
+# Views and locations listed per query shape
+EXAMPLES = 3
+
+
+class Command(BaseCommand):
+    help = 'Report the slowest SQL query shapes, with their callers and EXPLAIN plans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='report the last DAYS days')
+        parser.add_argument('--limit', type=int, default=20, help='number of query shapes reported')
+        parser.add_argument('--view', help='only queries run by this view (URL name)')
+        parser.add_argument('--prune', action='store_true', help='delete the occurrences older than --days')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['limit'] < 1:
+            raise CommandError('--days and --limit must be >= 1.')
+
+        since = timezone.now() - timedelta(days=options['days'])
+        if options['prune']:
+            deleted, _ = SlowQuery.objects.filter(created_at__lt=since).delete()
+            self.stdout.write(f'Deleted {deleted} slow queries older than {options["days"]} days.')
+
+        occurrences = SlowQuery.objects.filter(created_at__gte=since)
+        if options['view']:
+            occurrences = occurrences.filter(view=options['view'])
+        shapes = (occurrences.values('fingerprint')
+                  .annotate(count=Count('pk'), total=Sum('duration_ms'), average=Avg('duration_ms'),
+                            worst=Max('duration_ms'), last_seen=Max('created_at'))
+                  .order_by('-total')[:options['limit']])
+        if not shapes:
+            self.stdout.write('No slow queries recorded.')
+            return
+
+        for rank, shape in enumerate(shapes, start=1):
+            latest = occurrences.filter(fingerprint=shape['fingerprint']).latest('created_at')
+            views = (occurrences.filter(fingerprint=shape['fingerprint']).values('view')
+                     .annotate(count=Count('pk')).order_by('-count')[:EXAMPLES])
+            locations = (occurrences.filter(fingerprint=shape['fingerprint']).exclude(location='')
+                         .values_list('location', flat=True).distinct()[:EXAMPLES])
+            plan = (SlowQuery.objects.filter(fingerprint=shape['fingerprint']).exclude(plan='')
+                    .values_list('plan', flat=True).first())
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'#{rank} {shape["fingerprint"]}: {shape["count"]} times, {shape["total"]:.0f} ms total, '
+                f'{shape["average"]:.0f} ms average, {shape["worst"]:.0f} ms worst, '
+                f'last {timezone.localtime(shape["last_seen"]):%Y-%m-%d %H:%M}'))
+            self.stdout.write(f'  SQL: {latest.sql}')
+            self.stdout.write('  Views: ' + ', '.join(f'{view["view"]} ({view["count"]})' for view in views))
+            for location in locations:
+                self.stdout.write(f'  At: {location}')
+            if plan:
+                self.stdout.write('  Plan:')
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+            self.stdout.write('')
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-19 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_archive_tables'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('overdue', 'Overdue'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='pending', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='archivedappointment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('overdue', 'Overdue'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'scheduled_at'], name='appt_status_scheduled_idx'),
+        ),
+    ]
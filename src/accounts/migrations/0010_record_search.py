@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from accounts.search import create_search_index, drop_search_index
+
+
+def create_index(apps, schema_editor):
+    create_search_index(schema_editor, apps.get_model('accounts', 'MedicalRecord'))
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor, apps.get_model('accounts', 'MedicalRecord'))
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text search index of the medical records: an FTS5 table kept in sync
+    by triggers on SQLite, a GIN tsvector index on PostgreSQL (see accounts.search).
+    """
+
+    dependencies = [
+        ('accounts', '0009_outbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
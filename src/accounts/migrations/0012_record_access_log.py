@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_user_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordAccessLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('patient_id', models.BigIntegerField(blank=True, null=True)),
+                ('appointment_id', models.BigIntegerField(blank=True, null=True)),
+                ('record_id', models.BigIntegerField(blank=True, null=True)),
+                ('action', models.CharField(choices=[('list', 'Viewed record list'), ('edit_form', 'Opened record form')], max_length=10)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('accessed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient_id', 'accessed_at'], name='access_patient_idx'), models.Index(fields=['user_id', 'accessed_at'], name='access_user_idx')],
+            },
+        ),
+    ]
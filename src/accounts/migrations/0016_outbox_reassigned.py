@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboxevent',
+            name='outbox_doctor_removed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='outboxevent',
+            name='outbox_patient_removed_idx',
+        ),
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='action',
+            field=models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted'), ('archived', 'Archived'), ('reassigned', 'Reassigned')], max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(condition=models.Q(('action__in', ['deleted', 'archived', 'reassigned'])), fields=['doctor_id', 'id'], name='outbox_doctor_removed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(condition=models.Q(('action__in', ['deleted', 'archived', 'reassigned'])), fields=['patient_id', 'id'], name='outbox_patient_removed_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_outbox_reassigned'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_doctor_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appt_patient_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='medicalrecord',
+            name='record_doctor_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='medicalrecord',
+            name='record_patient_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='outboxevent',
+            name='outbox_doctor_removed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='outboxevent',
+            name='outbox_patient_removed_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'id'], name='appt_doctor_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'id'], name='appt_patient_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['doctor', 'id'], name='record_doctor_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['patient', 'id'], name='record_patient_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['doctor_id', 'id'], name='outbox_doctor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['patient_id', 'id'], name='outbox_patient_idx'),
+        ),
+    ]
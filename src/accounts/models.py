@@ -1,8 +1,17 @@
-from time import timezone
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, router, transaction
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.utils.translation import gettext_lazy as _
 
+class ActiveUserManager(UserManager):
+    """Users that are not soft-deleted (awaiting purge, see ``accounts.purge``)."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
         ('admin', 'Admin'),
@@ -23,6 +32,17 @@ class CustomUser(AbstractUser):
     gender = models.CharField(max_length=100, choices=GENDERS, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the user is deleted; the row is removed by ``purge_users``
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    objects = ActiveUserManager()
+    all_objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Role-scoped name lookups (admin autocomplete, list pages)
+            models.Index(fields=['role', 'full_name'], name='user_role_name_idx'),
+        ]
 
     def is_admin(self):
         return self.role == 'admin'
@@ -34,9 +54,41 @@ class CustomUser(AbstractUser):
         return self.role == 'patient'
     
 
+class AppointmentQuerySet(models.QuerySet):
+
+    def past_due(self, now=None):
+        """Pending appointments whose scheduled time has passed."""
+        return self.filter(status='pending', scheduled_at__lt=now or timezone.now())
+
+    def mark_overdue(self, now=None, batch_size=500):
+        """
+        Mark past-due pending appointments as overdue and return the number
+        marked. Works in pk order through batches of ``batch_size``, each in
+        its own short transaction: one locking read of the batch, one UPDATE
+        and one bulk INSERT of its outbox events. Memory, lock time and the
+        ``IN`` list stay bounded however large the backlog. Like every
+        ``update()``, this sends no ``post_save`` signals.
+        """
+        now = now or timezone.now()
+        marked, last_pk = 0, 0
+        while True:
+            with transaction.atomic():
+                rows = list(self.past_due(now).filter(pk__gt=last_pk).order_by('pk').select_for_update()
+                            .values(*OutboxEvent.PAYLOAD_FIELDS['appointment'])[:batch_size])
+                if not rows:
+                    return marked
+                marked += self.filter(pk__in=[row['id'] for row in rows]).update(status='overdue', updated_at=now)
+                OutboxEvent.objects.bulk_create(
+                    OutboxEvent.for_row('appointment', {**row, 'status': 'overdue', 'updated_at': now}, 'updated')
+                    for row in rows
+                )
+            last_pk = rows[-1]['id']
+
+
 class Appointment(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('overdue', 'Overdue'),
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
@@ -49,12 +101,39 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AppointmentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset scans for the patient timeline (newest first)
+            models.Index(fields=['patient', '-scheduled_at', '-id'], name='appt_patient_timeline_idx'),
+            # Admin date hierarchy
+            models.Index(fields=['scheduled_at'], name='appt_scheduled_idx'),
+            # Overdue sweep and per-status dashboard counts
+            models.Index(fields=['status', 'scheduled_at'], name='appt_status_scheduled_idx'),
+            # Full sync of a doctor's or patient's rows, by id (accounts.sync)
+            models.Index(fields=['doctor', 'id'], name='appt_doctor_sync_idx'),
+            models.Index(fields=['patient', 'id'], name='appt_patient_sync_idx'),
+        ]
+
     def __str__(self):
         return f"Dr. {self.doctor.full_name} -> {self.patient.full_name} on {self.scheduled_at.strftime('%Y-%m-%d %H:%M')} ({self.get_status_display()})"
 
+    def save(self, *args, **kwargs):
+        # The outbox event written by the post_save receiver commits with the change
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     def is_past_due(self):
-        """Check if the appointment is overdue."""
-        return self.scheduled_at < timezone.now() and self.status == 'pending'
+        """
+        Check if the appointment is overdue. Prefer the ``overdue`` status (set by
+        the ``mark_overdue`` command) when filtering many appointments.
+        """
+        return self.status == 'overdue' or (self.status == 'pending' and self.scheduled_at < timezone.now())
     
 class MedicalRecord(models.Model):
     doctor = models.ForeignKey(
@@ -81,11 +160,327 @@ class MedicalRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset scans for the patient timeline (newest first)
+            models.Index(fields=['patient', '-created_at', '-id'], name='record_patient_timeline_idx'),
+            # Admin date hierarchy
+            models.Index(fields=['created_at'], name='record_created_idx'),
+            # Full sync of a doctor's or patient's rows, by id (accounts.sync)
+            models.Index(fields=['doctor', 'id'], name='record_doctor_sync_idx'),
+            models.Index(fields=['patient', 'id'], name='record_patient_sync_idx'),
+        ]
+
     def __str__(self):
         return f"Medical Record for {self.diagnosis} - {self.created_at.strftime('%Y-%m-%d')}"
 
+    def save(self, *args, **kwargs):
+        # The outbox event written by the post_save receiver commits with the change
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     def is_doctor(self):
         return self.doctor.role == 'doctor'  # Updated to use doctor relation
 
     def is_patient(self):
         return self.patient.role == 'patient'  # Updated to use patient relation
+
+
+class ArchivedAppointment(models.Model):
+    """
+    A completed or cancelled appointment moved out of the hot ``Appointment``
+    table by the ``archive_appointments`` command. Keeps its original id, so
+    archived and live appointments share one id space.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    doctor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_doctor_appointments')
+    patient = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_patient_appointments')
+    scheduled_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=Appointment.STATUS_CHOICES)
+    notes = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', '-scheduled_at', '-id'], name='archived_appt_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"Dr. {self.doctor.full_name} -> {self.patient.full_name} on {self.scheduled_at.strftime('%Y-%m-%d %H:%M')} ({self.get_status_display()}, archived)"
+
+
+class ArchivedMedicalRecord(models.Model):
+    """
+    A medical record archived together with its appointment. Keeps its original
+    id and report file.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    doctor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_medical_records_as_doctor')
+    patient = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='archived_medical_records_as_patient')
+    appointment = models.ForeignKey(ArchivedAppointment, on_delete=models.CASCADE, related_name='medical_records')
+    diagnosis = models.TextField()
+    treatment = models.TextField()
+    notes = models.TextField(blank=True, null=True)
+    report = models.FileField(upload_to='reports/', blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', '-created_at', '-id'], name='archived_record_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived Medical Record for {self.diagnosis} - {self.created_at.strftime('%Y-%m-%d')}"
+
+
+# PostgreSQL advisory lock key serializing outbox writes (see OutboxEvent)
+OUTBOX_LOCK_KEY = 0x6F7574626F78
+
+
+def lock_outbox_sequence(using):
+    """
+    Take, until the current transaction ends, the lock under which outbox
+    sequence numbers are allocated. SQLite already lets one transaction
+    write at a time; PostgreSQL uses a transaction-level advisory lock.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [OUTBOX_LOCK_KEY])
+
+
+class OutboxEventQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            lock_outbox_sequence(self.db)
+            return super().bulk_create(objs, *args, **kwargs)
+
+
+class OutboxEvent(models.Model):
+    """
+    A change to an appointment or medical record, written in the same
+    transaction as the change itself. The auto-incrementing id is the event's
+    sequence number, read by consumers of the change feed.
+
+    Events are only inserted under ``lock_outbox_sequence``, held until the
+    inserting transaction commits, so sequence numbers are allocated in
+    commit order: once a reader sees an event, every event committed later
+    has a higher sequence number, and consumers can move past what they have
+    read without missing a slower transaction's event. The price is that
+    transactions writing events are serialized from their first event to
+    their commit, which is why they are kept short.
+    """
+    MODEL_CHOICES = [
+        ('appointment', 'Appointment'),
+        ('record', 'Medical record'),
+    ]
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+        ('archived', 'Archived'),
+        ('reassigned', 'Reassigned'),
+    ]
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # Plain ids rather than foreign keys: events outlive the users they mention
+    doctor_id = models.BigIntegerField(null=True, blank=True)
+    patient_id = models.BigIntegerField(null=True, blank=True)
+    payload = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    # Fields copied into the payload of created/updated events, by model
+    PAYLOAD_FIELDS = {
+        'appointment': ('id', 'doctor_id', 'patient_id', 'scheduled_at', 'status', 'notes', 'created_at', 'updated_at'),
+        'record': ('id', 'appointment_id', 'doctor_id', 'patient_id', 'diagnosis', 'treatment', 'notes', 'report',
+                   'created_at', 'updated_at'),
+    }
+    MODEL_NAMES = {'appointment': 'appointment', 'medicalrecord': 'record'}
+
+    objects = OutboxEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Delta sync of a doctor's or patient's events, by sequence number (accounts.sync)
+            models.Index(fields=['doctor_id', 'id'], name='outbox_doctor_idx'),
+            models.Index(fields=['patient_id', 'id'], name='outbox_patient_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.model} {self.object_id} {self.action}"
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            lock_outbox_sequence(using)
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def for_row(cls, model, row, action):
+        """
+        Build (without saving) the event for ``action`` on an object of ``model``
+        given as a dict of its ``PAYLOAD_FIELDS``.
+        """
+        payload = row if action in ('created', 'updated') else {'id': row['id']}
+        return cls(model=model, object_id=row['id'], action=action,
+                   doctor_id=row['doctor_id'], patient_id=row['patient_id'], payload=payload)
+
+    @classmethod
+    def for_instance(cls, instance, action):
+        """Build (without saving) the event for ``action`` on an appointment or medical record."""
+        model = cls.MODEL_NAMES[instance._meta.model_name]
+        row = {}
+        for name in cls.PAYLOAD_FIELDS[model]:
+            value = getattr(instance, name)
+            row[name] = value.name if isinstance(value, FieldFile) else value
+        return cls.for_row(model, row, action)
+
+
+class OutboxPrune(models.Model):
+    """
+    A run of the ``prune_outbox`` command. Consumers whose position is older
+    than the latest ``pruned_through`` have missed events and must resync.
+    """
+    pruned_through = models.BigIntegerField()
+    deleted = models.PositiveIntegerField()
+    pruned_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Pruned through #{self.pruned_through} at {self.pruned_at:%Y-%m-%d %H:%M}"
+
+
+class UserPurge(models.Model):
+    """
+    A soft-deleted doctor or patient whose appointments, medical records and
+    report files are removed in batches by the ``purge_users`` command, with
+    its progress. Kept after the user row itself is deleted.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    user_id = models.BigIntegerField(db_index=True)
+    role = models.CharField(max_length=20, choices=CustomUser.ROLE_CHOICES)
+    # Name and email at deletion time (the user row is anonymized, then deleted)
+    label = models.CharField(max_length=512)
+    requested_by_id = models.BigIntegerField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    appointments_deleted = models.PositiveIntegerField(default=0)
+    records_deleted = models.PositiveIntegerField(default=0)
+    files_deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='purge_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Purge of {self.role} {self.label} ({self.get_status_display()})"
+
+
+class RecordAccessLog(models.Model):
+    """
+    An access to a patient's medical records, written in batches by
+    ``accounts.audit``. Append-only: entries are never changed or deleted.
+    """
+    LIST = 'list'
+    EDIT_FORM = 'edit_form'
+    ACTION_CHOICES = [
+        (LIST, 'Viewed record list'),
+        (EDIT_FORM, 'Opened record form'),
+    ]
+    # Plain ids rather than foreign keys: the audit trail outlives purged users and records
+    user_id = models.BigIntegerField()
+    patient_id = models.BigIntegerField(blank=True, null=True)
+    appointment_id = models.BigIntegerField(blank=True, null=True)
+    record_id = models.BigIntegerField(blank=True, null=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    ip_address = models.GenericIPAddressField(blank=True, null=True)
+    accessed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient_id', 'accessed_at'], name='access_patient_idx'),
+            models.Index(fields=['user_id', 'accessed_at'], name='access_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"User {self.user_id} {self.get_action_display().lower()} of patient {self.patient_id} at {self.accessed_at:%Y-%m-%d %H:%M:%S}"
+
+
+class RequestProfile(models.Model):
+    """
+    A request run under the profiler by ``accounts.profiling``: its timings,
+    SQL queries and ``cProfile`` data.
+    """
+    REQUESTED = 'requested'
+    SAMPLED = 'sampled'
+    TRIGGER_CHOICES = [
+        (REQUESTED, 'Requested'),
+        (SAMPLED, 'Sampled'),
+    ]
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=1000)
+    view = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    user_id = models.BigIntegerField(blank=True, null=True)
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    query_ms = models.FloatField()
+    # [{'alias', 'sql', 'params', 'ms'}], in execution order
+    queries = models.JSONField(default=list)
+    # The slowest functions by cumulative time, as printed by pstats
+    summary = models.TextField()
+    # The profile in cProfile's dump_stats format
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms, {self.query_count} queries)"
+
+
+class SlowQuery(models.Model):
+    """
+    An SQL query that took longer than ``settings.SLOW_QUERY_MS``, written by
+    ``accounts.slow_queries``. Occurrences of the same normalized query share
+    a fingerprint; the first one stored carries the ``EXPLAIN`` plan.
+    """
+    fingerprint = models.CharField(max_length=16)
+    sql = models.TextField()
+    alias = models.CharField(max_length=50)
+    view = models.CharField(max_length=200)
+    # Innermost project frame that ran the query: "file:line in function"
+    location = models.CharField(max_length=500, blank=True)
+    duration_ms = models.FloatField()
+    plan = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fingerprint', 'created_at'], name='slow_query_fingerprint_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms in {self.view}: {self.sql[:80]}"
@@ -0,0 +1,65 @@
+"""
+Transactional outbox for appointment and medical record changes.
+
+Every saved or deleted appointment and medical record gets an
+``OutboxEvent`` row, written by the receivers in ``accounts.signals`` inside
+the transaction of the change (``Appointment.save``/``delete`` and their
+``MedicalRecord`` counterparts run in ``transaction.atomic``), so an event
+exists if and only if its change committed. A save that changes the doctor
+or patient also writes a ``reassigned`` event naming the previous ones,
+for whom the row is gone. Bulk operations
+(``AppointmentQuerySet.mark_overdue``, ``archive_appointments``) write their
+events themselves.
+
+Downstream systems read the events in sequence (id) order from the change
+feed (``/changes/?since=<seq>``) instead of re-fetching the appointment list.
+Sequence numbers are allocated in commit order (see ``OutboxEvent``), so a
+consumer never skips an event by moving past the ones it has read.
+``prune_outbox`` deletes old events; consumers that fall behind the pruned
+range must resync.
+"""
+import contextvars
+from contextlib import contextmanager
+from django.db.models import Max
+from .models import OutboxEvent, OutboxPrune
+
+DELETED = 'deleted'
+ARCHIVED = 'archived'
+# An appointment or record moved to another doctor or patient; the event carries the previous one
+REASSIGNED = 'reassigned'
+
+_delete_action = contextvars.ContextVar('outbox_delete_action', default=DELETED)
+
+
+@contextmanager
+def deletes_recorded_as(action):
+    """Record the deletions made inside the block with ``action`` instead of ``deleted``."""
+    token = _delete_action.set(action)
+    try:
+        yield
+    finally:
+        _delete_action.reset(token)
+
+
+def delete_action():
+    """The action recorded for deletions in the current context."""
+    return _delete_action.get()
+
+
+def pruned_through():
+    """The highest sequence number deleted by ``prune_outbox`` (0 if never pruned)."""
+    return OutboxPrune.objects.aggregate(through=Max('pruned_through'))['through'] or 0
+
+
+def events_since(since, limit):
+    """
+    The events after sequence number ``since``, in sequence order, as dicts.
+
+    Sequence numbers are allocated in commit order (see ``OutboxEvent``), so
+    no transaction still committing can add an event below those returned.
+    """
+    return (OutboxEvent.objects
+            .filter(pk__gt=since)
+            .order_by('pk')
+            .values('id', 'model', 'object_id', 'action', 'doctor_id', 'patient_id', 'payload', 'created_at')
+            [:limit])
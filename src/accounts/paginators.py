@@ -0,0 +1,41 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids ``COUNT(*)`` over very large, unfiltered tables.
+
+    On PostgreSQL the planner's row estimate (``pg_class.reltuples``) is used
+    for unfiltered querysets once it exceeds ``estimate_threshold``; filtered
+    querysets, small tables and other database backends are counted exactly.
+    """
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        estimate = self.estimated_count()
+        if estimate is not None and estimate >= self.estimate_threshold:
+            return estimate
+        return super().count
+
+    def estimated_count(self):
+        """Return the planner's row estimate for the table, or None if unavailable."""
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or queryset.query.has_filters() or queryset.query.distinct:
+            return None
+
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 (or 0) for tables that have never been analyzed
+        return row[0] if row and row[0] > 0 else None
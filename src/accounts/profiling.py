@@ -0,0 +1,154 @@
+"""
+On-demand request profiling.
+
+With ``settings.PROFILING_ENABLED``, ``ProfilingMiddleware`` runs a request's
+view under ``cProfile`` and records every SQL query it makes when:
+
+* a superuser adds ``?profile`` to the URL (the response then carries an
+  ``X-Profile-Id`` header), or
+* the request is picked by sampling, ``settings.PROFILING_SAMPLE_RATE``
+  being the fraction of requests profiled.
+
+The result is stored as a ``RequestProfile``: timings, a summary of the
+slowest functions, the SQL queries, and the raw profile, which the admin
+offers for download as a ``.prof`` file (for ``pstats``, snakeviz...). Only
+the newest ``settings.PROFILING_KEEP`` profiles are kept.
+
+When profiling is disabled the middleware removes itself from the chain, so
+it costs nothing. When enabled it is sync-only: under ASGI, Django runs it
+and the sync views below it in one worker thread, which the profiler and the
+query recorders observe. The code of async views runs on the event loop
+instead, so their profiles only show the wait for them, and the streamed part
+of streaming responses is not profiled either.
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from .models import RequestProfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PARAM = 'profile'
+PROFILE_HEADER = 'X-Profile-Id'
+
+# Functions listed in a profile's summary
+SUMMARY_FUNCTIONS = 40
+
+
+class QueryRecorder:
+    """A database execute wrapper collecting the SQL and duration of each query."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < settings.PROFILING_MAX_QUERIES:
+                self.queries.append({'alias': self.alias, 'sql': sql, 'params': repr(params)[:500],
+                                     'ms': round((time.perf_counter() - start) * 1000, 3)})
+
+
+def profile_summary(profiler):
+    """The functions with the highest cumulative time, as ``pstats`` prints them."""
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(SUMMARY_FUNCTIONS)
+    return out.getvalue()
+
+
+def profile_data(profiler):
+    """The profile in the format of ``cProfile``'s ``dump_stats`` (a ``.prof`` file)."""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+class ProfilingMiddleware:
+    """
+    Profile superuser requests that ask for it and a sample of all requests.
+
+    Removed from the middleware chain unless profiling is enabled. Goes after
+    ``AuthenticationMiddleware``.
+    """
+    # cProfile and execute wrappers only observe their own thread: under ASGI,
+    # Django then adapts the chain so the request is handled in a worker thread
+    sync_capable = True
+    async_capable = False
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return self.profile(request, trigger)
+
+    def trigger(self, request):
+        """Why ``request`` is profiled, or None."""
+        if PROFILE_PARAM in request.GET and request.user.is_superuser:
+            return RequestProfile.REQUESTED
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return RequestProfile.SAMPLED
+        return None
+
+    def profile(self, request, trigger):
+        recorders = [QueryRecorder(connection.alias) for connection in connections.all()]
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for connection, recorder in zip(connections.all(), recorders):
+                stack.enter_context(connection.execute_wrapper(recorder))
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+                duration = time.perf_counter() - start
+
+        try:
+            profile = self.save(request, response, trigger, profiler, duration, recorders)
+        except Exception as e:
+            logger.error(f"Error saving the profile of {request.method} {request.path}: {e}")
+            return response
+        if trigger == RequestProfile.REQUESTED:
+            response[PROFILE_HEADER] = str(profile.pk)
+        return response
+
+    def save(self, request, response, trigger, profiler, duration, recorders):
+        queries = [query for recorder in recorders for query in recorder.queries]
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:1000],
+            view=getattr(request.resolver_match, 'view_name', '') or '',
+            status_code=response.status_code,
+            user_id=request.user.pk if hasattr(request, 'user') and request.user.is_authenticated else None,
+            trigger=trigger,
+            duration_ms=round(duration * 1000, 3),
+            query_count=len(queries),
+            query_ms=round(sum(query['ms'] for query in queries), 3),
+            queries=queries,
+            summary=profile_summary(profiler),
+            data=profile_data(profiler),
+        )
+        # Keep the newest PROFILING_KEEP profiles
+        oldest_kept = (RequestProfile.objects.order_by('-pk')
+                       .values_list('pk', flat=True)[settings.PROFILING_KEEP - 1:settings.PROFILING_KEEP])
+        if oldest_kept:
+            RequestProfile.objects.filter(pk__lt=oldest_kept[0]).delete()
+        logger.info(f"Profiled {request.method} {request.path} ({trigger}): {profile.duration_ms} ms, "
+                    f"{profile.query_count} queries")
+        return profile
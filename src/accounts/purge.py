@@ -0,0 +1,117 @@
+"""
+Deleting doctors and patients without one giant cascade.
+
+Deleting a user row lets ``on_delete=CASCADE`` load every related
+appointment and medical record into memory and delete them in one long
+transaction. Instead:
+
+1. ``soft_delete_user`` marks the user deleted right away: ``deleted_at`` is
+   set, so ``CustomUser.objects`` no longer returns them and they cannot log
+   in, their username and email are released for reuse, and a ``UserPurge``
+   job is queued.
+2. ``manage.py purge_users`` (run periodically, like the other maintenance
+   commands) works through the queued jobs. It deletes the user's medical
+   records and appointments, live and archived, in batches of one short
+   transaction each. Then it deletes the report files of each committed
+   batch, and finally the user row, recording its progress on the job.
+
+Deleted appointments and records get their ``deleted`` outbox events from
+the usual ``post_delete`` receivers.
+"""
+import time
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import (Appointment, ArchivedAppointment, ArchivedMedicalRecord, CustomUser, MedicalRecord,
+                     UserPurge)
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+# Deleted in this order, so that deleting appointments cascades to no records
+PURGE_STEPS = [
+    (MedicalRecord, 'records_deleted'),
+    (ArchivedMedicalRecord, 'records_deleted'),
+    (Appointment, 'appointments_deleted'),
+    (ArchivedAppointment, 'appointments_deleted'),
+]
+
+
+def soft_delete_user(user, requested_by=None):
+    """Mark ``user`` deleted and queue the purge of their data. Returns the job."""
+    with transaction.atomic():
+        job = UserPurge.objects.create(
+            user_id=user.pk,
+            role=user.role,
+            label=f'{user.full_name or user.username} <{user.email}>',
+            requested_by_id=requested_by.pk if requested_by else None,
+        )
+        user.deleted_at = timezone.now()
+        user.is_active = False
+        # Unique fields: a new account may reuse them before the purge runs
+        user.username = None
+        user.email = f'deleted-{user.pk}@deleted.invalid'
+        user.save(update_fields=['deleted_at', 'is_active', 'username', 'email', 'updated_at'])
+    logger.info(f"Soft-deleted {user.role} {user.pk}, purge job {job.pk} queued")
+    return job
+
+
+def delete_batch(queryset, batch_size):
+    """
+    Delete up to ``batch_size`` rows of ``queryset`` in one transaction, then
+    their report files. Returns the number of rows and files deleted.
+    """
+    model = queryset.model
+    with transaction.atomic():
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return 0, 0
+        batch = model.objects.filter(pk__in=ids)
+        has_reports = any(field.name == 'report' for field in model._meta.fields)
+        reports = [name for name in batch.values_list('report', flat=True) if name] if has_reports else []
+        _, deleted = batch.delete()
+
+    # Only once the rows are gone for good
+    files = 0
+    if reports:
+        storage = model._meta.get_field('report').storage
+        for name in reports:
+            try:
+                storage.delete(name)
+                files += 1
+            except OSError as e:
+                logger.warning(f"Could not delete report file {name}: {e}")
+    return deleted.get(model._meta.label, 0), files
+
+
+def purge_user(job, batch_size=DEFAULT_BATCH_SIZE, pause=0):
+    """
+    Remove the data of a soft-deleted user in batches, then the user row.
+    Safe to run again on a job that was interrupted.
+    """
+    job.status = UserPurge.RUNNING
+    job.started_at = job.started_at or timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    owned = Q(doctor_id=job.user_id) | Q(patient_id=job.user_id)
+    for model, counter in PURGE_STEPS:
+        while True:
+            rows, files = delete_batch(model.objects.filter(owned), batch_size)
+            if not rows:
+                break
+            setattr(job, counter, getattr(job, counter) + rows)
+            job.files_deleted += files
+            job.save(update_fields=[counter, 'files_deleted'])
+            if pause:
+                time.sleep(pause)
+
+    with transaction.atomic():
+        # What remains (tokens, admin log entries) is small
+        CustomUser.all_objects.filter(pk=job.user_id, deleted_at__isnull=False).delete()
+        job.status = UserPurge.DONE
+        job.finished_at = timezone.now()
+        job.error = ''
+        job.save(update_fields=['status', 'finished_at', 'error'])
+    return job
@@ -0,0 +1,53 @@
+"""
+API renderers.
+
+* ``ORJSONRenderer`` replaces DRF's ``JSONRenderer`` for ``application/json``.
+  It encodes with orjson, several times faster than the standard library on
+  large lists. The output is compact UTF-8, as DRF's is by default; an
+  ``indent`` media type parameter pretty-prints it.
+* ``MessagePackRenderer`` serves ``application/msgpack`` to clients that ask
+  for it (``Accept: application/msgpack`` or ``?format=msgpack``). It is
+  smaller than JSON and faster to decode.
+
+Dates and times, and values neither format encodes natively (``Decimal``,
+lazy translation strings, querysets...), are converted as DRF's JSON encoder
+converts them, so both renderers output the same values as ``JSONRenderer``.
+"""
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = self.options
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=options)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True, datetime=False)
@@ -0,0 +1,210 @@
+"""
+Full-text search over medical record text (diagnosis, treatment and notes).
+
+* SQLite: an external-content FTS5 table, ``accounts_medicalrecord_fts``,
+  kept in sync with ``accounts_medicalrecord`` by triggers. Every write path
+  (saves, queryset updates, deletes, archiving) updates the index in the
+  writing transaction. Matches are ranked with BM25.
+* PostgreSQL: a GIN index on the weighted ``tsvector`` of the record text
+  (``search_vector()``). Matches are ranked with ``ts_rank`` and highlighted
+  with ``ts_headline``.
+
+The index is created by migration 0010. On SQLite, Django rebuilds a table to
+alter it, which drops its triggers: after a migration that alters
+``MedicalRecord``, run ``manage.py rebuild_record_search``.
+
+In both cases diagnosis matches rank above treatment matches, which rank
+above notes matches. Snippets wrap matched terms in ``<mark>``; the rest of
+the record text is HTML-escaped.
+"""
+import re
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Concat
+from django.utils.html import escape
+
+FTS_TABLE = 'accounts_medicalrecord_fts'
+POSTGRES_INDEX_NAME = 'record_search_idx'
+POSTGRES_CONFIG = 'english'
+
+# BM25 weights of the diagnosis, treatment and notes columns
+SQLITE_WEIGHTS = (3.0, 2.0, 1.0)
+
+# Words around the matched terms in a snippet
+SNIPPET_WORDS = 16
+
+# Control characters delimiting matched terms until the snippet is escaped
+_START, _STOP = '\x02', '\x03'
+
+SQLITE_INDEX_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        diagnosis, treatment, notes,
+        content='accounts_medicalrecord', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON accounts_medicalrecord BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, diagnosis, treatment, notes)
+        VALUES (new.id, new.diagnosis, new.treatment, new.notes);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON accounts_medicalrecord BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, diagnosis, treatment, notes)
+        VALUES ('delete', old.id, old.diagnosis, old.treatment, old.notes);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF diagnosis, treatment, notes ON accounts_medicalrecord BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, diagnosis, treatment, notes)
+        VALUES ('delete', old.id, old.diagnosis, old.treatment, old.notes);
+        INSERT INTO {FTS_TABLE}(rowid, diagnosis, treatment, notes)
+        VALUES (new.id, new.diagnosis, new.treatment, new.notes);
+    END
+    """,
+    # Index the records that already exist
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def search_vector():
+    """The weighted ``tsvector`` of a record's text (PostgreSQL)."""
+    return (SearchVector('diagnosis', weight='A', config=POSTGRES_CONFIG)
+            + SearchVector('treatment', weight='B', config=POSTGRES_CONFIG)
+            + SearchVector('notes', weight='C', config=POSTGRES_CONFIG))
+
+
+def postgres_index():
+    return GinIndex(search_vector(), name=POSTGRES_INDEX_NAME)
+
+
+def create_search_index(schema_editor, model):
+    """Create the search index of ``MedicalRecord`` for the database in use."""
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_INDEX_SQL:
+            schema_editor.execute(sql)
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(model, postgres_index())
+
+
+def drop_search_index(schema_editor, model):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_DROP_SQL:
+            schema_editor.execute(sql)
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(model, postgres_index())
+
+
+def search_terms(text):
+    """The words of a search query; punctuation and operators are ignored."""
+    return re.findall(r'\w+', text or '')
+
+
+def highlight(snippet):
+    """Escape a snippet and turn its match delimiters into ``<mark>`` tags."""
+    return escape(snippet).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def scope_records(queryset, user):
+    """Restrict ``queryset`` to the medical records ``user`` may read."""
+    if user.is_superuser or user.is_admin():
+        return queryset
+    if user.is_doctor():
+        return queryset.filter(doctor=user)
+    if user.is_patient():
+        return queryset.filter(patient=user)
+    return queryset.none()
+
+
+def _fts_query(terms):
+    # Every term must match; quoting keeps FTS5 from reading terms as operators
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def matching(queryset, text):
+    """Filter ``queryset`` to the medical records matching ``text``."""
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        return queryset.alias(search=search_vector()).filter(
+            search=SearchQuery(' '.join(terms), config=POSTGRES_CONFIG))
+    return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                                         [_fts_query(terms)]))
+
+
+def search_records(queryset, text, limit):
+    """
+    Return up to ``limit`` records of ``queryset`` matching ``text``, best
+    first, as dicts with the ``record``, its ``score`` and a highlighted
+    ``snippet``.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return []
+    if connection.vendor == 'postgresql':
+        return _search_postgres(queryset, terms, limit)
+    return _search_sqlite(queryset, terms, limit)
+
+
+def _search_sqlite(queryset, terms, limit):
+    # Rank the matches within the (scoped) queryset, then build snippets for the
+    # top ones only. "+rowid" keeps SQLite from handing the IN list to FTS5,
+    # which would look up and test each scoped row instead of using the index.
+    scope_sql, scope_params = queryset.order_by().values('pk').query.sql_with_params()
+    match = _fts_query(terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT rowid, bm25({FTS_TABLE}, %s, %s, %s) AS rank,
+                   snippet({FTS_TABLE}, -1, %s, %s, '…', %s)
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH %s AND +rowid IN (
+                SELECT rowid FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH %s AND +rowid IN ({scope_sql})
+                ORDER BY bm25({FTS_TABLE}, %s, %s, %s)
+                LIMIT %s
+            )
+            ORDER BY rank
+            """,
+            [*SQLITE_WEIGHTS, _START, _STOP, SNIPPET_WORDS, match,
+             match, *scope_params, *SQLITE_WEIGHTS, limit],
+        )
+        rows = cursor.fetchall()
+
+    records = queryset.select_related('doctor', 'patient').in_bulk([row[0] for row in rows])
+    return [
+        # BM25 scores are negative, lower is better
+        {'record': records[pk], 'score': round(-rank, 4), 'snippet': highlight(snippet)}
+        for pk, rank, snippet in rows
+        if pk in records
+    ]
+
+
+def _search_postgres(queryset, terms, limit):
+    query = SearchQuery(' '.join(terms), config=POSTGRES_CONFIG)
+    text = Concat('diagnosis', Value(' — '), 'treatment', Value(' — '), Coalesce('notes', Value('')))
+    records = (queryset
+               .select_related('doctor', 'patient')
+               .alias(search=search_vector())
+               .filter(search=query)
+               .annotate(score=SearchRank(search_vector(), query),
+                         snippet=SearchHeadline(text, query, config=POSTGRES_CONFIG, start_sel=_START,
+                                                stop_sel=_STOP, max_words=SNIPPET_WORDS, min_words=SNIPPET_WORDS // 2))
+               .order_by('-score', '-pk')[:limit])
+    return [
+        {'record': record, 'score': round(record.score, 4), 'snippet': highlight(record.snippet)}
+        for record in records
+    ]
@@ -1,8 +1,13 @@
 from rest_framework import serializers
-from .models import Appointment
+from .models import Appointment, MedicalRecord
 
 class AppointmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Appointment
         fields = '__all__'
-    
\ No newline at end of file
+
+
+class MedicalRecordSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MedicalRecord
+        fields = '__all__'
@@ -0,0 +1,115 @@
+from functools import partial
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from . import audit
+from .caching import bump_version
+from .models import Appointment, CustomUser, MedicalRecord, OutboxEvent
+from .events import publish_appointment_event
+from .outbox import REASSIGNED, delete_action
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cache version covering every cached read of appointment data
+APPOINTMENTS_VERSION = 'appointments'
+
+# Cache version covering cached reads of users (e.g. list facet counts)
+USERS_VERSION = 'users'
+
+# Cache version covering cached reads of medical record totals (e.g. dashboards)
+RECORDS_VERSION = 'records'
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_caches(sender, instance, **kwargs):
+    """Invalidate cached appointment reads whenever an appointment changes."""
+    try:
+        bump_version(APPOINTMENTS_VERSION)
+    except Exception as e:
+        # A cache outage must not fail the write; cached reads expire on their own
+        logger.error(f"Error invalidating appointment caches: {e}")
+
+
+@receiver(post_save, sender=MedicalRecord)
+@receiver(post_delete, sender=MedicalRecord)
+def invalidate_record_caches(sender, instance, **kwargs):
+    """Invalidate cached record totals whenever a medical record changes."""
+    try:
+        bump_version(RECORDS_VERSION)
+    except Exception as e:
+        logger.error(f"Error invalidating record caches: {e}")
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_caches(sender, instance, update_fields=None, **kwargs):
+    """Invalidate cached user reads whenever a user changes, except for the login timestamp."""
+    if update_fields == {'last_login'}:
+        return
+    try:
+        bump_version(USERS_VERSION)
+    except Exception as e:
+        logger.error(f"Error invalidating user caches: {e}")
+
+
+@receiver(pre_save, sender=Appointment)
+@receiver(pre_save, sender=MedicalRecord)
+def remember_previous_owners(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Note the doctor and patient of an appointment or record about to be updated."""
+    instance._previous_owners = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not update_fields & {'doctor', 'doctor_id', 'patient', 'patient_id'}:
+        return
+    instance._previous_owners = (sender.objects.filter(pk=instance.pk)
+                                 .values_list('doctor_id', 'patient_id').first())
+
+
+def reassignment_event(instance):
+    """The event removing ``instance`` from the doctor or patient it had before its save, or None."""
+    previous = getattr(instance, '_previous_owners', None)
+    if previous is None:
+        return None
+    doctor_id, patient_id = previous
+    event = OutboxEvent.for_instance(instance, REASSIGNED)
+    # Only the owners that lost the row; the other stays None and gets no tombstone
+    event.doctor_id = doctor_id if doctor_id != instance.doctor_id else None
+    event.patient_id = patient_id if patient_id != instance.patient_id else None
+    if event.doctor_id is None and event.patient_id is None:
+        return None
+    return event
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_save, sender=MedicalRecord)
+def record_saved_in_outbox(sender, instance, created, raw=False, **kwargs):
+    """Write the outbox events of a saved appointment or record, in the save's transaction."""
+    if raw:
+        return  # Fixture loading
+    events = [OutboxEvent.for_instance(instance, 'created' if created else 'updated')]
+    reassigned = reassignment_event(instance)
+    if reassigned is not None:
+        events.insert(0, reassigned)
+    for event in events:
+        event.save()
+        if event.model == 'appointment':
+            transaction.on_commit(partial(publish_appointment_event, event))
+
+
+@receiver(post_delete, sender=Appointment)
+@receiver(post_delete, sender=MedicalRecord)
+def record_deleted_in_outbox(sender, instance, **kwargs):
+    """Write the outbox event of a deleted (or archived) appointment or record."""
+    event = OutboxEvent.for_instance(instance, delete_action())
+    event.save()
+    if event.model == 'appointment':
+        transaction.on_commit(partial(publish_appointment_event, event))
+
+
+@receiver(request_finished)
+def flush_access_log(sender, **kwargs):
+    """Write the buffered record accesses once a response has been sent, if they are due."""
+    audit.flush_if_due()
@@ -0,0 +1,220 @@
+"""
+Slow query log.
+
+``SlowQueryMiddleware`` times every SQL query a request makes through a
+database execute wrapper. Queries that take ``settings.SLOW_QUERY_MS`` or
+longer are handed, after the response, to a background thread that stores
+them as ``SlowQuery`` rows with:
+
+* the normalized SQL (literals and ``IN`` lists collapsed) and its
+  fingerprint, which groups the occurrences of one query shape,
+* the view that ran it and the innermost project frame (``file:line in
+  function``) on the stack,
+* the first time a fingerprint is seen, its ``EXPLAIN`` plan.
+
+The request pays for nothing but timing its queries; a full queue drops
+entries rather than blocking. ``manage.py slow_queries`` reports the worst
+query shapes with their plans. With ``SLOW_QUERY_MS = 0`` the middleware is
+not loaded.
+
+The wrapper is installed on every connection as it is opened, in whichever
+thread, and times a query only while a request is being logged (a context
+variable, which ``sync_to_async`` carries into worker threads). So the
+middleware is async-capable: under ASGI it does not push async views into a
+worker thread, and the queries of sync and async views alike are timed.
+"""
+import contextvars
+import hashlib
+import queue
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from .models import SlowQuery
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Slow queries waiting for the background thread
+QUEUE_SIZE = 1000
+
+_IN_LIST = re.compile(r'\bIN\s*\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_worker = None
+_worker_lock = threading.Lock()
+_explained = set()
+
+# (threshold in seconds, slow queries) of the request being logged
+_request_queries = contextvars.ContextVar('slow_queries', default=None)
+
+
+def normalize_sql(sql):
+    """``sql`` with its literals and placeholders replaced by ``?`` and ``IN`` lists collapsed."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:16]
+
+
+def caller_location():
+    """The innermost frame on the stack in the project's own code, as ``file:line in function``."""
+    base_dir = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base_dir) and 'site-packages' not in filename and filename != __file__:
+            return f'{filename[len(base_dir) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return ''
+
+
+def time_query(execute, sql, params, many, context):
+    """A database execute wrapper collecting the slow queries of the request being logged, if any."""
+    current = _request_queries.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    threshold, slow = current
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        if duration >= threshold:
+            slow.append({'alias': context['connection'].alias, 'sql': sql, 'params': None if many else params,
+                         'ms': round(duration * 1000, 3), 'location': caller_location()})
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # First in the list, so it stays put when execute_wrapper() blocks pop theirs
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
+
+
+@contextmanager
+def logging_slow_queries(threshold_ms):
+    """Collect the queries run inside the block that take ``threshold_ms`` or longer."""
+    slow = []
+    token = _request_queries.set((threshold_ms / 1000, slow))
+    try:
+        yield slow
+    finally:
+        _request_queries.reset(token)
+
+
+def explain(alias, sql, params):
+    """The plan of a ``SELECT`` query, or '' for other statements."""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            # (id, parent, notused, detail); children are indented under their parent
+            depth = {0: -1}
+            lines = []
+            for node, parent, _, detail in cursor.fetchall():
+                depth[node] = depth.get(parent, -1) + 1
+                lines.append('  ' * depth[node] + detail)
+            return '\n'.join(lines)
+        cursor.execute(f'EXPLAIN {sql}', params)
+        return '\n'.join(' '.join(str(value) for value in row) for row in cursor.fetchall())
+
+
+def record(view, queries):
+    """Store slow ``queries`` run by ``view``, explaining the query shapes not seen before."""
+    rows = []
+    for query in queries:
+        normalized = normalize_sql(query['sql'])
+        key = fingerprint(normalized)
+        plan = ''
+        if key not in _explained and query['params'] is not None:
+            _explained.add(key)
+            if not SlowQuery.objects.filter(fingerprint=key).exclude(plan='').exists():
+                try:
+                    plan = explain(query['alias'], query['sql'], query['params'])
+                except Exception as e:
+                    logger.warning(f"Could not explain slow query {key}: {e}")
+        rows.append(SlowQuery(fingerprint=key, sql=normalized, alias=query['alias'], view=view,
+                              location=query['location'][:500], duration_ms=query['ms'], plan=plan))
+    SlowQuery.objects.bulk_create(rows)
+
+
+def _work():
+    while True:
+        view, queries = _queue.get()
+        # This thread is outside the request cycle: drop connections that are
+        # too old or broken, as request_started/request_finished do for requests
+        close_old_connections()
+        try:
+            record(view, queries)
+        except Exception as e:
+            logger.error(f"Error recording {len(queries)} slow queries of {view}: {e}")
+        finally:
+            close_old_connections()
+            _queue.task_done()
+
+
+def submit(view, queries):
+    """Hand slow queries to the background thread; dropped if it is too far behind."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name='slow-query-log', daemon=True)
+            _worker.start()
+    try:
+        _queue.put_nowait((view, queries))
+    except queue.Full:
+        logger.warning(f"Slow query queue full, dropping {len(queries)} slow queries of {view}")
+
+
+class SlowQueryMiddleware:
+    """
+    Time the SQL queries of each request and log the slow ones.
+
+    Removed from the middleware chain when ``settings.SLOW_QUERY_MS`` is 0.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with logging_slow_queries(settings.SLOW_QUERY_MS) as slow:
+            response = self.get_response(request)
+        self.submit_slow(request, slow)
+        return response
+
+    async def __acall__(self, request):
+        with logging_slow_queries(settings.SLOW_QUERY_MS) as slow:
+            response = await self.get_response(request)
+        self.submit_slow(request, slow)
+        return response
+
+    def submit_slow(self, request, slow):
+        if slow:
+            view = getattr(request.resolver_match, 'view_name', '') or request.path
+            submit(view[:200], slow)
@@ -0,0 +1,155 @@
+"""
+Delta sync for offline clients (the tablet app).
+
+A client stores the ``watermark`` returned by its last sync and sends it
+back: the sequence number of the last outbox event it has (see
+``accounts.outbox``). The response holds the user's appointments and medical
+records changed since then, and tombstones: the ids of those deleted,
+archived or reassigned to someone else since. Both come from the user's
+outbox events after the watermark, read through the ``(doctor_id, id)`` and
+``(patient_id, id)`` indexes; the last event of a row decides whether its
+current state or its tombstone is sent. A sync therefore costs in proportion
+to what changed, not to the user's history. A page holds the rows of at most
+``limit`` events, sent as compact column lists
+(``{"fields": [...], "rows": [[...], ...]}``).
+
+Sequence numbers are allocated in commit order (see ``OutboxEvent``), so a
+change committed after a sync, however long its transaction ran and
+whatever its ``updated_at``, has an event after that sync's watermark and
+is in the next one.
+
+Tombstones also tell a doctor or patient about rows reassigned to someone
+else (``reassigned`` events carry the previous owner); admins, who keep
+seeing those rows, do not get them. Ids in ``deleted`` never appear in the
+rows of the same response.
+
+Without a watermark, or when outbox events after it have been pruned (its
+tombstones are lost), the response is a full sync (``full_resync``): the
+client drops its local copy and applies the pages that follow. A full sync
+pages through the rows by id from the last sequence number committed before
+its first page; until it is done its watermark,
+``"<seq>.<model index>.<id>"``, also holds the row it stopped after. Rows
+changed meanwhile may be sent again by the next sync, but never missed.
+``more`` tells the client to call again with the new watermark.
+"""
+from django.db.models import Max, Q
+from .models import Appointment, MedicalRecord, OutboxEvent
+from .outbox import ARCHIVED, DELETED, REASSIGNED, pruned_through
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 5000
+
+APPOINTMENT_FIELDS = ('id', 'doctor_id', 'patient_id', 'scheduled_at', 'status', 'notes', 'updated_at')
+RECORD_FIELDS = ('id', 'appointment_id', 'doctor_id', 'patient_id', 'diagnosis', 'treatment', 'notes', 'report',
+                 'updated_at')
+
+# (response key, model, fields, outbox model name)
+SYNCED = [
+    ('appointments', Appointment, APPOINTMENT_FIELDS, 'appointment'),
+    ('records', MedicalRecord, RECORD_FIELDS, 'record'),
+]
+
+REMOVED = (DELETED, ARCHIVED, REASSIGNED)
+
+
+def encode_watermark(seq, resume=None):
+    """The watermark of outbox ``seq``, with the ``(model index, id)`` an unfinished full sync resumes after."""
+    return str(seq) if resume is None else f'{seq}.{resume[0]}.{resume[1]}'
+
+
+def decode_watermark(watermark):
+    """``(seq, resume)`` of a watermark; raises ValueError if it is malformed."""
+    seq, *resume = (int(part) for part in watermark.split('.'))
+    if resume and (len(resume) != 2 or not 0 <= resume[0] < len(SYNCED)):
+        raise ValueError(f'Malformed watermark: {watermark!r}')
+    return seq, tuple(resume) or None
+
+
+def owner_filter(user):
+    """The filter on ``doctor_id``/``patient_id`` selecting the rows ``user`` syncs, or None."""
+    if user.is_superuser or user.is_admin():
+        return Q()
+    if user.is_doctor():
+        return Q(doctor_id=user.pk)
+    if user.is_patient():
+        return Q(patient_id=user.pk)
+    return None
+
+
+def _full_page(owner, resume, limit):
+    """
+    The next ``limit`` rows of a full sync after ``resume``, in ``SYNCED``
+    then id order, as lists of tuples per model, and where the following
+    page resumes (None once every row has been sent).
+    """
+    pages = [[] for _ in SYNCED]
+    room = limit
+    for index, (_, model, fields, _) in enumerate(SYNCED):
+        if index < resume[0]:
+            continue
+        after = resume[1] if index == resume[0] else 0
+        rows = list(model.objects.filter(owner, id__gt=after).order_by('id').values_list(*fields)[:room + 1])
+        pages[index] = rows[:room]
+        if len(rows) > room:
+            return pages, (index, pages[index][-1][0] if pages[index] else after)
+        room -= len(rows)
+    return pages, None
+
+
+def _delta_page(owner, since_seq, seq, limit):
+    """
+    The rows changed and the ids removed by the next ``limit`` events after
+    ``since_seq`` (through ``seq``), as lists per model, and the sequence
+    number the page goes through.
+    """
+    events = OutboxEvent.objects.filter(owner, pk__gt=since_seq, pk__lte=seq)
+    if not owner:
+        # Admins still see reassigned rows
+        events = events.exclude(action=REASSIGNED)
+    events = list(events.order_by('pk').values_list('pk', 'model', 'object_id', 'action')[:limit + 1])
+    through = events[limit - 1][0] if len(events) > limit else seq
+
+    # The last event of each row decides what is sent
+    last_action = {(model, object_id): action for _, model, object_id, action in events[:limit]}
+    pages, deleted = [], []
+    for _, model, fields, name in SYNCED:
+        changed = [object_id for (event_model, object_id), action in last_action.items()
+                   if event_model == name and action not in REMOVED]
+        pages.append(list(model.objects.filter(owner, id__in=changed).order_by('id').values_list(*fields)))
+        deleted.append(sorted(object_id for (event_model, object_id), action in last_action.items()
+                              if event_model == name and action in REMOVED))
+    return pages, deleted, through
+
+
+def sync_changes(user, watermark=None, limit=DEFAULT_LIMIT):
+    """
+    The changes visible to ``user`` since ``watermark`` (a full sync if None),
+    as a dict ready to be rendered. Raises ValueError for a malformed watermark.
+    """
+    since_seq, resume = decode_watermark(watermark) if watermark else (0, None)
+    pruned = pruned_through()
+    full_resync = watermark is None or (resume is None and since_seq < pruned)
+
+    # Read before the rows: every event through it is committed, and reflected in them
+    seq = OutboxEvent.objects.aggregate(seq=Max('pk'))['seq'] or 0
+    seq = max(seq, since_seq, pruned)
+    if full_resync:
+        since_seq, resume = seq, (0, 0)
+
+    owner = owner_filter(user)
+    pages, deleted = [[] for _ in SYNCED], [[] for _ in SYNCED]
+    if owner is None:
+        through, resume = seq, None
+    elif resume is not None:
+        # Until its last page, a full sync's watermark stays at the sequence number it started from
+        pages, resume = _full_page(owner, resume, limit)
+        through = since_seq
+    else:
+        pages, deleted, through = _delta_page(owner, since_seq, seq, limit)
+
+    payload = {'full_resync': full_resync, 'more': resume is not None or through < seq}
+    for (key, _, fields, _), rows in zip(SYNCED, pages):
+        payload[key] = {'fields': fields, 'rows': rows}
+    payload['watermark'] = encode_watermark(through, resume)
+    payload['deleted'] = {key: ids for (key, _, _, _), ids in zip(SYNCED, deleted)}
+    return payload
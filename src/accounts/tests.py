@@ -1,14 +1,60 @@
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, transaction
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from datetime import timedelta
 from rest_framework.authtoken.models import Token
-from .models import Appointment  
+from .models import (Appointment, ArchivedAppointment, ArchivedMedicalRecord, MedicalRecord, OutboxEvent, OutboxPrune,
+                     RecordAccessLog, RequestProfile, SlowQuery, UserPurge)
+from .compression import CompressionMiddleware
+from .profiling import PROFILE_HEADER
+from .slow_queries import normalize_sql, record as record_slow_queries
+from . import audit, export, slow_queries
+from .purge import soft_delete_user
 from .serializers import AppointmentSerializer
+from .timeline import get_patient_timeline
+from .db_routing import PIN_COOKIE, ReplicaPinningMiddleware, ReplicaRouter, read_from_replica
+from .events import publish_appointment_event
+from .views.async_views import stream_appointment_events
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from django.test import RequestFactory
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from io import StringIO
+from asgiref.sync import iscoroutinefunction
+import asyncio
+import csv
+import gzip
+import importlib
+import io
+import json
+import msgpack
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import zipfile
 
 User = get_user_model()
 
+# The default cache is Redis; tests use an in-process cache instead.
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# The middleware of the production settings: without the sync-only debug toolbar,
+# requests served over ASGI stay async through the middleware chain
+PRODUCTION_MIDDLEWARE = [middleware for middleware in settings.MIDDLEWARE if not middleware.startswith('debug_toolbar.')]
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class AppointmentAPITests(APITestCase):
 
     def setUp(self):
@@ -93,3 +139,1574 @@ class AppointmentAPITests(APITestCase):
         response = self.client.delete(self.appointment_detail_url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Appointment.objects.count(), 0)  # Check if the appointment was deleted
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PatientTimelineTests(APITestCase):
+
+    def setUp(self):
+        """
+        Create a doctor, a patient and an interleaved history of appointments
+        and medical records for the timeline tests.
+        """
+        self.superuser = User.objects.create_superuser(
+            username='admin',
+            password='password123',
+            email='admin@example.com'
+        )
+        self.token = Token.objects.create(user=self.superuser)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+
+        base = timezone.now() - timedelta(days=30)
+        for day in range(5):
+            appointment = Appointment.objects.create(
+                doctor=self.doctor,
+                patient=self.patient,
+                scheduled_at=base + timedelta(days=day * 2),
+            )
+            record = MedicalRecord.objects.create(
+                doctor=self.doctor,
+                patient=self.patient,
+                appointment=appointment,
+                diagnosis=f'Diagnosis {day}',
+                treatment='Rest',
+            )
+            MedicalRecord.objects.filter(pk=record.pk).update(created_at=base + timedelta(days=day * 2 + 1))
+
+    def test_timeline_is_merged_newest_first(self):
+        """
+        The first page interleaves appointments and records in descending time order.
+        """
+        timeline = get_patient_timeline(self.patient, limit=4)
+        timestamps = [entry['timestamp'] for entry in timeline['entries']]
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+        self.assertEqual([entry['kind'] for entry in timeline['entries']], ['record', 'appointment'] * 2)
+        self.assertIsNotNone(timeline['next_cursor'])
+
+    def test_timeline_pages_cover_all_entries_with_constant_queries(self):
+        """
+        Walking the cursor visits every entry exactly once, with one query per source per page.
+        """
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(4):
+                timeline = get_patient_timeline(self.patient, cursor, limit=3)
+            seen.extend((entry['kind'], entry['object'].pk) for entry in timeline['entries'])
+            cursor = timeline['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+
+    def test_timeline_api(self):
+        """
+        The API returns serialized entries and rejects malformed cursors.
+        """
+        url = reverse('patient-timeline', kwargs={'pk': self.patient.pk})
+        response = self.client.get(url, {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['data']['diagnosis'], 'Diagnosis 4')
+
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecordListViewTests(TestCase):
+
+    def setUp(self):
+        """
+        Create a doctor with one appointment and log in as that doctor.
+        """
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        self.appointment = Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+        self.url = reverse('record_list_view', kwargs={'appointment_id': self.appointment.pk})
+        self.client.force_login(self.doctor)
+
+    def create_record(self, diagnosis):
+        return self.client.post(reverse('records'), {
+            'appointment_id': self.appointment.pk,
+            'patient_id': self.patient.pk,
+            'doctor_id': self.doctor.pk,
+            'type': 'create',
+            'diagnosis': diagnosis,
+            'treatment': 'Rest',
+        })
+
+    def test_records_are_addressed_by_url_without_session_state(self):
+        """
+        Creating a record redirects to the appointment's record URL and stores nothing in the session.
+        """
+        response = self.create_record('Flu')
+        self.assertRedirects(response, self.url)
+        self.assertNotIn('appointment_id', self.client.session)
+
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Flu')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_record_list_fragment_is_invalidated_on_create(self):
+        """
+        A cached record list is reused until a new record bumps the record version.
+        """
+        first = self.client.get(self.url)
+        self.assertContains(first, 'No medical records found')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.create_record('Migraine')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Migraine')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AdminChangelistTests(TestCase):
+
+    def setUp(self):
+        """
+        Log in as a superuser and create a doctor and a patient.
+        """
+        self.superuser = User.objects.create_superuser(username='admin', password='password123', email='admin@example.com')
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        self.client.force_login(self.superuser)
+
+    def create_appointments(self, count):
+        for _ in range(count):
+            appointment = Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+            MedicalRecord.objects.create(doctor=self.doctor, patient=self.patient, appointment=appointment, diagnosis='Flu', treatment='Rest')
+
+    def count_changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """
+        Appointment and record changelists use a constant number of queries.
+        """
+        for name in ('admin:accounts_appointment_changelist', 'admin:accounts_medicalrecord_changelist'):
+            self.create_appointments(1)
+            few = self.count_changelist_queries(reverse(name))
+            self.create_appointments(10)
+            self.assertEqual(self.count_changelist_queries(reverse(name)), few)
+
+    def test_autocomplete_is_restricted_by_role(self):
+        """
+        The doctor autocomplete on appointments only offers doctors.
+        """
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'accounts', 'model_name': 'appointment', 'field_name': 'doctor', 'term': '',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['id'] for result in response.json()['results']], [str(self.doctor.pk)])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncReadAPITests(TestCase):
+
+    def setUp(self):
+        """
+        Create a superuser with a token, a doctor, a patient and one appointment.
+        """
+        self.superuser = User.objects.create_superuser(username='admin', password='password123', email='admin@example.com')
+        self.headers = {'Authorization': 'Token ' + Token.objects.create(user=self.superuser).key}
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        self.appointment = Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+
+    async def test_async_appointment_list_requires_token(self):
+        """
+        Requests without a valid token are rejected.
+        """
+        response = await self.async_client.get(reverse('async-appointment-list'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_async_appointment_list_is_invalidated_on_write(self):
+        """
+        The cached list is rebuilt once an appointment is created.
+        """
+        response = await self.async_client.get(reverse('async-appointment-list'), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.json()], [self.appointment.pk])
+
+        created = await Appointment.objects.acreate(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+        response = await self.async_client.get(reverse('async-appointment-list'), headers=self.headers)
+        self.assertEqual([item['id'] for item in response.json()], [self.appointment.pk, created.pk])
+
+    async def test_async_dashboards(self):
+        """
+        The doctor and admin dashboards return the doctor's appointments and global counts.
+        """
+        response = await self.async_client.get(
+            reverse('async-doctor-dashboard', kwargs={'doctor_id': self.doctor.pk}), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['appointments'][0]['patient_id'], self.patient.pk)
+
+        response = await self.async_client.get(reverse('async-admin-dashboard'), headers=self.headers)
+        self.assertEqual(response.json()['appointments'], 1)
+
+    async def test_admin_dashboard_counts_follow_records_and_users(self):
+        """
+        The cached admin dashboard is refreshed when a record or a user is added.
+        """
+        response = await self.async_client.get(reverse('async-admin-dashboard'), headers=self.headers)
+        records, patients = response.json()['records'], response.json()['patients']
+
+        await MedicalRecord.objects.acreate(doctor=self.doctor, patient=self.patient, appointment=self.appointment,
+                                            diagnosis='Flu', treatment='Rest')
+        await User.objects.acreate(username='patient2', email='patient2@example.com', role='patient')
+        response = await self.async_client.get(reverse('async-admin-dashboard'), headers=self.headers)
+        self.assertEqual(response.json()['records'], records + 1)
+        self.assertEqual(response.json()['patients'], patients + 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, READ_REPLICA_ALIAS='replica', REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+
+    def test_reads_use_replica_only_when_opted_in(self):
+        """
+        Reads go to the replica inside read_from_replica() and writes always go to the primary.
+        """
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Appointment))
+        with read_from_replica():
+            self.assertEqual(router.db_for_read(Appointment), 'replica')
+            self.assertEqual(router.db_for_write(Appointment), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'accounts'))
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        """
+        A successful POST sets the pin cookie, and pinned requests read from the primary.
+        """
+        router = ReplicaRouter()
+        seen = []
+
+        def view(request):
+            with read_from_replica():
+                seen.append(router.db_for_read(Appointment))
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(view)
+        response = middleware(RequestFactory().post('/record/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        request = RequestFactory().get('/doctors/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        middleware(request)
+        middleware(RequestFactory().get('/doctors/'))
+        self.assertEqual(seen, ['replica', None, 'replica'])  # None falls back to the primary
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ArchiveAppointmentsTests(TestCase):
+
+    def setUp(self):
+        """
+        Create old and recent appointments in every status, each with one medical record.
+        """
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        old, recent = timezone.now() - timedelta(days=400), timezone.now() - timedelta(days=10)
+        for scheduled_at in (old, recent):
+            for appointment_status in ('pending', 'completed', 'cancelled'):
+                appointment = Appointment.objects.create(
+                    doctor=self.doctor, patient=self.patient, scheduled_at=scheduled_at, status=appointment_status)
+                MedicalRecord.objects.create(
+                    doctor=self.doctor, patient=self.patient, appointment=appointment,
+                    diagnosis=f'{appointment_status} diagnosis', treatment='Rest')
+
+    def test_archive_moves_old_finished_appointments_in_batches(self):
+        """
+        Old completed and cancelled appointments and their records move to the
+        archive tables with their ids; pending and recent ones stay.
+        """
+        archivable = set(Appointment.objects.filter(
+            status__in=('completed', 'cancelled'), scheduled_at__lt=timezone.now() - timedelta(days=365),
+        ).values_list('pk', flat=True))
+
+        call_command('archive_appointments', days=365, batch_size=1, stdout=StringIO())
+
+        self.assertEqual(set(ArchivedAppointment.objects.values_list('pk', flat=True)), archivable)
+        self.assertEqual(set(ArchivedMedicalRecord.objects.values_list('appointment_id', flat=True)), archivable)
+        self.assertFalse(Appointment.objects.filter(pk__in=archivable).exists())
+        self.assertFalse(MedicalRecord.objects.filter(appointment_id__in=archivable).exists())
+        self.assertEqual(Appointment.objects.count(), 4)
+        self.assertEqual(MedicalRecord.objects.count(), 4)
+        self.assertEqual(OutboxEvent.objects.filter(action='archived').count(), 2 * len(archivable))
+        self.assertFalse(OutboxEvent.objects.filter(action='deleted').exists())
+
+    def test_records_added_during_a_batch_are_never_deleted_uncopied(self):
+        """
+        A record written between the copy and the delete rolls the batch back instead of being lost.
+        """
+        copy_records = ArchivedMedicalRecord.objects.bulk_create
+        late = []
+
+        def copy_then_add_record(rows, **kwargs):
+            archived = copy_records(rows, **kwargs)
+            appointment = Appointment.objects.get(pk=archived[0].appointment_id)
+            late.append(MedicalRecord.objects.create(doctor=self.doctor, patient=self.patient, appointment=appointment,
+                                                     diagnosis='Late', treatment='Rest'))
+            return archived
+
+        with mock.patch.object(ArchivedMedicalRecord.objects, 'bulk_create', side_effect=copy_then_add_record):
+            with self.assertRaises(CommandError):
+                call_command('archive_appointments', days=365, batch_size=1, stdout=StringIO())
+
+        self.assertFalse(ArchivedAppointment.objects.exists())
+        self.assertFalse(ArchivedMedicalRecord.objects.exists())
+        self.assertEqual(MedicalRecord.objects.count(), 6)
+
+    def test_timeline_includes_archived_history(self):
+        """
+        The patient timeline reads archived appointments and records transparently.
+        """
+        call_command('archive_appointments', days=365, stdout=StringIO())
+
+        timeline = get_patient_timeline(self.patient, limit=100)
+        self.assertEqual(len(timeline['entries']), 12)
+        archived = [entry for entry in timeline['entries'] if hasattr(entry['object'], 'archived_at')]
+        self.assertEqual(len(archived), 4)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportUsersTests(TestCase):
+
+    def write_csv(self, rows):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False)
+        self.addCleanup(os.remove, handle.name)
+        writer = csv.writer(handle)
+        writer.writerow(['full_name', 'username', 'email', 'password', 'gender', 'specialization', 'role'])
+        writer.writerows(rows)
+        handle.close()
+        return handle.name
+
+    def test_import_creates_valid_rows_and_reports_errors(self):
+        """
+        Valid rows are created with hashed passwords; invalid and duplicate rows are reported by line.
+        """
+        User.objects.create_user(username='taken', password='password123', email='taken@example.com', role='patient')
+        path = self.write_csv([
+            ['Doc One', 'doc1', 'doc1@example.com', 'secret1', 'male', 'Cardiology', 'doctor'],
+            ['Pat One', 'pat1', 'pat1@example.com', 'secret2', 'female', '', ''],
+            ['Bad Email', 'bad', 'not-an-email', 'secret3', 'male', '', ''],
+            ['Pat Again', 'pat1', 'other@example.com', 'secret4', 'female', '', ''],
+            ['Taken', 'taken2', 'taken@example.com', 'secret5', 'male', '', ''],
+        ])
+        stdout, stderr = StringIO(), StringIO()
+
+        call_command('import_users', path, role='patient', workers=1, batch_size=2, stdout=stdout, stderr=stderr)
+
+        doctor = User.objects.get(username='doc1')
+        self.assertEqual(doctor.role, 'doctor')
+        self.assertTrue(doctor.check_password('secret1'))
+        self.assertEqual(User.objects.get(username='pat1').role, 'patient')
+        self.assertFalse(User.objects.filter(username__in=['bad', 'taken2']).exists())
+        errors = stderr.getvalue()
+        self.assertIn('Line 4: email', errors)
+        self.assertIn('Line 5: username "pat1"', errors)
+        self.assertIn('Line 6: a user with email', errors)
+        self.assertIn('Imported 2 users, 3 rows failed.', stdout.getvalue())
+
+    def test_import_rows_without_username_next_to_existing_user_without_username(self):
+        """
+        An existing user without a username does not make username-less rows duplicates.
+        """
+        User.objects.create(username=None, email='nameless@example.com', role='patient')
+        path = self.write_csv([
+            ['New Patient', '', 'fresh@example.com', 'secret1', 'female', '', ''],
+            ['Same Email', '', 'nameless@example.com', 'secret2', 'male', '', ''],
+        ])
+        stdout, stderr = StringIO(), StringIO()
+
+        call_command('import_users', path, role='patient', workers=1, batch_size=2, stdout=stdout, stderr=stderr)
+
+        created = User.objects.get(email='fresh@example.com')
+        self.assertIsNone(created.username)
+        self.assertIn('Line 3: a user with email', stderr.getvalue())
+        self.assertIn('Imported 1 users, 1 rows failed.', stdout.getvalue())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OverdueSweepTests(TestCase):
+
+    def setUp(self):
+        """
+        Create past and future appointments in several statuses.
+        """
+        self.admin = User.objects.create_user(username='admin', password='password123', email='admin@example.com', role='admin')
+        doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        past, future = timezone.now() - timedelta(hours=2), timezone.now() + timedelta(hours=2)
+        self.past_pending = [
+            Appointment.objects.create(doctor=doctor, patient=patient, scheduled_at=past) for _ in range(3)
+        ]
+        Appointment.objects.create(doctor=doctor, patient=patient, scheduled_at=past, status='completed')
+        Appointment.objects.create(doctor=doctor, patient=patient, scheduled_at=future)
+
+    def test_mark_overdue_updates_past_pending_appointments_in_one_query(self):
+        """
+        The sweep marks only past-due pending appointments with a single UPDATE,
+        and records their outbox events with a single INSERT.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            marked = Appointment.objects.mark_overdue()
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertEqual(statements.count('UPDATE'), 1)
+        self.assertEqual(statements.count('INSERT'), 1)
+        self.assertEqual(marked, 3)
+        self.assertEqual(OutboxEvent.objects.filter(action='updated', payload__status='overdue').count(), 3)
+        self.assertEqual(
+            set(Appointment.objects.filter(status='overdue').values_list('pk', flat=True)),
+            {appointment.pk for appointment in self.past_pending},
+        )
+        self.assertTrue(Appointment.objects.get(pk=self.past_pending[0].pk).is_past_due())
+
+    def test_mark_overdue_works_in_bounded_batches(self):
+        """
+        The sweep updates at most batch_size appointments per UPDATE and still marks them all.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            marked = Appointment.objects.mark_overdue(batch_size=2)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(marked, 3)
+        self.assertEqual(OutboxEvent.objects.filter(action='updated', payload__status='overdue').count(), 3)
+        self.assertFalse(Appointment.objects.past_due().exists())
+
+    def test_dashboard_shows_overdue_count(self):
+        """
+        The mark_overdue command's result is counted on the admin dashboard.
+        """
+        call_command('mark_overdue', stdout=StringIO())
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['overdue_count'], 3)
+        self.assertEqual(response.context['appointment_count'], 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, DOCTOR_DAILY_CAPACITY=2)
+class DoctorAnalyticsTests(APITestCase):
+
+    def setUp(self):
+        """
+        Create two doctors with appointments in different statuses on a known Monday.
+        """
+        self.superuser = User.objects.create_superuser(username='admin', password='password123', email='admin@example.com')
+        self.token = Token.objects.create(user=self.superuser)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.busy = User.objects.create_user(username='busy', password='password123', email='busy@example.com', role='doctor', full_name='Busy')
+        self.quiet = User.objects.create_user(username='quiet', password='password123', email='quiet@example.com', role='doctor', full_name='Quiet')
+        patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        monday_9am = timezone.make_aware(timezone.datetime(2024, 1, 1, 9, 30))
+        for appointment_status in ('completed', 'completed', 'cancelled', 'overdue'):
+            Appointment.objects.create(doctor=self.busy, patient=patient, scheduled_at=monday_9am, status=appointment_status)
+        Appointment.objects.create(doctor=self.quiet, patient=patient, scheduled_at=monday_9am + timedelta(days=1, hours=5),
+                                   status='completed')
+
+    def test_analytics_endpoint(self):
+        """
+        Rates, utilization and the heatmap are computed per doctor for the requested period.
+        """
+        response = self.client.get(reverse('doctor-analytics'), {'start_date': '2024-01-01', 'end_date': '2024-01-07'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+
+        self.assertEqual(data['period']['working_days'], 5)
+        self.assertEqual(data['totals'], {'appointments': 5, 'completed': 3, 'cancelled': 1, 'no_shows': 1})
+        busy = data['doctors'][0]
+        self.assertEqual((busy['id'], busy['appointments'], busy['completed'], busy['no_shows']), (self.busy.pk, 4, 2, 1))
+        self.assertEqual(busy['completion_rate'], 0.5)
+        self.assertEqual(busy['cancellation_rate'], 0.25)
+        self.assertEqual(busy['utilization'], 0.3)  # 3 kept appointments / (5 days x 2)
+        self.assertEqual(data['heatmap']['appointments'][0][9], 4)
+        self.assertEqual(data['heatmap']['appointments'][1][14], 1)
+        self.assertEqual(data['heatmap']['no_shows'][0][9], 1)
+
+    def test_analytics_rejects_invalid_period(self):
+        """
+        An inverted or malformed period is a 400 error.
+        """
+        response = self.client.get(reverse('doctor-analytics'), {'start_date': '2024-02-01', 'end_date': '2024-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_analytics_page(self):
+        """
+        The admin analytics page renders the doctors and the heatmap.
+        """
+        self.client.force_login(self.superuser)
+        response = self.client.get(reverse('doctor_analytics_view'), {'start_date': '2024-01-01', 'end_date': '2024-01-07'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Busy')
+        self.assertEqual(len(response.context['heatmap_rows']), 7)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FacetCountTests(TestCase):
+
+    def setUp(self):
+        """
+        Log in and create doctors with several specializations and patients of both genders.
+        """
+        self.admin = User.objects.create_user(username='admin', password='password123', email='admin@example.com', role='admin')
+        for i, specialization in enumerate(['Cardiology', 'Cardiology', 'Neurology', None]):
+            User.objects.create_user(username=f'doc{i}', password='password123', email=f'doc{i}@example.com',
+                                     role='doctor', full_name=f'Doctor {i}', specialization=specialization)
+        for i, gender in enumerate(['male', 'female', 'female']):
+            User.objects.create_user(username=f'pat{i}', password='password123', email=f'pat{i}@example.com',
+                                     role='patient', full_name=f'Patient {i}', gender=gender)
+        self.client.force_login(self.admin)
+
+    def grouped_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries if 'GROUP BY' in query['sql']]
+
+    def test_doctor_specialization_facets_use_one_cached_grouped_query(self):
+        """
+        Specialization counts come from one GROUP BY query, cached until a user changes.
+        """
+        response, grouped = self.grouped_queries(reverse('doctor_list_view'))
+        self.assertEqual(len(grouped), 1)
+        self.assertEqual(response.context['specialization_facets'], [
+            {'value': 'Cardiology', 'count': 2},
+            {'value': 'Neurology', 'count': 1},
+        ])
+
+        _, grouped = self.grouped_queries(reverse('doctor_list_view'))
+        self.assertEqual(grouped, [])
+
+        User.objects.create_user(username='doc9', password='password123', email='doc9@example.com',
+                                 role='doctor', specialization='Neurology')
+        response, grouped = self.grouped_queries(reverse('doctor_list_view'))
+        self.assertEqual(len(grouped), 1)
+        self.assertEqual(response.context['specialization_facets'][1], {'value': 'Neurology', 'count': 2})
+
+    def test_patient_gender_facets_and_exact_filter(self):
+        """
+        Gender counts are shown, and filtering on 'male' does not match 'female'.
+        """
+        response, _ = self.grouped_queries(reverse('patient_list_view'), {'gender': 'male'})
+        self.assertEqual(response.context['gender_facets'], [
+            {'value': 'female', 'count': 2},
+            {'value': 'male', 'count': 1},
+        ])
+        self.assertEqual([patient.username for patient in response.context['patients']], ['pat0'])
+        self.assertContains(response, 'Female (2)')
+
+    def test_report_keeps_selected_status_without_matches(self):
+        """
+        Statuses with no matches under the other filters stay in the dropdown, the selected one still selected.
+        """
+        Appointment.objects.create(doctor=User.objects.get(username='doc0'), patient=User.objects.get(username='pat0'),
+                                   scheduled_at=timezone.now())
+        response = self.client.get(reverse('admin_appointment_report_view'), {'status': 'cancelled', 'doctor': 'Doctor 0'})
+        counts = {facet['value']: facet['count'] for facet in response.context['status_facets']}
+        self.assertEqual(counts, {'pending': 1, 'overdue': 0, 'completed': 0, 'cancelled': 0})
+        self.assertContains(response, '<option value="cancelled" selected>Cancelled (0)</option>', html=True)
+
+    def test_login_does_not_invalidate_cached_facets(self):
+        """
+        Logging in only stamps last_login and keeps the cached user reads.
+        """
+        self.grouped_queries(reverse('doctor_list_view'))
+        self.client.login(username='doc0', password='password123')
+        self.client.force_login(self.admin)
+
+        _, grouped = self.grouped_queries(reverse('doctor_list_view'))
+        self.assertEqual(grouped, [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ChangeFeedTests(APITestCase):
+
+    def setUp(self):
+        """
+        Authenticate as a superuser and create a doctor and a patient.
+        """
+        self.superuser = User.objects.create_superuser(username='admin', password='password123', email='admin@example.com')
+        self.token = Token.objects.create(user=self.superuser)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+
+    def read_feed(self, since=0, **params):
+        response = self.client.get(reverse('change-feed'), {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_changes_are_streamed_in_sequence_order(self):
+        """
+        Creating, updating and deleting appointments and records yields events in order.
+        """
+        appointment = Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+        MedicalRecord.objects.create(doctor=self.doctor, patient=self.patient, appointment=appointment,
+                                     diagnosis='Flu', treatment='Rest')
+        appointment.status = 'completed'
+        appointment.save()
+        appointment_id = appointment.pk
+        appointment.delete()  # Cascades to the record
+
+        events = self.read_feed()
+        self.assertEqual([(event['model'], event['action']) for event in events], [
+            ('appointment', 'created'), ('record', 'created'), ('appointment', 'updated'),
+            ('record', 'deleted'), ('appointment', 'deleted'),
+        ])
+        self.assertEqual([event['seq'] for event in events], sorted(event['seq'] for event in events))
+        self.assertEqual(events[2]['payload']['status'], 'completed')
+        self.assertEqual(events[4]['object_id'], appointment_id)
+
+        self.assertEqual(len(self.read_feed(since=events[2]['seq'])), 2)
+        self.assertEqual(len(self.read_feed(limit=1)), 1)
+
+    def test_rolled_back_changes_have_no_events(self):
+        """
+        The outbox row is written in the transaction of the change.
+        """
+        try:
+            with transaction.atomic():
+                Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.read_feed(), [])
+
+    def test_consumers_behind_pruned_events_must_resync(self):
+        """
+        After pruning, positions before the pruned range get 410 Gone.
+        """
+        for _ in range(3):
+            Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+        call_command('prune_outbox', days=0, stdout=StringIO())
+
+        self.assertEqual(OutboxEvent.objects.count(), 0)
+        response = self.client.get(reverse('change-feed'), {'since': 0})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        latest = response.json()['pruned_through']
+        self.assertEqual(self.read_feed(since=latest), [])
+
+    def test_events_are_served_once_committed(self):
+        """
+        Sequence numbers follow commit order, so committed events are served without a settling delay.
+        """
+        Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+        self.assertEqual([event['action'] for event in self.read_feed()], ['created'])
+
+    def test_prune_deletes_only_events_older_than_the_cutoff(self):
+        """
+        Pruning filters on the cutoff as well as the sequence number it prunes through.
+        """
+        for _ in range(3):
+            Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+        first, second, third = OutboxEvent.objects.order_by('pk')
+        OutboxEvent.objects.filter(pk__in=[first.pk, third.pk]).update(created_at=timezone.now() - timedelta(days=30))
+
+        call_command('prune_outbox', days=7, stdout=StringIO())
+        self.assertEqual(list(OutboxEvent.objects.values_list('pk', flat=True)), [second.pk])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, EVENT_BROKER='memory')
+class AppointmentEventStreamTests(TestCase):
+
+    def setUp(self):
+        """
+        Create a doctor, a patient and one appointment (with its outbox event).
+        """
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        self.appointment = Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+
+    def test_committed_changes_are_published_to_doctor_and_admins(self):
+        """
+        Appointment changes are published once committed, cancellations as 'cancelled'.
+        """
+        with mock.patch('accounts.events.get_broker') as get_broker, self.captureOnCommitCallbacks(execute=True):
+            self.appointment.status = 'cancelled'
+            self.appointment.save()
+
+        channels = [call.args[0] for call in get_broker.return_value.publish.call_args_list]
+        self.assertEqual(channels, [f'doctor:{self.doctor.pk}', 'admins'])
+        message = json.loads(get_broker.return_value.publish.call_args.args[1])
+        self.assertEqual((message['type'], message['appointment_id']), ('cancelled', self.appointment.pk))
+
+    async def test_doctors_can_open_the_stream(self):
+        """
+        The endpoint answers a logged-in doctor with an event stream.
+        """
+        await self.async_client.aforce_login(self.doctor)
+        response = await self.async_client.get(reverse('appointment-events'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+    async def test_stream_replays_missed_events_then_pushes_live_ones(self):
+        """
+        A reconnecting client first gets the events after its Last-Event-ID, then live events.
+        """
+        first = await OutboxEvent.objects.filter(model='appointment').afirst()
+        stream = stream_appointment_events(f'doctor:{self.doctor.pk}', self.doctor.pk, first.pk - 1)
+        try:
+            self.assertTrue((await anext(stream)).startswith('retry:'))
+            replayed = await anext(stream)
+            self.assertTrue(replayed.startswith(f'id: {first.pk}\n'))
+
+            live = OutboxEvent(pk=first.pk + 1000, model='appointment', object_id=self.appointment.pk, action='updated',
+                               doctor_id=self.doctor.pk, patient_id=self.patient.pk, payload={'status': 'completed'})
+            publish_appointment_event(live)
+            pushed = await asyncio.wait_for(anext(stream), timeout=5)
+            self.assertIn('"status": "completed"', pushed)
+        finally:
+            await stream.aclose()
+
+    async def test_patients_cannot_subscribe(self):
+        """
+        Only doctors and admins can open the stream.
+        """
+        await self.async_client.aforce_login(self.patient)
+        response = await self.async_client.get(reverse('appointment-events'))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StartupSettingsTests(TestCase):
+
+    def load_production_settings(self, **environ):
+        module = 'hospital_management_system.settings_production'
+        sys.modules.pop(module, None)
+        self.addCleanup(sys.modules.pop, module, None)
+        with mock.patch.dict(os.environ, environ):
+            if 'SECRET_KEY' not in environ:
+                os.environ.pop('SECRET_KEY', None)
+            return importlib.import_module(module)
+
+    def test_production_settings_leave_out_dev_apps(self):
+        """
+        The production profile drops the debug toolbar and drf_yasg.
+        """
+        settings_production = self.load_production_settings(SECRET_KEY='production-key')
+        self.assertNotIn('debug_toolbar', settings_production.INSTALLED_APPS)
+        self.assertNotIn('drf_yasg', settings_production.INSTALLED_APPS)
+        self.assertIn('crispy_forms', settings_production.INSTALLED_APPS)
+        self.assertNotIn('debug_toolbar.middleware.DebugToolbarMiddleware', settings_production.MIDDLEWARE)
+        self.assertFalse(settings_production.DEBUG)
+
+    def test_production_settings_require_a_secret_key(self):
+        """
+        The production profile takes SECRET_KEY from the environment and never falls back to the development key.
+        """
+        self.assertEqual(self.load_production_settings(SECRET_KEY='production-key').SECRET_KEY, 'production-key')
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_production_settings(SECRET_KEY='')
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_production_settings()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OpenAPISchemaTests(TestCase):
+
+    def setUp(self):
+        """
+        Build the schema into a temporary directory.
+        """
+        schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(schema_dir.cleanup)
+        settings_override = override_settings(OPENAPI_SCHEMA_DIR=schema_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('build_openapi_schema', stdout=StringIO(), stderr=StringIO())
+        with open(os.path.join(schema_dir.name, 'schema.json'), 'rb') as schema_file:
+            self.schema = schema_file.read()
+
+    def test_serves_prebuilt_schema_with_etag(self):
+        """
+        The prebuilt schema is served as is, and revalidated with its ETag.
+        """
+        url = reverse('openapi-schema', kwargs={'fmt': 'json'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.schema)
+        self.assertEqual(json.loads(response.content)['info']['title'], 'HealthSync API')
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_swagger_ui_points_at_versioned_schema(self):
+        """
+        The UI loads the schema by its content hash, which may be cached for good.
+        """
+        response = self.client.get(reverse('schema-swagger-ui'))
+        self.assertEqual(response.status_code, 200)
+        schema_url = response.context['schema_url']
+        self.assertIn('?v=', schema_url)
+        self.assertContains(response, 'swagger-ui-bundle.js')
+
+        response = self.client.get(schema_url)
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MedicalRecordSearchTests(APITestCase):
+
+    def setUp(self):
+        """
+        Create two doctors with records for two patients.
+        """
+        self.admin = User.objects.create_superuser(username='admin', password='password123', email='admin@example.com')
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.other_doctor = User.objects.create_user(username='doc2', password='password123', email='doc2@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        self.other_patient = User.objects.create_user(username='pat2', password='password123', email='pat2@example.com', role='patient')
+        self.url = reverse('record-search')
+
+        self.asthma = self.create_record(self.doctor, self.patient, 'Asthma', 'Inhaler twice daily', 'Wheezing <at night>')
+        self.fracture = self.create_record(self.doctor, self.other_patient, 'Wrist fracture', 'Cast for six weeks',
+                                           'Follow up on wheezing')
+        self.other = self.create_record(self.other_doctor, self.patient, 'Seasonal asthma', 'Antihistamines', None)
+
+    def create_record(self, doctor, patient, diagnosis, treatment, notes):
+        appointment = Appointment.objects.create(doctor=doctor, patient=patient, scheduled_at=timezone.now())
+        return MedicalRecord.objects.create(doctor=doctor, patient=patient, appointment=appointment,
+                                            diagnosis=diagnosis, treatment=treatment, notes=notes)
+
+    def search(self, user, **params):
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_ranks_diagnosis_matches_first_and_highlights(self):
+        """
+        Matches in the diagnosis outrank matches in the notes; snippets mark the terms and escape the rest.
+        """
+        results = self.search(self.admin, q='wheezing')
+        self.assertEqual([result['record']['id'] for result in results], [self.asthma.pk, self.fracture.pk])
+
+        results = self.search(self.admin, q='asthma')
+        self.assertEqual({result['record']['id'] for result in results}, {self.asthma.pk, self.other.pk})
+        self.assertIn('<mark>Asthma</mark>', results[0]['snippet'] + results[1]['snippet'])
+
+        wheezing = self.search(self.admin, q='wheezing night')[0]['snippet']
+        self.assertIn('<mark>Wheezing</mark>', wheezing)
+        self.assertIn('&lt;at', wheezing)
+
+    def test_results_are_scoped_to_the_user(self):
+        """
+        Doctors find the records they wrote, patients their own records.
+        """
+        results = self.search(self.doctor, q='asthma')
+        self.assertEqual([result['record']['id'] for result in results], [self.asthma.pk])
+
+        results = self.search(self.patient, q='wheezing')
+        self.assertEqual([result['record']['id'] for result in results], [self.asthma.pk])
+
+        results = self.search(self.doctor, q='wheezing', patient=self.other_patient.pk)
+        self.assertEqual([result['record']['id'] for result in results], [self.fracture.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        """
+        The index is updated when a record is edited or deleted.
+        """
+        self.fracture.diagnosis = 'Bronchitis'
+        self.fracture.save()
+        self.assertEqual(len(self.search(self.admin, q='fracture')), 0)
+        self.assertEqual([result['record']['id'] for result in self.search(self.admin, q='bronchitis')], [self.fracture.pk])
+
+        MedicalRecord.objects.filter(pk=self.fracture.pk).update(treatment='Nebulizer')
+        self.assertEqual(len(self.search(self.admin, q='nebulizer')), 1)
+
+        self.fracture.delete()
+        self.assertEqual(len(self.search(self.admin, q='bronchitis')), 0)
+
+    def test_operators_in_query_are_ignored(self):
+        """
+        FTS syntax in the query is treated as plain words; an empty query is rejected.
+        """
+        self.assertEqual(len(self.search(self.admin, q='"asthma* (')), 2)
+        response = self.client.get(self.url, {'q': '  '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_search_matches_record_text(self):
+        """
+        The admin changelist search finds records by their text and by doctor name.
+        """
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:accounts_medicalrecord_changelist'), {'q': 'inhaler'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.asthma])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PatientExportTests(TestCase):
+
+    def setUp(self):
+        """
+        Create a patient with live and archived appointments, records and report files.
+        """
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = User.objects.create_superuser(username='admin', password='password123', email='admin@example.com')
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com',
+                                               role='doctor', full_name='Dr. Who')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com',
+                                                role='patient', full_name='Pat')
+        old = Appointment.objects.create(doctor=self.doctor, patient=self.patient, status='completed',
+                                         scheduled_at=timezone.now() - timedelta(days=800))
+        MedicalRecord.objects.create(doctor=self.doctor, patient=self.patient, appointment=old, diagnosis='Sprain',
+                                     treatment='Rest', report=SimpleUploadedFile('old.pdf', b'%PDF old'))
+        call_command('archive_appointments', days=365, stdout=StringIO())
+
+        appointment = Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+        self.report = os.urandom(200 * 1024)
+        self.record = MedicalRecord.objects.create(doctor=self.doctor, patient=self.patient, appointment=appointment,
+                                                   diagnosis='Flu, "severe"', treatment='Fluids',
+                                                   report=SimpleUploadedFile('scan.pdf', self.report))
+        missing = MedicalRecord.objects.create(doctor=self.doctor, patient=self.patient, appointment=appointment,
+                                               diagnosis='Cough', treatment='Syrup',
+                                               report=SimpleUploadedFile('gone.pdf', b'gone'))
+        missing.report.storage.delete(missing.report.name)
+
+    def download(self):
+        response = self.client.get(reverse('patient_export_view', args=[self.patient.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_bundle_contains_rows_reports_and_summary(self):
+        """
+        The ZIP holds the CSV rows (live and archived), the report files and the summary.
+        """
+        self.client.force_login(self.admin)
+        bundle = self.download()
+        self.assertIsNone(bundle.testzip())
+
+        appointments = list(csv.DictReader(io.TextIOWrapper(bundle.open('appointments.csv'), encoding='utf-8')))
+        self.assertEqual([row['archived'] for row in appointments], ['False', 'True'])
+
+        records = list(csv.DictReader(io.TextIOWrapper(bundle.open('medical_records.csv'), encoding='utf-8')))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['diagnosis'], 'Flu, "severe"')
+        self.assertEqual(records[0]['doctor'], 'Dr. Who')
+
+        report = next(row['report'] for row in records if row['id'] == str(self.record.pk))
+        self.assertEqual(bundle.read(report), self.report)
+        self.assertEqual(bundle.getinfo(report).compress_type, zipfile.ZIP_STORED)
+
+        summary = json.loads(bundle.read('summary.json'))
+        self.assertEqual(summary['patient']['full_name'], 'Pat')
+        self.assertEqual(summary['counts'], {'appointments': 2, 'medical_records': 3, 'reports': 2, 'missing_reports': 1})
+
+    def test_only_admins_and_the_patients_doctors_can_export(self):
+        """
+        A doctor who never saw the patient is sent to the login page.
+        """
+        stranger = User.objects.create_user(username='doc2', password='password123', email='doc2@example.com', role='doctor')
+        self.client.force_login(stranger)
+        response = self.client.get(reverse('patient_export_view', args=[self.patient.pk]))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.force_login(self.doctor)
+        self.assertEqual(len(self.download().namelist()), 5)
+
+    def test_doctor_with_only_archived_appointments_can_export(self):
+        """
+        A doctor whose appointments with the patient have all been archived can still export the chart.
+        """
+        former = User.objects.create_user(username='doc3', password='password123', email='doc3@example.com', role='doctor')
+        Appointment.objects.create(doctor=former, patient=self.patient, status='completed',
+                                   scheduled_at=timezone.now() - timedelta(days=700))
+        call_command('archive_appointments', days=365, stdout=StringIO())
+        self.assertFalse(Appointment.objects.filter(doctor=former).exists())
+
+        self.client.force_login(former)
+        self.assertIn('summary.json', self.download().namelist())
+
+    async def test_asgi_download_streams_chunk_by_chunk(self):
+        """
+        Under ASGI each chunk is sent as soon as it is produced, not after the whole archive is built.
+        """
+        drains = []
+        drain = export._ZipStream.drain
+
+        def counting_drain(stream):
+            data = drain(stream)
+            if data:
+                drains.append(data)
+            return data
+
+        await self.async_client.aforce_login(self.admin)
+        with mock.patch.object(export._ZipStream, 'drain', counting_drain):
+            response = await self.async_client.get(reverse('patient_export_view', args=[self.patient.pk]))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            chunks = []
+            async for chunk in response.streaming_content:
+                chunks.append(chunk)
+                if len(chunks) == 1:
+                    self.assertEqual(len(drains), 1)
+        self.assertGreater(len(chunks), 3)
+        bundle = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertIsNone(bundle.testzip())
+        self.assertEqual(bundle.read(export.report_name(self.record)), self.report)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UserPurgeTests(TestCase):
+
+    def setUp(self):
+        """
+        Create a doctor with appointments, records and report files for two patients.
+        """
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = User.objects.create_superuser(username='admin', password='password123', email='admin@example.com')
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        self.other_patient = User.objects.create_user(username='pat2', password='password123', email='pat2@example.com',
+                                                      role='patient')
+        for patient in (self.patient, self.other_patient):
+            for _ in range(3):
+                appointment = Appointment.objects.create(doctor=self.doctor, patient=patient, scheduled_at=timezone.now())
+                MedicalRecord.objects.create(doctor=self.doctor, patient=patient, appointment=appointment, diagnosis='Flu',
+                                             treatment='Rest', report=SimpleUploadedFile('scan.pdf', b'%PDF'))
+        self.client.force_login(self.admin)
+
+    def test_delete_view_soft_deletes_and_queues_purge(self):
+        """
+        Deleting a doctor hides them at once and keeps their data until the purge runs.
+        """
+        response = self.client.post(reverse('delete_doctor_view', args=[self.doctor.pk]))
+        self.assertRedirects(response, reverse('doctor_list_view'), fetch_redirect_response=False)
+
+        self.assertFalse(User.objects.filter(pk=self.doctor.pk).exists())
+        deleted = User.all_objects.get(pk=self.doctor.pk)
+        self.assertIsNotNone(deleted.deleted_at)
+        self.assertFalse(deleted.is_active)
+        self.assertEqual(Appointment.objects.filter(doctor_id=self.doctor.pk).count(), 6)
+
+        job = UserPurge.objects.get(user_id=self.doctor.pk)
+        self.assertEqual((job.status, job.label), (UserPurge.PENDING, 'doc <doc@example.com>'))
+        # The email can be used by a new account right away
+        User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+
+    def test_purge_removes_rows_and_files_in_batches(self):
+        """
+        The purge deletes records, appointments, reports and the user, in bounded batches.
+        """
+        reports = [record.report.path for record in MedicalRecord.objects.filter(doctor=self.doctor)]
+        soft_delete_user(self.doctor, requested_by=self.admin)
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('purge_users', batch_size=2, stdout=StringIO())
+        # Rows are fetched and deleted a batch at a time
+        record_deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE FROM "accounts_medicalrecord"')]
+        self.assertEqual(len(record_deletes), 3)
+
+        job = UserPurge.objects.get(user_id=self.doctor.pk)
+        self.assertEqual(job.status, UserPurge.DONE)
+        self.assertEqual((job.records_deleted, job.appointments_deleted, job.files_deleted), (6, 6, 6))
+        self.assertFalse(User.all_objects.filter(pk=self.doctor.pk).exists())
+        self.assertFalse(Appointment.objects.filter(doctor_id=self.doctor.pk).exists())
+        self.assertFalse(any(os.path.exists(path) for path in reports))
+        self.assertTrue(User.objects.filter(pk=self.patient.pk).exists())
+
+        # Deletions reach the change feed
+        self.assertEqual(OutboxEvent.objects.filter(model='appointment', action='deleted').count(), 6)
+        self.assertEqual(OutboxEvent.objects.filter(model='record', action='deleted').count(), 6)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, AUDIT_FLUSH_SIZE=3, AUDIT_FLUSH_SECONDS=3600)
+class RecordAccessAuditTests(TestCase):
+
+    def setUp(self):
+        """
+        Create a doctor with an appointment and a record for a patient, and start with an empty audit log.
+        """
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        self.appointment = Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+        self.record = MedicalRecord.objects.create(doctor=self.doctor, patient=self.patient, appointment=self.appointment,
+                                                   diagnosis='Flu', treatment='Rest')
+        self.url = reverse('record_list_view', kwargs={'appointment_id': self.appointment.pk})
+        # Drop what earlier tests left in the buffer
+        audit.flush()
+        RecordAccessLog.objects.all().delete()
+        # Don't leave the record list of this appointment id in the shared locmem cache
+        self.addCleanup(cache.clear)
+        self.client.force_login(self.doctor)
+
+    def test_accesses_are_written_in_batches(self):
+        """
+        Record views only buffer their accesses; a full buffer is written in one insert after the response.
+        """
+        self.client.get(self.url)
+        self.client.get(reverse('records'), {'appointment_id': self.appointment.pk, 'patient_id': self.patient.pk,
+                                             'doctor_id': self.doctor.pk, 'type': 'update'})
+        self.assertEqual(audit.pending(), 2)
+        self.assertFalse(RecordAccessLog.objects.exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT INTO "accounts_recordaccesslog"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(audit.pending(), 0)
+
+        entries = list(RecordAccessLog.objects.order_by('pk').values_list('user_id', 'patient_id', 'action', 'record_id'))
+        self.assertEqual(entries, [
+            (self.doctor.pk, self.patient.pk, RecordAccessLog.LIST, None),
+            (self.doctor.pk, self.patient.pk, RecordAccessLog.EDIT_FORM, self.record.pk),
+            (self.doctor.pk, self.patient.pk, RecordAccessLog.LIST, None),
+        ])
+
+    def test_audit_log_command_filters_by_patient_and_date(self):
+        """
+        The audit_log command lists a patient's accesses within the given days.
+        """
+        other = User.objects.create_user(username='pat2', password='password123', email='pat2@example.com', role='patient')
+        now = timezone.now()
+        RecordAccessLog.objects.bulk_create([
+            RecordAccessLog(user_id=self.doctor.pk, patient_id=self.patient.pk, action=RecordAccessLog.LIST,
+                            accessed_at=now - timedelta(days=10)),
+            RecordAccessLog(user_id=self.doctor.pk, patient_id=self.patient.pk, action=RecordAccessLog.LIST,
+                            accessed_at=now),
+            RecordAccessLog(user_id=self.doctor.pk, patient_id=other.pk, action=RecordAccessLog.LIST, accessed_at=now),
+        ])
+        since = timezone.localdate(now - timedelta(days=1)).isoformat()
+
+        out = StringIO()
+        call_command('audit_log', patient=self.patient.pk, since=since, csv=True, stdout=out)
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['user'], rows[0]['patient_id']), ('doc', str(self.patient.pk)))
+
+        with self.assertRaises(CommandError):
+            call_command('audit_log', patient=self.patient.pk, since='yesterday', stdout=StringIO())
+
+    @override_settings(AUDIT_FLUSH_SECONDS=0)
+    def test_flush_due_is_safe_while_other_threads_flush(self):
+        """
+        Checking whether a flush is due never fails while other threads buffer and flush entries.
+        """
+        request = RequestFactory().get('/')
+        request.user = self.doctor
+        errors = []
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+
+        def work():
+            try:
+                for _ in range(2000):
+                    audit.record_access(request, RecordAccessLog.LIST, patient_id=self.patient.pk)
+                    audit.flush_if_due()
+            except Exception as e:
+                errors.append(e)
+
+        with mock.patch.object(RecordAccessLog.objects, 'bulk_create'):
+            threads = [threading.Thread(target=work) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            audit.flush()
+        self.assertEqual(errors, [])
+        self.assertFalse(audit.flush_due())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0)
+class RequestProfilingTests(TestCase):
+
+    def setUp(self):
+        """
+        Create a superuser and a doctor with an appointment.
+        """
+        self.admin = User.objects.create_superuser(username='admin', password='password123', email='admin@example.com')
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+        self.url = reverse('doctor_dashboard_with_id', args=[self.doctor.pk])
+
+    def test_superuser_profiles_a_page_on_demand(self):
+        """
+        ?profile stores the profile and SQL of a superuser's request, downloadable from the admin.
+        """
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, {'profile': ''})
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get(pk=response[PROFILE_HEADER])
+        self.assertEqual((profile.trigger, profile.user_id, profile.status_code), (RequestProfile.REQUESTED, self.admin.pk, 200))
+        self.assertEqual(profile.query_count, len(profile.queries))
+        self.assertTrue(any('accounts_appointment' in query['sql'] for query in profile.queries))
+        self.assertIn('cumulative', profile.summary)
+
+        change_page = self.client.get(reverse('admin:accounts_requestprofile_change', args=[profile.pk]))
+        self.assertContains(change_page, 'Profile (.prof)')
+        download = self.client.get(reverse('admin:accounts_requestprofile_download', args=[profile.pk, 'prof']))
+        with tempfile.NamedTemporaryFile(suffix='.prof') as prof:
+            prof.write(download.content)
+            prof.flush()
+            self.assertGreater(pstats.Stats(prof.name).total_calls, 0)
+
+    def test_other_requests_are_not_profiled(self):
+        """
+        Without ?profile, from a non-superuser, or with profiling disabled, nothing is recorded.
+        """
+        self.client.force_login(self.doctor)
+        response = self.client.get(self.url, {'profile': ''})
+        self.assertNotIn(PROFILE_HEADER, response)
+
+        self.client.force_login(self.admin)
+        self.client.get(self.url)
+        with override_settings(PROFILING_ENABLED=False):
+            self.client = self.client_class()
+            self.client.force_login(self.admin)
+            response = self.client.get(self.url, {'profile': ''})
+        self.assertNotIn(PROFILE_HEADER, response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(MIDDLEWARE=PRODUCTION_MIDDLEWARE)
+    async def test_requests_served_over_asgi_are_profiled(self):
+        """
+        Under ASGI, with only async-capable middleware around it, a sync view is profiled too, queries included.
+        """
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(self.url, {'profile': ''})
+        self.assertEqual(response.status_code, 200)
+
+        profile = await RequestProfile.objects.aget(pk=response[PROFILE_HEADER])
+        self.assertTrue(any('accounts_appointment' in query['sql'] for query in profile.queries))
+        self.assertIn('doctor_views.py', profile.summary)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SLOW_QUERY_MS=0.001)
+class SlowQueryLogTests(TestCase):
+
+    def setUp(self):
+        """
+        Create a doctor with an appointment and log in as that doctor.
+        """
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+        self.client.force_login(self.doctor)
+
+    def test_normalized_sql_groups_query_shapes(self):
+        """
+        Literals, placeholders and IN lists of any length normalize to the same SQL.
+        """
+        first = normalize_sql('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s, %s) AND "a"."name" = \'x\' LIMIT 21')
+        second = normalize_sql('SELECT "a"."id" FROM "a"  WHERE "a"."id" IN (%s) AND "a"."name" = \'y\' LIMIT 5')
+        self.assertEqual(first, second)
+        self.assertEqual(first, 'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) AND "a"."name" = ? LIMIT ?')
+
+    def test_slow_queries_are_logged_with_caller_and_plan(self):
+        """
+        Slow queries are recorded after the response with their view, caller and EXPLAIN plan, and reported.
+        """
+        with mock.patch('accounts.slow_queries.submit', side_effect=record_slow_queries) as submit:
+            self.client.get(reverse('doctor_dashboard_with_id', args=[self.doctor.pk]))
+        submit.assert_called_once()
+
+        appointments = SlowQuery.objects.filter(sql__contains='FROM "accounts_appointment"',
+                                                view='doctor_dashboard_with_id')
+        self.assertTrue(appointments.exists())
+        self.assertTrue(appointments.filter(location__startswith='accounts/').exists())
+        self.assertTrue(appointments.exclude(plan='').exists())
+
+        out = StringIO()
+        call_command('slow_queries', view='doctor_dashboard_with_id', stdout=out)
+        self.assertIn('Plan:', out.getvalue())
+        self.assertIn('doctor_dashboard_with_id', out.getvalue())
+
+    @override_settings(MIDDLEWARE=PRODUCTION_MIDDLEWARE)
+    async def test_slow_queries_of_requests_served_over_asgi_are_logged(self):
+        """
+        Under ASGI, with only async-capable middleware around it, the queries of a sync view are timed too.
+        """
+        await self.async_client.aforce_login(self.doctor)
+        with mock.patch('accounts.slow_queries.submit') as submit:
+            response = await self.async_client.get(reverse('doctor_dashboard_with_id', args=[self.doctor.pk]))
+        self.assertEqual(response.status_code, 200)
+        submit.assert_called_once()
+        view, queries = submit.call_args.args
+        self.assertEqual(view, 'doctor_dashboard_with_id')
+        self.assertTrue(any('FROM "accounts_appointment"' in query['sql'] for query in queries))
+
+    @override_settings(MIDDLEWARE=PRODUCTION_MIDDLEWARE)
+    async def test_queries_of_async_views_are_logged_without_a_worker_thread(self):
+        """
+        Under ASGI the middleware stays on the event loop, and the async ORM queries of an async view are timed.
+        """
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(slow_queries.SlowQueryMiddleware(get_response)))
+        token = await Token.objects.acreate(user=self.doctor)
+        with mock.patch('accounts.slow_queries.submit') as submit:
+            response = await self.async_client.get(reverse('async-doctor-dashboard', kwargs={'doctor_id': self.doctor.pk}),
+                                                   headers={'Authorization': 'Token ' + token.key})
+        self.assertEqual(response.status_code, 200)
+        submit.assert_called_once()
+        view, queries = submit.call_args.args
+        self.assertEqual(view, 'async-doctor-dashboard')
+        self.assertTrue(any('FROM "accounts_appointment"' in query['sql'] for query in queries))
+
+    def test_background_thread_closes_old_connections_around_each_batch(self):
+        """
+        The background thread drops stale database connections before and after recording a batch.
+        """
+        with mock.patch('accounts.slow_queries.close_old_connections') as close, \
+                mock.patch('accounts.slow_queries.record') as record:
+            slow_queries.submit('view', [])
+            slow_queries._queue.join()
+        record.assert_called_once_with('view', [])
+        self.assertEqual(close.call_count, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class APIRenderingTests(APITestCase):
+
+    def setUp(self):
+        """
+        Create a superuser with a token and enough appointments for a compressible list.
+        """
+        self.superuser = User.objects.create_superuser(username='admin', password='password123', email='admin@example.com')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.superuser).key)
+        Appointment.objects.bulk_create([
+            Appointment(doctor=self.superuser, patient=self.superuser, scheduled_at=timezone.now() + timedelta(hours=i),
+                        notes=f'Follow-up {i}')
+            for i in range(50)
+        ])
+        self.url = reverse('appointment-list-create')
+
+    def test_json_and_msgpack_render_the_same_values_as_drf(self):
+        """
+        The orjson renderer matches DRF's JSON output; MessagePack is negotiated by Accept.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), json.loads(JSONRenderer().render(response.data)))
+
+        packed = self.client.get(self.url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(packed['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(packed.content), json.loads(response.content))
+
+    def test_responses_are_compressed_except_event_streams(self):
+        """
+        Large responses are gzipped when accepted; server-sent events are left alone.
+        """
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(self.client.get(self.url).content))
+
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        events = StreamingHttpResponse(iter([b'data: x\n\n'] * 100), content_type='text/event-stream')
+        response = CompressionMiddleware(lambda request: events)(request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_brotli_is_only_used_for_api_formats(self):
+        """
+        With Brotli available, API responses use it, while HTML pages keep gzip and its BREACH padding.
+        """
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        body = b'<p>' + b'x' * 1000 + b'</p>'
+        with mock.patch('accounts.compression.brotli') as brotli:
+            brotli.compress.return_value = b'compressed'
+            page = CompressionMiddleware(lambda request: HttpResponse(body, content_type='text/html'))(request)
+            api = CompressionMiddleware(lambda request: HttpResponse(body, content_type='application/json'))(request)
+        self.assertEqual(page['Content-Encoding'], 'gzip')
+        self.assertEqual(api['Content-Encoding'], 'br')
+        self.assertEqual(api.content, b'compressed')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AppointmentBatchTests(APITestCase):
+
+    def setUp(self):
+        """
+        Create a doctor with appointments and authenticate as a superuser.
+        """
+        self.superuser = User.objects.create_superuser(username='admin', password='password123', email='admin@example.com')
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        self.ids = [Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now()).pk
+                    for _ in range(3)]
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.superuser).key)
+        self.url = reverse('appointment-batch')
+
+    def test_batch_preserves_order_and_lists_unknown_ids(self):
+        """
+        The appointments come back in request order from one query; unknown ids are missing.
+        """
+        requested = [self.ids[2], self.ids[0], 99999, self.ids[2]]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'ids': ','.join(map(str, requested))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([appointment['id'] for appointment in response.data['results']], [self.ids[2], self.ids[0]])
+        self.assertEqual(response.data['missing'], [99999])
+        self.assertEqual(len([query for query in queries if 'accounts_appointment' in query['sql']]), 1)
+
+        response = self.client.post(self.url, {'ids': [self.ids[1], self.ids[0]]}, format='json')
+        self.assertEqual([appointment['id'] for appointment in response.data['results']], [self.ids[1], self.ids[0]])
+
+    def test_batch_is_restricted_to_superusers_like_the_detail_view(self):
+        """
+        A doctor can read neither their own appointments in a batch nor one by one.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.doctor).key)
+        response = self.client.get(self.url, {'ids': str(self.ids[0])})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse('appointment-detail', args=[self.ids[0]]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_batch_rejects_invalid_ids(self):
+        """
+        Non-integer, empty and too long id lists are rejected.
+        """
+        self.assertEqual(self.client.get(self.url, {'ids': '1,x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {'ids': list(range(1, 502))}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DeltaSyncTests(APITestCase):
+
+    def setUp(self):
+        """
+        Create two doctors with appointments and records, and authenticate as the first doctor.
+        """
+        self.doctor = User.objects.create_user(username='doc', password='password123', email='doc@example.com', role='doctor')
+        self.other_doctor = User.objects.create_user(username='doc2', password='password123', email='doc2@example.com',
+                                                     role='doctor')
+        self.patient = User.objects.create_user(username='pat', password='password123', email='pat@example.com', role='patient')
+        self.appointments = [Appointment.objects.create(doctor=self.doctor, patient=self.patient, scheduled_at=timezone.now())
+                             for _ in range(3)]
+        self.record = MedicalRecord.objects.create(doctor=self.doctor, patient=self.patient,
+                                                   appointment=self.appointments[0], diagnosis='Flu', treatment='Rest')
+        self.others = Appointment.objects.create(doctor=self.other_doctor, patient=self.patient, scheduled_at=timezone.now())
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.doctor).key)
+        self.url = reverse('sync')
+
+    def ids(self, table):
+        id_column = table['fields'].index('id')
+        return [row[id_column] for row in table['rows']]
+
+    def test_sync_returns_only_changes_and_tombstones(self):
+        """
+        A full sync returns the doctor's data; the next one only what changed and the deleted ids.
+        """
+        full = self.client.get(self.url).data
+        self.assertTrue(full['full_resync'])
+        self.assertEqual(self.ids(full['appointments']), [appointment.pk for appointment in self.appointments])
+        self.assertEqual(self.ids(full['records']), [self.record.pk])
+
+        self.appointments[1].status = 'completed'
+        self.appointments[1].save()
+        deleted_id = self.appointments[2].pk
+        self.appointments[2].delete()
+        self.others.save()
+
+        delta = self.client.get(self.url, {'since': full['watermark']}).data
+        self.assertFalse(delta['full_resync'])
+        self.assertEqual(self.ids(delta['appointments']), [self.appointments[1].pk])
+        self.assertEqual(delta['records']['rows'], [])
+        self.assertEqual(delta['deleted'], {'appointments': [deleted_id], 'records': []})
+
+        response = self.client.get(self.url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_pages_large_changes_and_resyncs_after_pruning(self):
+        """
+        A full sync is spread over pages of at most limit rows; pruned tombstones force a resync.
+        """
+        pages, watermark = [], None
+        for _ in range(5):
+            page = self.client.get(self.url, {'since': watermark, 'limit': 2} if watermark else {'limit': 2}).data
+            pages.append(self.ids(page['appointments']) + self.ids(page['records']))
+            watermark = page['watermark']
+            if not page['more']:
+                break
+        self.assertFalse(page['more'])
+        self.assertEqual([len(ids) for ids in pages], [2, 2])
+        self.assertEqual(sorted(sum(pages, [])), sorted([appointment.pk for appointment in self.appointments] + [self.record.pk]))
+
+        OutboxPrune.objects.create(pruned_through=OutboxEvent.objects.latest('pk').pk + 1, deleted=0)
+        resync = self.client.get(self.url, {'since': watermark}).data
+        self.assertTrue(resync['full_resync'])
+        self.assertEqual(len(resync['appointments']['rows']), 3)
+
+    def test_late_commits_are_in_the_next_delta(self):
+        """
+        A change stamped before the last sync but committed after it is in the next delta, which pages by event.
+        """
+        watermark = self.client.get(self.url).data['watermark']
+        for appointment in self.appointments:
+            appointment.notes = 'Late'
+            appointment.save()
+        # As if each transaction had started before the sync and committed after it
+        Appointment.objects.filter(doctor=self.doctor).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        pages = []
+        for _ in range(5):
+            page = self.client.get(self.url, {'since': watermark, 'limit': 2}).data
+            pages.append(self.ids(page['appointments']))
+            watermark = page['watermark']
+            if not page['more']:
+                break
+        self.assertEqual([len(ids) for ids in pages], [2, 1])
+        self.assertEqual(sorted(sum(pages, [])), [appointment.pk for appointment in self.appointments])
+
+        delta = self.client.get(self.url, {'since': watermark}).data
+        self.assertFalse(delta['more'])
+        self.assertEqual(delta['appointments']['rows'], [])
+
+    def test_reassigned_rows_are_tombstoned_for_their_previous_owner(self):
+        """
+        Moving an appointment to another doctor sends its id to the previous doctor only.
+        """
+        watermark = self.client.get(self.url).data['watermark']
+        moved = self.appointments[1]
+        moved.doctor = self.other_doctor
+        moved.save()
+        event = OutboxEvent.objects.get(action='reassigned', object_id=moved.pk)
+        self.assertEqual((event.doctor_id, event.patient_id), (self.doctor.pk, None))
+
+        delta = self.client.get(self.url, {'since': watermark}).data
+        self.assertEqual(delta['deleted'], {'appointments': [moved.pk], 'records': []})
+        self.assertEqual(delta['appointments']['rows'], [])
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.other_doctor).key)
+        other = self.client.get(self.url, {'since': watermark}).data
+        self.assertEqual(self.ids(other['appointments']), [moved.pk])
+        self.assertEqual(other['deleted']['appointments'], [])
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.patient).key)
+        patient = self.client.get(self.url, {'since': watermark}).data
+        self.assertEqual(patient['deleted']['appointments'], [])
+
+
+def tearDownModule():
+    """Write the accesses buffered by the tests while the test database still exists."""
+    audit.flush()
@@ -0,0 +1,127 @@
+"""
+Patient timeline: appointments and medical records merged into a single
+stream, newest first, with keyset (cursor) pagination.
+
+Every page costs one query per source regardless of how deep the client has
+paged, because each source is read with an indexed ``(patient, timestamp, id)``
+range scan limited to ``limit + 1`` rows and the results are merged in Python.
+
+Appointments and records moved to the archive tables by the
+``archive_appointments`` command are read from there as additional sources,
+so the timeline shows a patient's full history. Archived rows keep their
+original ids, so they share the live rows' kinds and cursors.
+"""
+import base64
+import binascii
+import heapq
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import Appointment, ArchivedAppointment, ArchivedMedicalRecord, MedicalRecord
+
+APPOINTMENT = 'appointment'
+RECORD = 'record'
+
+# Entries sharing a timestamp are ordered by kind rank, then by id (descending).
+KIND_RANKS = {
+    APPOINTMENT: 1,
+    RECORD: 0,
+}
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a timeline cursor cannot be decoded."""
+
+
+def encode_cursor(entry):
+    """Encode the position of a timeline entry into an opaque, URL-safe cursor."""
+    raw = f"{entry['timestamp'].isoformat()}|{entry['kind']}|{entry['object'].pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by ``encode_cursor`` into ``(timestamp, kind, id)``."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, kind, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        timestamp = parse_datetime(timestamp)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Malformed timeline cursor.')
+    if timestamp is None or kind not in KIND_RANKS:
+        raise InvalidCursor('Malformed timeline cursor.')
+    return timestamp, kind, pk
+
+
+def get_timeline_sources(patient):
+    """
+    Return the ``(kind, queryset, timestamp_field)`` sources merged into the
+    timeline of the given patient.
+    """
+    return [
+        (APPOINTMENT,
+         Appointment.objects.filter(patient=patient).select_related('doctor'),
+         'scheduled_at'),
+        (RECORD,
+         MedicalRecord.objects.filter(patient=patient).select_related('doctor', 'appointment'),
+         'created_at'),
+        (APPOINTMENT,
+         ArchivedAppointment.objects.filter(patient=patient).select_related('doctor'),
+         'scheduled_at'),
+        (RECORD,
+         ArchivedMedicalRecord.objects.filter(patient=patient).select_related('doctor', 'appointment'),
+         'created_at'),
+    ]
+
+
+def _after_cursor(kind, field, cursor):
+    """Build the keyset condition selecting rows of ``kind`` that sort after the cursor."""
+    timestamp, cursor_kind, cursor_pk = cursor
+    rank, cursor_rank = KIND_RANKS[kind], KIND_RANKS[cursor_kind]
+
+    if rank < cursor_rank:
+        return Q(**{f'{field}__lte': timestamp})
+    if rank == cursor_rank:
+        return Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'pk__lt': cursor_pk})
+    return Q(**{f'{field}__lt': timestamp})
+
+
+def _fetch(kind, queryset, field, cursor, limit):
+    if cursor is not None:
+        queryset = queryset.filter(_after_cursor(kind, field, cursor))
+    queryset = queryset.order_by(f'-{field}', '-pk')[:limit + 1]
+    return [
+        {'kind': kind, 'timestamp': getattr(obj, field), 'object': obj}
+        for obj in queryset
+    ]
+
+
+def _sort_key(entry):
+    return entry['timestamp'], KIND_RANKS[entry['kind']], entry['object'].pk
+
+
+def get_patient_timeline(patient, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of the patient's timeline.
+
+    ``cursor`` is the value of ``next_cursor`` from the previous page (or None
+    for the first page). The result is a dict with the page ``entries`` (each a
+    dict with ``kind``, ``timestamp`` and ``object``) and ``next_cursor``, which
+    is None on the last page.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    position = decode_cursor(cursor) if cursor else None
+
+    streams = [
+        _fetch(kind, queryset, field, position, limit)
+        for kind, queryset, field in get_timeline_sources(patient)
+    ]
+    merged = list(heapq.merge(*streams, key=_sort_key, reverse=True))
+
+    entries = merged[:limit]
+    next_cursor = encode_cursor(entries[-1]) if len(merged) > limit else None
+    return {'entries': entries, 'next_cursor': next_cursor}
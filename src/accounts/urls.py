@@ -4,7 +4,13 @@ from django.conf import settings
 from django.conf.urls.static import static
 from . import views
 from rest_framework.authtoken.views import obtain_auth_token
-from accounts.views.appointments_views import AppointmentListCreateAPIView , AppointmentDetailAPIView
+from accounts.views.appointments_views import AppointmentListCreateAPIView , AppointmentDetailAPIView, AppointmentBatchAPIView
+from accounts.views.timeline_views import PatientTimelineAPIView
+from accounts.views.analytics_views import DoctorAnalyticsAPIView
+from accounts.views.changes_views import ChangeFeedAPIView
+from accounts.views.search_views import MedicalRecordSearchAPIView
+from accounts.views.sync_views import SyncAPIView
+from accounts.views import async_views
 from django.urls import path
 urlpatterns = [
     # User URL:
@@ -24,6 +30,7 @@ urlpatterns = [
     path('record/', views.records_view, name='records'),
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('reports/appointments/', views.admin_appointment_report_view, name='admin_appointment_report_view'),
+    path('reports/doctor-analytics/', views.doctor_analytics_view, name='doctor_analytics_view'),
 
     # Patient URL:
     path('patients/', views.patient_list_view, name='patient_list_view'),
@@ -31,11 +38,27 @@ urlpatterns = [
     path('patients/create/', views.create_update_patient_view, name='create_patient_view'),
     path('patients/update/<int:pk>/', views.create_update_patient_view, name='update_patient_view'),
     path('patients/delete/<int:pk>/', views.delete_patient_view, name='delete_patient_view'),
-    path('patient-medical-records/', views.record_list_view, name='record_list'),
+    path('patients/<int:pk>/timeline/', views.patient_timeline_view, name='patient_timeline_view'),
+    path('patients/<int:pk>/export/', views.patient_export_view, name='patient_export_view'),
+    path('patient-medical-records/', views.legacy_record_list_view, name='record_list'),
+    path('appointments/<int:appointment_id>/records/', views.record_list_view, name='record_list_view'),
 
     # Appointment URLs:
     path('appointments/', AppointmentListCreateAPIView.as_view(), name='appointment-list-create'),
     path('appointments/<int:pk>/', AppointmentDetailAPIView.as_view(), name='appointment-detail'),
+    path('appointments/batch/', AppointmentBatchAPIView.as_view(), name='appointment-batch'),
+    path('api/patients/<int:pk>/timeline/', PatientTimelineAPIView.as_view(), name='patient-timeline'),
+    path('api/analytics/doctors/', DoctorAnalyticsAPIView.as_view(), name='doctor-analytics'),
+    path('changes/', ChangeFeedAPIView.as_view(), name='change-feed'),
+    path('api/records/search/', MedicalRecordSearchAPIView.as_view(), name='record-search'),
+    path('api/sync/', SyncAPIView.as_view(), name='sync'),
+
+    # Async (ASGI) read URLs:
+    path('async/appointments/', async_views.async_appointment_list, name='async-appointment-list'),
+    path('async/appointments/<int:pk>/', async_views.async_appointment_detail, name='async-appointment-detail'),
+    path('async/doctor-dashboard/<int:doctor_id>/', async_views.async_doctor_dashboard, name='async-doctor-dashboard'),
+    path('async/admin-dashboard/', async_views.async_admin_dashboard, name='async-admin-dashboard'),
+    path('async/appointment-events/', async_views.appointment_events, name='appointment-events'),
 
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
 
@@ -1,5 +1,8 @@
 from .authentication_views import user_login
 from .doctor_views import doctor_dashboard, doctor_list_view, doctor_detail_view, create_update_doctor_view, delete_doctor_view
 from .patient_views import patient_list_view, patient_detail_view, create_update_patient_view, delete_patient_view
-from .record_views import record_list_view, records_view
+from .record_views import record_list_view, legacy_record_list_view, records_view
 from .admin_views import admin_dashboard, admin_appointment_report_view
+from .timeline_views import patient_timeline_view
+from .analytics_views import doctor_analytics_view
+from .export_views import patient_export_view
@@ -3,9 +3,12 @@ from django.views.generic import TemplateView, ListView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
 from ..models import CustomUser, Appointment, MedicalRecord
+from ..db_routing import ReplicaReadMixin
+from ..facets import facet_counts
+from ..signals import APPOINTMENTS_VERSION
 from django.utils.dateparse import parse_date
 from django.core.cache import cache
-from django.db.models import Count
+from django.db.models import Count, Q
 from datetime import timedelta
 from django.core.exceptions import ObjectDoesNotExist
 import logging
@@ -30,18 +33,22 @@ class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         """
-        Pass the required context data to the dashboard template, including:
-        - List of doctors
-        - List of patients
-        - List of appointments
-        - List of medical records
+        Pass the dashboard totals to the template, counted in the database:
+        - Doctors and patients
+        - Appointments, and how many of them are overdue
+        - Medical records
         """
         context = super().get_context_data(**kwargs)
         try:
-            context['doctors'] = CustomUser.objects.filter(role='doctor')
-            context['patients'] = CustomUser.objects.filter(role='patient')
-            context['appointments'] = Appointment.objects.all()
-            context['records'] = MedicalRecord.objects.all()
+            context.update(CustomUser.objects.aggregate(
+                doctor_count=Count('pk', filter=Q(role='doctor')),
+                patient_count=Count('pk', filter=Q(role='patient')),
+            ))
+            context.update(Appointment.objects.aggregate(
+                appointment_count=Count('pk'),
+                overdue_count=Count('pk', filter=Q(status='overdue')),
+            ))
+            context['record_count'] = MedicalRecord.objects.count()
         except Exception as e:
             logger.error(f"Error retrieving dashboard data: {e}")
             context['error'] = 'Unable to load dashboard data. Please try again later.'
@@ -66,7 +73,7 @@ class AdminRequiredMixin(UserPassesTestMixin):
 admin_required = AdminRequiredMixin
 
 
-class AdminAppointmentReportView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class AdminAppointmentReportView(LoginRequiredMixin, UserPassesTestMixin, ReplicaReadMixin, ListView):
     """
     A view for displaying a report of appointments. Only accessible to admins.
     Supports filtering by start date, end date, status, and doctor's name.
@@ -100,16 +107,9 @@ class AdminAppointmentReportView(LoginRequiredMixin, UserPassesTestMixin, ListVi
 
         if queryset is None:
             try:
-                queryset = Appointment.objects.all()
-
-                if start_date:
-                    queryset = queryset.filter(scheduled_at__date__gte=parse_date(start_date))
-                if end_date:
-                    queryset = queryset.filter(scheduled_at__date__lte=parse_date(end_date))
+                queryset = self.filter_appointments(Appointment.objects.select_related('doctor', 'patient'))
                 if status:
                     queryset = queryset.filter(status=status)
-                if doctor_name:
-                    queryset = queryset.filter(doctor__full_name__icontains=doctor_name)
 
                 # Cache the queryset for 60 seconds
                 cache.set(cache_key, queryset, timeout=60)
@@ -119,12 +119,25 @@ class AdminAppointmentReportView(LoginRequiredMixin, UserPassesTestMixin, ListVi
 
         return queryset
 
+    def filter_appointments(self, queryset):
+        """Apply the date range and doctor name filters (every filter except status)."""
+        start_date = self.request.GET.get('start_date', '')
+        end_date = self.request.GET.get('end_date', '')
+        doctor_name = self.request.GET.get('doctor', '')
+        if start_date:
+            queryset = queryset.filter(scheduled_at__date__gte=parse_date(start_date))
+        if end_date:
+            queryset = queryset.filter(scheduled_at__date__lte=parse_date(end_date))
+        if doctor_name:
+            queryset = queryset.filter(doctor__full_name__icontains=doctor_name)
+        return queryset
+
     def get_context_data(self, **kwargs):
         """
         Pass additional context data, including:
         - Start date
         - End date
-        - Status filter
+        - Status filter, with the count of each status under the other filters
         - Doctor filter
         - Daily appointment counts within the date range
         """
@@ -134,6 +147,23 @@ class AdminAppointmentReportView(LoginRequiredMixin, UserPassesTestMixin, ListVi
         context['status'] = self.request.GET.get('status', '')
         context['doctor'] = self.request.GET.get('doctor', '')
 
+        try:
+            facets = facet_counts(
+                self.filter_appointments(Appointment.objects.all()), 'status', APPOINTMENTS_VERSION,
+                f"appointment_report_{context['start_date']}_{context['end_date']}_{context['doctor']}")
+            counts = {facet['value']: facet['count'] for facet in facets}
+        except Exception as e:
+            logger.error(f"Error counting appointment statuses: {e}")
+            counts = None
+        # Every status is offered, even without matches, so the selected one never drops out of the form
+        choices = list(Appointment.STATUS_CHOICES)
+        if context['status'] and context['status'] not in dict(choices):
+            choices.append((context['status'], context['status']))
+        context['status_facets'] = [
+            {'value': value, 'label': label, 'count': counts.get(value, 0) if counts is not None else None}
+            for value, label in choices
+        ]
+
         try:
             start_date = parse_date(context['start_date'])
             end_date = parse_date(context['end_date'])
@@ -0,0 +1,97 @@
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.shortcuts import redirect
+from django.utils.dateparse import parse_date
+from django.views.generic import TemplateView
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from ..db_routing import ReplicaReadMixin
+from ..permissions import IsSuperAdmin
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def parse_period(params):
+    """
+    Read the ``start_date`` / ``end_date`` query parameters (``YYYY-MM-DD``),
+    defaulting to the last 90 days. Raises ValueError for an invalid period.
+    """
+    # accounts.analytics imports NumPy: keep it out of worker startup
+    from ..analytics import default_period
+    default_start, default_end = default_period()
+    start = parse_date(params.get('start_date') or default_start.isoformat())
+    end = parse_date(params.get('end_date') or default_end.isoformat())
+    if start is None or end is None:
+        raise ValueError('Dates must use the YYYY-MM-DD format.')
+    if start > end:
+        raise ValueError('start_date must not be after end_date.')
+    return start, end
+
+
+class DoctorAnalyticsView(LoginRequiredMixin, UserPassesTestMixin, ReplicaReadMixin, TemplateView):
+    """
+    A view displaying per-doctor utilization and completion, cancellation and
+    no-show rates, with a weekday x hour heatmap of appointments. Only
+    accessible to admins.
+    """
+    template_name = 'accounts/doctor_analytics.html'
+
+    def test_func(self):
+        """Ensure that only admins can access this view."""
+        return self.request.user.is_authenticated and self.request.user.is_admin()
+
+    def handle_no_permission(self):
+        """Redirect to login page if user is not an admin."""
+        return redirect('login')
+
+    def get_context_data(self, **kwargs):
+        from ..analytics import default_period, get_analytics
+        context = super().get_context_data(**kwargs)
+        try:
+            start, end = parse_period(self.request.GET)
+        except ValueError as e:
+            context['error'] = str(e)
+            start, end = default_period()
+        context['start_date'], context['end_date'] = start, end
+
+        try:
+            analytics = get_analytics(start, end)
+        except Exception as e:
+            logger.error(f"Error computing doctor analytics: {e}")
+            context['error'] = 'Unable to compute analytics. Please try again later.'
+            return context
+
+        # Shade each heatmap cell relative to the busiest one
+        peak = max(max(row) for row in analytics['heatmap']['appointments']) or 1
+        context['analytics'] = analytics
+        context['heatmap_rows'] = [
+            (weekday, [(count, round(count / peak, 2)) for count in row])
+            for weekday, row in zip(analytics['heatmap']['weekdays'], analytics['heatmap']['appointments'])
+        ]
+        context['hours'] = range(len(analytics['heatmap']['appointments'][0]))
+        return context
+
+doctor_analytics_view = DoctorAnalyticsView.as_view()
+
+
+class DoctorAnalyticsAPIView(ReplicaReadMixin, APIView):
+    """
+    API view returning the doctor analytics of a period as JSON.
+
+    * Query parameters: ``start_date`` and ``end_date`` (``YYYY-MM-DD``,
+      inclusive), defaulting to the last 90 days.
+    * Only superusers can access this view.
+    * Uses TokenAuthentication for authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsSuperAdmin]
+
+    def get(self, request):
+        from ..analytics import get_analytics
+        try:
+            start, end = parse_period(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_analytics(start, end))
@@ -1,10 +1,12 @@
 from rest_framework import generics
+from ..db_routing import read_from_replica
 from ..models import Appointment
 from ..serializers import AppointmentSerializer
 from rest_framework.authentication import TokenAuthentication
 from ..permissions import IsSuperAdmin
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.exceptions import NotFound, ValidationError
 from django.core.exceptions import ObjectDoesNotExist
 
@@ -77,3 +79,47 @@ class AppointmentDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
             return Response({'error': 'Appointment not found.'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({'error': 'An unexpected error occurred.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AppointmentBatchAPIView(APIView):
+    """
+    API view retrieving many appointments at once, instead of one
+    ``/appointments/<pk>/`` call per id.
+
+    * Ids are given as ``GET ?ids=1,2,3`` or ``POST {"ids": [1, 2, 3]}``
+      (for lists too long for a URL), at most 500.
+    * The appointments are read from the read replica in a single query and
+      returned in the requested order. Ids that do not exist are listed in
+      ``missing``.
+    * Only superusers can access this view, as with ``/appointments/<pk>/``.
+    * Uses TokenAuthentication for authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsSuperAdmin]
+    max_ids = 500
+
+    def get(self, request):
+        return self.retrieve(request, request.query_params.get('ids', '').split(','))
+
+    def post(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list):
+            return Response({'error': 'ids must be a list of appointment ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        return self.retrieve(request, ids)
+
+    def retrieve(self, request, values):
+        try:
+            # Each id once, in the order first requested
+            ids = list(dict.fromkeys(int(value) for value in values if str(value).strip()))
+        except (TypeError, ValueError):
+            return Response({'error': 'ids must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids or len(ids) > self.max_ids:
+            return Response({'error': f'Give between 1 and {self.max_ids} ids.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with read_from_replica():
+            appointments = Appointment.objects.in_bulk(ids)
+        return Response({
+            'results': AppointmentSerializer([appointments[pk] for pk in ids if pk in appointments], many=True,
+                                             context={'request': request}).data,
+            'missing': [pk for pk in ids if pk not in appointments],
+        })
@@ -0,0 +1,283 @@
+"""
+Async read-only endpoints for appointments and dashboards.
+
+These views run natively on the event loop when the project is served by an
+ASGI server (``hospital_management_system.asgi:application``), using the async
+ORM and async cache API, so slow clients no longer hold a worker thread.
+Responses are cached under the cache versions of the data they read
+(appointments, and for the dashboards medical records and users too), which
+are bumped whenever such a row is saved or deleted.
+
+``appointment_events`` is a server-sent events stream pushing appointment
+changes to the dashboards (see ``accounts.events``).
+"""
+import asyncio
+import json
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from ..caching import aget_version
+from ..events import ADMINS_CHANNEL, doctor_channel, event_message, get_broker
+from ..models import Appointment, CustomUser, MedicalRecord, OutboxEvent
+from ..serializers import AppointmentSerializer
+from ..signals import APPOINTMENTS_VERSION, RECORDS_VERSION, USERS_VERSION
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIMEOUT = 60
+
+# Server-sent events: comment lines keep idle connections open through
+# proxies, and reconnecting clients replay at most REPLAY_LIMIT missed events
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+REPLAY_LIMIT = 500
+
+
+async def get_token_user(request):
+    """
+    Authenticate the request from its ``Authorization: Token <key>`` header,
+    mirroring DRF's TokenAuthentication. Returns None if the token is missing
+    or invalid.
+    """
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword != 'Token' or not key.strip():
+        return None
+    try:
+        token = await Token.objects.select_related('user').aget(key=key.strip())
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
+
+
+def async_token_required(test_func):
+    """
+    Decorator for async views requiring a token-authenticated user for whom
+    ``test_func(user, **view_kwargs)`` is true. The user is set on ``request.user``.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            user = await get_token_user(request)
+            if user is None:
+                return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+            if not test_func(user, **kwargs):
+                return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+            request.user = user
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def is_superuser(user, **kwargs):
+    return user.is_superuser
+
+
+def is_dashboard_doctor(user, doctor_id, **kwargs):
+    return user.is_superuser or (user.is_doctor() and user.pk == doctor_id)
+
+
+def is_dashboard_admin(user, **kwargs):
+    return user.is_superuser or user.is_admin()
+
+
+# Payload builds in progress in this process, keyed by cache key
+_pending_builds = {}
+
+
+async def cached_json(cache_key, build):
+    """
+    Return a JsonResponse for the cached payload, building and caching it on a miss.
+
+    Concurrent misses for the same key in this process share a single build
+    instead of each querying and serializing the same data.
+    """
+    data = await cache.aget(cache_key)
+    if data is None:
+        task = _pending_builds.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(_build_and_cache(cache_key, build))
+            _pending_builds[cache_key] = task
+            task.add_done_callback(lambda _: _pending_builds.pop(cache_key, None))
+        data = await asyncio.shield(task)
+    return JsonResponse(data, safe=False)
+
+
+async def _build_and_cache(cache_key, build):
+    data = await build()
+    await cache.aset(cache_key, data, timeout=CACHE_TIMEOUT)
+    return data
+
+
+async def dashboard_version():
+    """The combined cache version of the appointments, records and users a dashboard counts."""
+    versions = [await aget_version(name) for name in (APPOINTMENTS_VERSION, RECORDS_VERSION, USERS_VERSION)]
+    return '_'.join(str(version) for version in versions)
+
+
+@async_token_required(is_superuser)
+async def async_appointment_list(request):
+    """
+    Async counterpart of ``AppointmentListCreateAPIView.get``: the list of all appointments.
+    """
+    async def build():
+        appointments = [appointment async for appointment in Appointment.objects.all()]
+        # Serialize in a worker thread so a large list does not block the event loop
+        return await sync_to_async(lambda: AppointmentSerializer(appointments, many=True).data,
+                                   thread_sensitive=False)()
+
+    version = await aget_version(APPOINTMENTS_VERSION)
+    return await cached_json(f'async_appointment_list_{version}', build)
+
+
+@async_token_required(is_superuser)
+async def async_appointment_detail(request, pk):
+    """
+    Async counterpart of ``AppointmentDetailAPIView.get``: a single appointment.
+    """
+    try:
+        appointment = await Appointment.objects.aget(pk=pk)
+    except Appointment.DoesNotExist:
+        return JsonResponse({'detail': 'Appointment not found'}, status=404)
+    return JsonResponse(AppointmentSerializer(appointment).data)
+
+
+@async_token_required(is_dashboard_doctor)
+async def async_doctor_dashboard(request, doctor_id):
+    """
+    Async, JSON version of the doctor dashboard: the doctor's profile and their
+    appointments with patient names and record counts.
+    """
+    try:
+        doctor = await CustomUser.objects.aget(pk=doctor_id, role='doctor')
+    except CustomUser.DoesNotExist:
+        return JsonResponse({'detail': 'Doctor not found'}, status=404)
+
+    async def build():
+        appointments = (Appointment.objects
+                        .filter(doctor=doctor)
+                        .select_related('patient')
+                        .annotate(record_count=Count('medical_records'))
+                        .order_by('scheduled_at'))
+        return {
+            'doctor': {
+                'id': doctor.id,
+                'full_name': doctor.full_name,
+                'specialization': doctor.specialization,
+                'phone_number': doctor.phone_number,
+            },
+            'appointments': [
+                {
+                    'id': appointment.id,
+                    'patient_id': appointment.patient_id,
+                    'patient_name': appointment.patient.full_name,
+                    'scheduled_at': appointment.scheduled_at,
+                    'status': appointment.status,
+                    'record_count': appointment.record_count,
+                    'records_url': reverse('record_list_view', args=[appointment.id]),
+                }
+                async for appointment in appointments
+            ],
+        }
+
+    version = await dashboard_version()
+    return await cached_json(f'async_doctor_dashboard_{doctor_id}_{version}', build)
+
+
+@async_token_required(is_dashboard_admin)
+async def async_admin_dashboard(request):
+    """
+    Async, JSON version of the admin dashboard: totals of doctors, patients,
+    appointments (upcoming and overdue) and medical records, counted in the database.
+    """
+    async def build():
+        return {
+            'doctors': await CustomUser.objects.filter(role='doctor').acount(),
+            'patients': await CustomUser.objects.filter(role='patient').acount(),
+            'appointments': await Appointment.objects.acount(),
+            'upcoming_appointments': await Appointment.objects.filter(
+                status='pending', scheduled_at__gte=timezone.now()).acount(),
+            'overdue_appointments': await Appointment.objects.filter(status='overdue').acount(),
+            'records': await MedicalRecord.objects.acount(),
+        }
+
+    version = await dashboard_version()
+    return await cached_json(f'async_admin_dashboard_{version}', build)
+
+
+async def appointment_events(request):
+    """
+    Server-sent events stream of appointment changes (``created``, ``updated``,
+    ``cancelled``, ``deleted``, ``archived`` and ``reassigned``), for the
+    dashboards.
+
+    Doctors receive the events of their own appointments; admins receive every
+    event, or one doctor's with ``?doctor=<id>``. Authenticates with the session
+    or a token. A reconnecting client sends ``Last-Event-ID`` (EventSource does
+    this automatically) and first receives the events it missed, from the outbox.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        user = await get_token_user(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    if user.is_superuser or user.is_admin():
+        try:
+            doctor_id = int(request.GET['doctor']) if request.GET.get('doctor') else None
+        except ValueError:
+            return JsonResponse({'detail': 'doctor must be an integer.'}, status=400)
+    elif user.is_doctor():
+        doctor_id = user.pk
+    else:
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+
+    try:
+        last_seq = int(request.headers['Last-Event-ID']) if 'Last-Event-ID' in request.headers else None
+    except ValueError:
+        last_seq = None
+
+    channel = doctor_channel(doctor_id) if doctor_id else ADMINS_CHANNEL
+    response = StreamingHttpResponse(stream_appointment_events(channel, doctor_id, last_seq),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
+async def stream_appointment_events(channel, doctor_id, last_seq):
+    """
+    Yield the server-sent events of ``channel``, after replaying those after
+    ``last_seq`` (None for a new client, which only receives live events).
+    """
+    # Subscribe before replaying so that no event falls between the two
+    async with get_broker().subscribe([channel]) as queue:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+
+        if last_seq is None:
+            last_seq = 0
+        else:
+            missed = OutboxEvent.objects.filter(model='appointment', pk__gt=last_seq).order_by('pk')
+            if doctor_id:
+                missed = missed.filter(doctor_id=doctor_id)
+            fields = ('id', 'action', 'object_id', 'doctor_id', 'patient_id', 'payload')
+            async for event in missed.values(*fields)[:REPLAY_LIMIT]:
+                last_seq = event['id']
+                yield f'id: {last_seq}\ndata: {event_message(event)}\n\n'
+
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            seq = json.loads(message)['seq']
+            if seq <= last_seq:
+                continue  # Already replayed
+            last_seq = seq
+            yield f'id: {seq}\ndata: {message}\n\n'
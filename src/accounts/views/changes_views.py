@@ -0,0 +1,52 @@
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from ..outbox import events_since, pruned_through
+from ..permissions import IsSuperAdmin
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+
+class ChangeFeedAPIView(APIView):
+    """
+    API view streaming appointment and medical record change events as
+    newline-delimited JSON, in sequence order.
+
+    * Query parameters: ``since`` (the ``seq`` of the last event already
+      processed, 0 to start from the oldest retained event) and ``limit``
+      (events per response, at most 10000). Call again with the last ``seq``
+      received until a response is empty.
+    * Responds 410 Gone when events after ``since`` have been pruned: the
+      consumer must resync from ``/appointments/`` and continue with the
+      ``pruned_through`` value of the response as ``since``.
+    * Only superusers can access this view.
+    * Uses TokenAuthentication for authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsSuperAdmin]
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'since and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        horizon = pruned_through()
+        if since < horizon:
+            return Response({'error': f'Events up to {horizon} have been pruned; resync required.',
+                             'pruned_through': horizon},
+                            status=status.HTTP_410_GONE)
+
+        events = events_since(since, max(limit, 1))
+        return StreamingHttpResponse(self.stream(events), content_type='application/x-ndjson')
+
+    def stream(self, events):
+        for event in events.iterator(chunk_size=500):
+            event['seq'] = event.pop('id')
+            yield json.dumps(event, cls=DjangoJSONEncoder) + '\n'
@@ -6,7 +6,14 @@ from django.urls import reverse_lazy
 from django.db import transaction
 from ..models import CustomUser, Appointment, MedicalRecord
 from ..forms import DoctorProfileForm
+from ..db_routing import ReplicaReadMixin
+from ..facets import facet_counts
+from ..signals import USERS_VERSION
+from ..purge import soft_delete_user
 from django.core.cache import cache
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Doctor Dashboard View
 class DoctorDashboardView(LoginRequiredMixin, View):
@@ -22,7 +29,7 @@ class DoctorDashboardView(LoginRequiredMixin, View):
             appointments_with_records = []
 
             # Fetch appointments for the doctor
-            appointment_info = Appointment.objects.filter(doctor=doctor_user)
+            appointment_info = Appointment.objects.filter(doctor=doctor_user).select_related('patient')
 
             for appointment in appointment_info:
                 records = MedicalRecord.objects.filter(appointment=appointment)
@@ -42,7 +49,7 @@ class DoctorDashboardView(LoginRequiredMixin, View):
 doctor_dashboard = DoctorDashboardView.as_view()
 
 
-class DoctorListView(LoginRequiredMixin, ListView):
+class DoctorListView(LoginRequiredMixin, ReplicaReadMixin, ListView):
     """
     View to list all doctors with optional search and filtering.
     """
@@ -66,7 +73,7 @@ class DoctorListView(LoginRequiredMixin, ListView):
                     queryset = queryset.filter(full_name__icontains=search_query)
 
                 if specialization_filter:
-                    queryset = queryset.filter(specialization__icontains=specialization_filter)
+                    queryset = queryset.filter(specialization=specialization_filter)
 
                 queryset = queryset.order_by('full_name')  # Adjust ordering as needed
                 cache.set(cache_key, queryset, timeout=30)
@@ -81,6 +88,12 @@ class DoctorListView(LoginRequiredMixin, ListView):
         context['list_name'] = "Doctor's List"
         context['search_query'] = self.request.GET.get('search', '')
         context['specialization_filter'] = self.request.GET.get('specialization', '')
+        # Specialization counts among the doctors matching the name search
+        doctors = CustomUser.objects.filter(role='doctor')
+        if context['search_query']:
+            doctors = doctors.filter(full_name__icontains=context['search_query'])
+        context['specialization_facets'] = facet_counts(
+            doctors, 'specialization', USERS_VERSION, f"doctor_list_{context['search_query']}")
         return context
 
 doctor_list_view = DoctorListView.as_view()
@@ -147,12 +160,20 @@ class DeleteDoctorView(LoginRequiredMixin, DeleteView):
         pk = self.kwargs.get('pk')
         return get_object_or_404(CustomUser, pk=pk, role='doctor')
 
-    @transaction.atomic  # Ensure atomicity during the delete operation
-    def delete(self, request, *args, **kwargs):
+    def form_valid(self, form):
+        """
+        Soft-delete the doctor at once; their appointments, records and files
+        are removed in batches by ``manage.py purge_users``.
+        """
         try:
-            return super().delete(request, *args, **kwargs)
+            soft_delete_user(self.object, requested_by=self.request.user)
         except Exception as e:
-            # Handle deletion errors
-            return redirect('doctor_list_view')  # Redirect to the list view or show an error message
+            logger.error(f"Error deleting doctor: {e}")
+        return redirect(self.success_url)
+
+    def delete(self, request, *args, **kwargs):
+        # DELETE requests take the same path as the confirmation form
+        self.object = self.get_object()
+        return self.form_valid(None)
 
 delete_doctor_view = DeleteDoctorView.as_view()
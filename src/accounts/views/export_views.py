@@ -0,0 +1,47 @@
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.utils import timezone
+from django.views import View
+from ..export import iter_patient_bundle, patient_bundle
+from ..models import Appointment, ArchivedAppointment, CustomUser
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PatientExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    View downloading a patient's chart as a ZIP bundle (appointments and
+    medical records as CSV, report files and a JSON summary), streamed as it
+    is generated. Accessible to admins and to the patient's doctors.
+    """
+
+    def test_func(self):
+        """Ensure that only admins and doctors who saw the patient can export the chart."""
+        user = self.request.user
+        if user.is_superuser or user.is_admin():
+            return True
+        if not user.is_doctor():
+            return False
+        # Doctors whose appointments with the patient have all been archived still saw them
+        patient_id = self.kwargs['pk']
+        return (Appointment.objects.filter(doctor=user, patient_id=patient_id).exists()
+                or ArchivedAppointment.objects.filter(doctor=user, patient_id=patient_id).exists())
+
+    def handle_no_permission(self):
+        """Redirect to login page if user cannot export the chart."""
+        return redirect('login')
+
+    def get(self, request, pk):
+        patient = get_object_or_404(CustomUser, pk=pk, role='patient')
+        logger.info(f"User {request.user.pk} exported the chart of patient {patient.pk}")
+        # Under ASGI a sync iterator would be read to the end before anything is sent
+        bundle = patient_bundle(patient) if isinstance(request, ASGIRequest) else iter_patient_bundle(patient)
+        response = StreamingHttpResponse(bundle, content_type='application/zip')
+        filename = f'patient-{patient.pk}-{timezone.localdate().isoformat()}.zip'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+patient_export_view = PatientExportView.as_view()
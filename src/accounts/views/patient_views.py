@@ -5,13 +5,17 @@ from django.urls import reverse_lazy
 from django.db import transaction
 from ..models import CustomUser
 from ..forms import PatientProfileForm
+from ..db_routing import ReplicaReadMixin
+from ..facets import facet_counts
+from ..signals import USERS_VERSION
+from ..purge import soft_delete_user
 from django.core.cache import cache
 import logging
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-class PatientListView(LoginRequiredMixin, ListView):
+class PatientListView(LoginRequiredMixin, ReplicaReadMixin, ListView):
     """
     View to list all patients with optional search and gender filtering. 
     Results are cached to reduce database load and improve performance.
@@ -40,7 +44,8 @@ class PatientListView(LoginRequiredMixin, ListView):
                     queryset = queryset.filter(full_name__icontains=search_query)
 
                 if gender_filter:
-                    queryset = queryset.filter(gender__icontains=gender_filter)
+                    # Exact match: 'male' must not match 'female'
+                    queryset = queryset.filter(gender=gender_filter)
 
                 queryset = queryset.order_by('full_name')  # Adjust ordering as needed
                 cache.set(cache_key, queryset, timeout=60)
@@ -60,6 +65,12 @@ class PatientListView(LoginRequiredMixin, ListView):
         context['list_name'] = "Patient's List"
         context['search_query'] = self.request.GET.get('search', '')
         context['gender_filter'] = self.request.GET.get('gender', '')
+        # Gender counts among the patients matching the name search
+        patients = CustomUser.objects.filter(role='patient')
+        if context['search_query']:
+            patients = patients.filter(full_name__icontains=context['search_query'])
+        context['gender_facets'] = facet_counts(
+            patients, 'gender', USERS_VERSION, f"patient_list_{context['search_query']}")
         return context
 
 patient_list_view = PatientListView.as_view()
@@ -133,17 +144,20 @@ class DeletePatientView(LoginRequiredMixin, DeleteView):
         pk = self.kwargs.get('pk')
         return get_object_or_404(CustomUser, pk=pk, role='patient')
 
-    @transaction.atomic
-    def delete(self, request, *args, **kwargs):
+    def form_valid(self, form):
         """
-        Deletes the patient within a transaction to ensure data consistency. 
-        Handles exceptions by redirecting to the patient list.
+        Soft-deletes the patient at once; their appointments, records and
+        files are removed in batches by ``manage.py purge_users``.
         """
         try:
-            return super().delete(request, *args, **kwargs)
+            soft_delete_user(self.object, requested_by=self.request.user)
         except Exception as e:
             logger.error(f"Error deleting patient: {e}")
-            # Handle any exceptions, maybe redirect to an error page or show a message
-            return redirect('patient_list_view')
+        return redirect(self.success_url)
+
+    def delete(self, request, *args, **kwargs):
+        # DELETE requests take the same path as the confirmation form
+        self.object = self.get_object()
+        return self.form_valid(None)
 
 delete_patient_view = DeletePatientView.as_view()
@@ -1,98 +1,124 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import transaction
-from ..models import MedicalRecord, Appointment, CustomUser
+from ..models import MedicalRecord, Appointment, CustomUser, RecordAccessLog
 from ..forms import CreateRecordForm
+from ..audit import record_access
+from ..caching import bump_version, get_version
 import logging
-from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
 
 logger = logging.getLogger(__name__)
 
+
+def records_version_name(appointment_id):
+    """Name of the cache version covering the records of an appointment."""
+    return f'records_{appointment_id}'
+
+
+def record_list_etag(request, appointment_id):
+    """ETag for a record list page: changes when the records or the viewer change."""
+    version = get_version(records_version_name(appointment_id))
+    return f'records-{appointment_id}-{version}-{request.user.pk}'
+
+
 class RecordListView(LoginRequiredMixin, View):
     """
-    A view to display and manage medical records associated with an appointment, patient, and doctor.
-    Caches the medical records for faster access and invalidates the cache when a new record is added.
+    A view to display and manage the medical records of an appointment.
+
+    The appointment is addressed by URL (``/appointments/<id>/records/``), so
+    the page needs no session state and can be opened in several tabs. The
+    rendered record list is cached as a template fragment keyed on the
+    appointment's record version, which is bumped whenever a record is added
+    or updated, and the response carries an ETag derived from that version.
+    Each page sent is recorded in the access audit log; a 304 sends no records.
     """
 
     template_name = 'patients/med-records.html'
 
-    def get(self, request):
-        """
-        Handles the GET request to display medical records for a specific appointment, patient, and doctor.
-        Uses caching to improve performance.
-        """
-        appointment_id = request.session.get('appointment_id')
-        patient_id = request.session.get('patient_id')
-        doctor_id = request.session.get('doctor_id')
-
-        # Cache key based on the appointment, patient, and doctor IDs
-        cache_key = f'record_list_{appointment_id}_{patient_id}_{doctor_id}'
-        records = cache.get(cache_key)
-
-        if records is None:
-            logger.info(f'Cache miss for key: {cache_key}')
-            records = MedicalRecord.objects.filter(appointment_id=appointment_id)
-            cache.set(cache_key, records, timeout=60)
-        else:
-            logger.info(f'Cache hit for key: {cache_key}')
-
-        record_form = CreateRecordForm()
+    def get_appointment(self, appointment_id):
+        return get_object_or_404(Appointment.objects.only('id', 'patient_id', 'doctor_id'), pk=appointment_id)
 
+    def get_context(self, appointment, record_form):
+        # The queryset is lazy: it is only evaluated when the cached fragment is missing.
         record_lists = {
-            'appointment_id': appointment_id,
-            'patient_id': patient_id,
-            'doctor_id': doctor_id,
-            'records': records
+            'appointment_id': appointment.id,
+            'patient_id': appointment.patient_id,
+            'doctor_id': appointment.doctor_id,
+            'records': MedicalRecord.objects.filter(appointment_id=appointment.id),
         }
-
-        return render(request, self.template_name, {
+        return {
             'record_list': record_lists,
             'record_form': record_form,
-        })
+            'record_version': get_version(records_version_name(appointment.id)),
+        }
 
-    def post(self, request):
+    @method_decorator(cache_control(private=True, no_cache=True))
+    @method_decorator(condition(etag_func=record_list_etag))
+    def get(self, request, appointment_id):
         """
-        Handles the POST request to create a new medical record and invalidates the relevant cache entry.
+        Handles the GET request to display the medical records of an appointment.
         """
-        appointment_id = request.POST.get('appointment_id') or request.session.get('appointment_id')
-        patient_id = request.POST.get('patient_id') or request.session.get('patient_id')
-        doctor_id = request.POST.get('doctor_id') or request.session.get('doctor_id')
+        appointment = self.get_appointment(appointment_id)
+        record_access(request, RecordAccessLog.LIST, patient_id=appointment.patient_id, appointment_id=appointment.id)
+        return render(request, self.template_name, self.get_context(appointment, CreateRecordForm()))
 
-        records = MedicalRecord.objects.filter(appointment_id=appointment_id)
-        record_form = CreateRecordForm(request.POST)
+    def post(self, request, appointment_id):
+        """
+        Handles the POST request to create a new medical record for the appointment
+        and invalidates its cached record list.
+        """
+        appointment = self.get_appointment(appointment_id)
+        record_form = CreateRecordForm(request.POST, request.FILES)
 
         if record_form.is_valid():
             try:
                 with transaction.atomic():
-                    record_form.save()
+                    record = record_form.save(commit=False)
+                    record.appointment_id = appointment.id
+                    record.patient_id = appointment.patient_id
+                    record.doctor_id = appointment.doctor_id
+                    record.save()
 
-                cache_key = f'record_list_{appointment_id}_{patient_id}_{doctor_id}'
-                cache.delete(cache_key)
-                logger.info(f'Cache invalidated for key: {cache_key}')
+                bump_version(records_version_name(appointment.id))
+                logger.info(f'Record list invalidated for appointment {appointment.id}')
 
-                return redirect('record_list_view')  # Redirect after successful creation
+                return redirect('record_list_view', appointment_id=appointment.id)  # Redirect after successful creation
             except Exception as e:
                 logger.error(f"Error saving record: {e}")
                 record_form.add_error(None, "There was an error saving the record.")
 
-        record_lists = {
-            'appointment_id': appointment_id,
-            'patient_id': patient_id,
-            'doctor_id': doctor_id,
-            'records': records
-        }
-
-        return render(request, self.template_name, {
-            'record_list': record_lists,
-            'record_form': record_form,
-        })
+        return render(request, self.template_name, self.get_context(appointment, record_form))
 
 # Use this view in your URLs
 record_list_view = RecordListView.as_view()
 
 
+class LegacyRecordListRedirectView(LoginRequiredMixin, View):
+    """
+    Redirects the old ``/patient-medical-records/`` address, which carried the
+    appointment in the request body or session, to the appointment's record list URL.
+    """
+
+    def redirect_to_records(self, appointment_id):
+        if not appointment_id or not appointment_id.isdigit():
+            raise Http404('No appointment selected.')
+        return redirect('record_list_view', appointment_id=int(appointment_id))
+
+    def get(self, request):
+        return self.redirect_to_records(request.GET.get('appointment_id'))
+
+    def post(self, request):
+        return self.redirect_to_records(request.POST.get('appointment_id'))
+
+legacy_record_list_view = LegacyRecordListRedirectView.as_view()
+
+
 class RecordsView(LoginRequiredMixin, View):
     """
     A view to handle the creation and updating of medical records for a specific appointment, patient, and doctor.
@@ -124,6 +150,9 @@ class RecordsView(LoginRequiredMixin, View):
             except MedicalRecord.DoesNotExist:
                 logger.info(f"No record found for appointment_id={appointment_id}, patient_id={patient_id}")
                 form = self.form_class()  # Show an empty form
+            if form.instance.pk:
+                record_access(request, RecordAccessLog.EDIT_FORM, patient_id=form.instance.patient_id,
+                              appointment_id=form.instance.appointment_id, record_id=form.instance.pk)
         else:
             form = self.form_class()
 
@@ -140,13 +169,12 @@ class RecordsView(LoginRequiredMixin, View):
         and the record is either created or updated in the database.
         """
         records_form = self.form_class(request.POST, request.FILES)  # Include request.FILES to handle file uploads
+        appointment_id = request.POST.get('appointment_id')
+        patient_id = request.POST.get('patient_id')
+        doctor_id = request.POST.get('doctor_id')
+        type_edit = request.POST.get('type')
 
         if records_form.is_valid():
-            appointment_id = request.POST.get('appointment_id')
-            patient_id = request.POST.get('patient_id')
-            doctor_id = request.POST.get('doctor_id')
-            type_edit = request.POST.get('type')
-
             try:
                 with transaction.atomic():
                     appointment = Appointment.objects.get(id=appointment_id)
@@ -170,11 +198,8 @@ class RecordsView(LoginRequiredMixin, View):
                             setattr(medical_record, field, value)
                         medical_record.save()
 
-                    request.session['appointment_id'] = appointment_id
-                    request.session['patient_id'] = patient_id
-                    request.session['doctor_id'] = doctor_id
-
-                return redirect('record_list_view')  # Redirect to your list view after the update
+                bump_version(records_version_name(appointment.id))
+                return redirect('record_list_view', appointment_id=appointment.id)  # Redirect to the list view after the update
 
             except Exception as e:
                 logger.error(f"Error during record creation/updating: {e}")
@@ -0,0 +1,54 @@
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from ..db_routing import ReplicaReadMixin
+from ..models import MedicalRecord
+from ..search import scope_records, search_records
+from ..serializers import MedicalRecordSerializer
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class MedicalRecordSearchAPIView(ReplicaReadMixin, APIView):
+    """
+    API view searching the diagnosis, treatment and notes of medical records.
+
+    * Query parameters: ``q`` (the words to find, all of them must match),
+      ``patient`` (optional, only that patient's records) and ``limit``
+      (results, at most 100).
+    * Results are ranked best first, each with its ``score`` and a
+      ``snippet`` of the matched text with the terms wrapped in ``<mark>``.
+    * Admins search every record, doctors the records they wrote and
+      patients their own records.
+    * Uses TokenAuthentication for authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'error': 'The q parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+            patient = request.query_params.get('patient')
+            queryset = scope_records(MedicalRecord.objects.all(), request.user)
+            if patient:
+                queryset = queryset.filter(patient_id=int(patient))
+        except ValueError:
+            return Response({'error': 'limit and patient must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be at least 1.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [
+            {
+                'score': result['score'],
+                'snippet': result['snippet'],
+                'record': MedicalRecordSerializer(result['record'], context={'request': request}).data,
+            }
+            for result in search_records(queryset, text, limit)
+        ]
+        return Response({'results': results})
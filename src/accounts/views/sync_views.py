@@ -0,0 +1,36 @@
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from ..sync import DEFAULT_LIMIT, MAX_LIMIT, sync_changes
+
+
+class SyncAPIView(APIView):
+    """
+    API view returning the appointments and medical records changed since a
+    client's last sync, for offline clients (see ``accounts.sync``).
+
+    * Query parameters: ``since`` (the ``watermark`` of the previous
+      response; omit it for a full sync) and ``limit`` (rows per page, at
+      most 5000). Call again with the new ``watermark`` while ``more`` is true.
+    * ``deleted`` lists the ids deleted, archived or reassigned to someone
+      else since ``since``. When ``full_resync`` is true the client must
+      first drop its local copy.
+    * Doctors sync their appointments and records, patients their own, and
+      admins everything.
+    * Reads the primary database: a lagging replica could hide changes
+      older than the watermark.
+    * Uses TokenAuthentication for authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+            changes = sync_changes(request.user, request.query_params.get('since') or None, max(limit, 1))
+        except ValueError:
+            return Response({'error': 'since must be a watermark from a previous sync and limit an integer.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(changes)
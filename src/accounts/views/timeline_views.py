@@ -0,0 +1,73 @@
+from django.shortcuts import get_object_or_404, render
+from django.views import View
+from django.contrib.auth.mixins import LoginRequiredMixin
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from ..models import CustomUser
+from ..db_routing import ReplicaReadMixin
+from ..permissions import IsSuperAdmin
+from ..serializers import AppointmentSerializer, MedicalRecordSerializer
+from ..timeline import APPOINTMENT, DEFAULT_PAGE_SIZE, InvalidCursor, get_patient_timeline
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PatientTimelineView(LoginRequiredMixin, ReplicaReadMixin, View):
+    """
+    View displaying a patient's appointments and medical records as a single
+    chronological timeline, newest first, paginated with an opaque cursor.
+    """
+    template_name = 'patients/patient_timeline.html'
+    paginate_by = DEFAULT_PAGE_SIZE
+
+    def get(self, request, pk):
+        patient = get_object_or_404(CustomUser, pk=pk, role='patient')
+        try:
+            timeline = get_patient_timeline(patient, request.GET.get('cursor'), self.paginate_by)
+        except InvalidCursor:
+            logger.warning(f"Invalid timeline cursor for patient {pk}, showing first page")
+            timeline = get_patient_timeline(patient, None, self.paginate_by)
+
+        return render(request, self.template_name, {
+            'patient': patient,
+            'entries': timeline['entries'],
+            'next_cursor': timeline['next_cursor'],
+        })
+
+patient_timeline_view = PatientTimelineView.as_view()
+
+
+class PatientTimelineAPIView(APIView):
+    """
+    API view returning one page of a patient's timeline.
+
+    * Query parameters: ``cursor`` (from the previous page's ``next_cursor``)
+      and ``limit`` (page size, capped at 100).
+    * Only superusers can access this view.
+    * Uses TokenAuthentication for authentication.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsSuperAdmin]
+
+    def get(self, request, pk):
+        patient = get_object_or_404(CustomUser, pk=pk, role='patient')
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+            timeline = get_patient_timeline(patient, request.query_params.get('cursor'), limit)
+        except (InvalidCursor, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = {'request': request, 'view': self}
+        results = []
+        for entry in timeline['entries']:
+            serializer_class = AppointmentSerializer if entry['kind'] == APPOINTMENT else MedicalRecordSerializer
+            results.append({
+                'kind': entry['kind'],
+                'timestamp': entry['timestamp'],
+                'data': serializer_class(entry['object'], context=context).data,
+            })
+
+        return Response({'results': results, 'next_cursor': timeline['next_cursor']})
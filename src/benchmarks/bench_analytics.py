@@ -0,0 +1,101 @@
+"""
+Benchmark the doctor analytics over a large period of appointments: the
+vectorized NumPy computation (``accounts.analytics.compute_analytics``) versus
+the same statistics computed with a Python loop over the fetched rows.
+
+Runs against a throw-away test database. From the ``src`` directory:
+
+    python -m benchmarks.bench_analytics [--appointments 200000] [--doctors 50]
+"""
+import argparse
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_management_system.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from accounts.analytics import compute_analytics, fetch_appointment_columns, period_bounds
+from accounts.models import Appointment, CustomUser
+
+
+def seed(appointments, doctors, days):
+    doctor_ids = [
+        CustomUser.objects.create(username=f'doc{i}', email=f'doc{i}@example.com', role='doctor', full_name=f'Doc {i}').pk
+        for i in range(doctors)
+    ]
+    patient = CustomUser.objects.create(username='pat', email='pat@example.com', role='patient')
+    start = timezone.now() - timedelta(days=days)
+    statuses = ['completed'] * 6 + ['cancelled'] * 2 + ['overdue', 'pending']
+    batch = []
+    for _ in range(appointments):
+        batch.append(Appointment(
+            doctor_id=random.choice(doctor_ids), patient=patient, status=random.choice(statuses),
+            scheduled_at=start + timedelta(minutes=random.randrange(days * 24 * 60)),
+        ))
+        if len(batch) == 10000:
+            Appointment.objects.bulk_create(batch)
+            batch = []
+    Appointment.objects.bulk_create(batch)
+
+
+def compute_with_loops(start, end):
+    """The per-doctor counts and the heatmap, with a Python loop over the appointments."""
+    lower, upper = period_bounds(start, end)
+    per_doctor = defaultdict(Counter)
+    heatmap = [[0] * 24 for _ in range(7)]
+    rows = Appointment.objects.filter(scheduled_at__gte=lower, scheduled_at__lt=upper).values_list(
+        'doctor_id', 'status', 'scheduled_at')
+    for doctor_id, status, scheduled_at in rows:
+        local = timezone.localtime(scheduled_at)
+        per_doctor[doctor_id]['total'] += 1
+        per_doctor[doctor_id][status] += 1
+        heatmap[local.weekday()][local.hour] += 1
+    return per_doctor, heatmap
+
+
+def timed(function, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appointments', type=int, default=200000)
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--days', type=int, default=3 * 365, help='length of the period covered')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        seed(args.appointments, args.doctors, args.days)
+        end = timezone.localdate()
+        start = end - timedelta(days=args.days)
+        fetch = timed(fetch_appointment_columns, start, end)
+        vectorized = timed(compute_analytics, start, end)
+        loops = timed(compute_with_loops, start, end)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(f'{args.appointments} appointments, {args.doctors} doctors, {args.days} days')
+    print(f'query + conversion to arrays:    {fetch * 1000:8.1f} ms')
+    print(f'NumPy analytics (incl. query):  {vectorized * 1000:8.1f} ms')
+    print(f'Python loops (incl. query):     {loops * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark the appointment list read path under slow clients: the synchronous
+DRF view behind the WSGI handler versus the async view behind the ASGI handler.
+
+Each simulated client takes ``--client-delay`` seconds to receive the response
+body. Under WSGI that delay is spent inside a worker thread (``--workers`` of
+them, as with a threaded WSGI server); under ASGI it is an ``await`` that frees
+the event loop for other requests.
+
+The async view caches its responses and the DRF view does not, so both run
+with a dummy cache: every request queries and serializes the appointments,
+and only the handler differs. Both run the production middleware (without the
+sync-only debug toolbar), including the slow query log at ``--slow-query-ms``.
+
+Runs against a throw-away test database. From the ``src`` directory:
+
+    python -m benchmarks.bench_asgi_wsgi [--requests 200] [--workers 8] [--client-delay 0.05] [--slow-query-ms 200]
+"""
+import argparse
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_management_system.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts.models import Appointment, CustomUser
+
+
+def seed(appointments):
+    admin = CustomUser.objects.create_superuser(username='bench', password='bench', email='bench@example.com')
+    doctor = CustomUser.objects.create(username='doc', email='doc@example.com', role='doctor', full_name='Doc')
+    patient = CustomUser.objects.create(username='pat', email='pat@example.com', role='patient', full_name='Pat')
+    Appointment.objects.bulk_create(
+        Appointment(doctor=doctor, patient=patient, scheduled_at=timezone.now()) for _ in range(appointments)
+    )
+    return Token.objects.create(user=admin).key
+
+
+def run_wsgi(path, token, requests, workers, client_delay):
+    application = get_wsgi_application()
+
+    def one_request():
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'testserver',
+            'HTTP_AUTHORIZATION': f'Token {token}', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.errors': io.StringIO(), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        statuses = []
+        body = application(environ, lambda status, headers: statuses.append(status))
+        for _chunk in body:
+            time.sleep(client_delay)  # Slow client: the worker thread waits on the socket
+        body.close()
+        assert statuses[0].startswith('200'), statuses[0]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(one_request) for _ in range(requests)]:
+            future.result()
+    return time.perf_counter() - start
+
+
+def run_asgi(path, token, requests, client_delay):
+    application = get_asgi_application()
+
+    async def one_request():
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Token {token}'.encode())],
+            'client': ('127.0.0.1', 12345), 'server': ('testserver', 80),
+        }
+        statuses = []
+        requested = []
+        disconnected = asyncio.Event()
+
+        async def receive():
+            if not requested:
+                requested.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnected.wait()  # The client stays connected until the response is sent
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+            elif message['type'] == 'http.response.body':
+                await asyncio.sleep(client_delay)  # Slow client: only this coroutine waits
+
+        await application(scope, receive, send)
+        disconnected.set()
+        assert statuses[0] == 200, statuses[0]
+
+    async def main():
+        await asyncio.gather(*(one_request() for _ in range(requests)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8, help='WSGI worker threads')
+    parser.add_argument('--client-delay', type=float, default=0.05, help='seconds each client takes to read')
+    parser.add_argument('--appointments', type=int, default=200)
+    parser.add_argument('--slow-query-ms', type=float, default=200, help='slow query log threshold, 0 to disable')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        # No response caching on either side (see the module docstring)
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('debug_toolbar.')]
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+                               MIDDLEWARE=middleware, SLOW_QUERY_MS=args.slow_query_ms, DEBUG=False):
+            token = seed(args.appointments)
+            wsgi = run_wsgi('/appointments/', token, args.requests, args.workers, args.client_delay)
+            asgi = run_asgi('/async/appointments/', token, args.requests, args.client_delay)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(f'{args.requests} requests, {args.appointments} appointments, {args.client_delay * 1000:.0f} ms client delay, '
+          f'slow query log {f"at {args.slow_query_ms:g} ms" if args.slow_query_ms else "off"}')
+    print(f'WSGI sync view ({args.workers} threads): {wsgi:6.2f} s  {args.requests / wsgi:8.1f} req/s  (uncached)')
+    print(f'ASGI async view (event loop):  {asgi:6.2f} s  {args.requests / asgi:8.1f} req/s  (uncached)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark the record access audit log: the cost per access of buffering it
+(``accounts.audit``, written in one insert per ``AUDIT_FLUSH_SIZE``
+accesses) versus inserting an audit row on every access.
+
+Runs against a throw-away test database. From the ``src`` directory:
+
+    python -m benchmarks.bench_audit [--accesses 20000]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_management_system.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from accounts import audit
+from accounts.models import CustomUser, RecordAccessLog
+
+
+def synchronous(request, accesses):
+    for i in range(accesses):
+        RecordAccessLog.objects.create(user_id=request.user.pk, patient_id=i % 100, action=RecordAccessLog.LIST,
+                                       ip_address=request.META['REMOTE_ADDR'], accessed_at=timezone.now())
+
+
+def buffered(request, accesses):
+    for i in range(accesses):
+        audit.record_access(request, RecordAccessLog.LIST, patient_id=i % 100)
+        # What the request_finished receiver does after each response
+        audit.flush_if_due()
+    audit.flush()
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accesses', type=int, default=20000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        request = RequestFactory().get('/')
+        request.user = CustomUser.objects.create(username='doc', email='doc@example.com', role='doctor')
+        results = [('insert per access', timed(synchronous, request, args.accesses)),
+                   ('buffered', timed(buffered, request, args.accesses))]
+        written = RecordAccessLog.objects.count()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(f'{args.accesses} accesses, flushed every {settings.AUDIT_FLUSH_SIZE}; {written} rows written')
+    for label, seconds in results:
+        print(f'{label:<20} {seconds * 1e6 / args.accesses:8.1f} us per access')
+
+
+if __name__ == '__main__':
+    main()
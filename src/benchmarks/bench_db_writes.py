@@ -0,0 +1,110 @@
+"""
+Benchmark concurrent appointment writes against the configured database.
+
+Each thread books ``--writes`` appointments, one transaction each, and the
+script reports throughput and failed writes (e.g. "database is locked").
+
+With SQLite the benchmark runs twice on a temporary database file: once with
+Django's stock SQLite options and once with the tuned options from settings
+(WAL, synchronous=NORMAL, IMMEDIATE transactions). With PostgreSQL
+(DB_ENGINE=postgresql) it runs once against a throw-away test database using
+the configured CONN_MAX_AGE / pool settings.
+
+From the ``src`` directory:
+
+    python -m benchmarks.bench_db_writes [--threads 16] [--writes 100]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_management_system.settings')
+
+import django
+
+django.setup()
+
+from django.db import OperationalError, connection, connections, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from accounts.models import Appointment, CustomUser
+
+STOCK_SQLITE_OPTIONS = {}
+
+
+def book_appointments(doctor_id, patient_id, writes, barrier, results):
+    completed = failed = 0
+    barrier.wait()
+    try:
+        for _ in range(writes):
+            try:
+                with transaction.atomic():
+                    Appointment.objects.create(doctor_id=doctor_id, patient_id=patient_id, scheduled_at=timezone.now())
+                completed += 1
+            except OperationalError:
+                failed += 1
+    finally:
+        connections.close_all()
+    results.append((completed, failed))
+
+
+def run(threads, writes):
+    doctor = CustomUser.objects.create(username=f'doc{time.time_ns()}', email=f'doc{time.time_ns()}@example.com', role='doctor')
+    patient = CustomUser.objects.create(username=f'pat{time.time_ns()}', email=f'pat{time.time_ns()}@example.com', role='patient')
+    connections.close_all()
+
+    barrier = threading.Barrier(threads + 1)
+    results = []
+    workers = [
+        threading.Thread(target=book_appointments, args=(doctor.pk, patient.pk, writes, barrier, results))
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    completed = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    return completed / elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--writes', type=int, default=100, help='appointments booked per thread')
+    args = parser.parse_args()
+
+    database = connection.settings_dict  # Shared by the connections of every thread
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        tuned_options = database['OPTIONS']
+        profiles = [('sqlite (stock options)', STOCK_SQLITE_OPTIONS), ('sqlite (tuned, WAL)', tuned_options)]
+    else:
+        profiles = [(f"{connection.vendor} (CONN_MAX_AGE={database['CONN_MAX_AGE']}, "
+                     f"pool={'pool' in database['OPTIONS']})", database['OPTIONS'])]
+
+    print(f'{args.threads} threads x {args.writes} appointment writes')
+    for label, options in profiles:
+        with tempfile.TemporaryDirectory() as directory:
+            database['OPTIONS'] = options
+            if connection.vendor == 'sqlite':
+                database['TEST']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+            connections.close_all()
+            old_name = connection.creation.create_test_db(verbosity=0)
+            try:
+                with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+                    throughput, failed = run(args.threads, args.writes)
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        print(f'{label:<45} {throughput:8.1f} writes/s  {failed:5d} failed')
+
+
+if __name__ == '__main__':
+    main()
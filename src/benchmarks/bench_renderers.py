@@ -0,0 +1,68 @@
+"""
+Benchmark API rendering of a large appointment list: DRF's ``JSONRenderer``
+versus ``ORJSONRenderer`` and ``MessagePackRenderer`` (encode time and
+size), and the size of each body after gzip (and Brotli, if installed) as
+``CompressionMiddleware`` sends it.
+
+Serializes in-memory appointments (no database access). Run from the ``src``
+directory:
+
+    python -m benchmarks.bench_renderers [--rows 10000] [--repeat 20]
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_management_system.settings')
+
+import django
+
+django.setup()
+
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from accounts.compression import BROTLI_QUALITY, brotli
+from accounts.models import Appointment
+from accounts.renderers import MessagePackRenderer, ORJSONRenderer
+from accounts.serializers import AppointmentSerializer
+
+
+def make_data(rows):
+    start = datetime(2024, 9, 1, 8, tzinfo=timezone.utc)
+    appointments = [
+        Appointment(pk=index + 1, doctor_id=index % 40 + 1, patient_id=index % 900 + 100,
+                    scheduled_at=start + timedelta(minutes=30 * index), status='pending',
+                    notes=f'Follow-up visit {index}, bring previous results', created_at=start, updated_at=start)
+        for index in range(rows)
+    ]
+    return AppointmentSerializer(appointments, many=True).data
+
+
+def time_render(renderer, data, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = renderer.render(data, renderer.media_type)
+    return (time.perf_counter() - start) / repeat * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    data = make_data(args.rows)
+    print(f'{args.rows} appointments, average of {args.repeat} renders')
+    print(f'{"":<22} {"encode":>10} {"size":>10} {"gzip":>10} {"brotli":>10}')
+    for label, renderer in [('DRF JSONRenderer', JSONRenderer()), ('ORJSONRenderer', ORJSONRenderer()),
+                            ('MessagePackRenderer', MessagePackRenderer())]:
+        ms, body = time_render(renderer, data, args.repeat)
+        gzipped = len(compress_string(body))
+        brotlied = f'{len(brotli.compress(body, quality=BROTLI_QUALITY)) // 1024:>7} KB' if brotli else f'{"n/a":>10}'
+        print(f'{label:<22} {ms:7.1f} ms {len(body) // 1024:>7} KB {gzipped // 1024:>7} KB {brotlied}')
+
+
+if __name__ == '__main__':
+    main()
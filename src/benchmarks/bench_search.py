@@ -0,0 +1,103 @@
+"""
+Benchmark medical record search: the full-text index (``accounts.search``)
+versus ``icontains`` over the diagnosis, treatment and notes, for a rare and
+a common word, across all records and within one doctor's records.
+
+Runs against a throw-away test database. From the ``src`` directory:
+
+    python -m benchmarks.bench_search [--records 200000] [--doctors 50]
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_management_system.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import override_settings, setup_test_environment
+from django.utils import timezone
+
+from accounts.models import Appointment, CustomUser, MedicalRecord
+from accounts.search import search_records
+
+VOCABULARY = ('fever cough headache fatigue nausea rash fracture sprain asthma diabetes hypertension '
+              'migraine infection allergy anemia bronchitis dermatitis gastritis insomnia arthritis').split()
+TREATMENTS = 'rest fluids antibiotics inhaler insulin physiotherapy cast ointment antihistamines'.split()
+RARE_WORD = 'sarcoidosis'
+LIMIT = 20
+
+
+def seed(records, doctors):
+    doctor_ids = [
+        CustomUser.objects.create(username=f'doc{i}', email=f'doc{i}@example.com', role='doctor').pk
+        for i in range(doctors)
+    ]
+    patient = CustomUser.objects.create(username='pat', email='pat@example.com', role='patient')
+    appointment = Appointment.objects.create(doctor_id=doctor_ids[0], patient=patient, scheduled_at=timezone.now())
+    batch = []
+    for i in range(records):
+        notes = ' '.join(random.choices(VOCABULARY + TREATMENTS, k=30))
+        if i % 10000 == 0:
+            notes += f' {RARE_WORD}'
+        batch.append(MedicalRecord(
+            doctor_id=random.choice(doctor_ids), patient=patient, appointment=appointment,
+            diagnosis=' '.join(random.sample(VOCABULARY, 2)), treatment=' '.join(random.sample(TREATMENTS, 2)),
+            notes=notes,
+        ))
+        if len(batch) == 10000:
+            MedicalRecord.objects.bulk_create(batch)
+            batch = []
+    MedicalRecord.objects.bulk_create(batch)
+    return doctor_ids[0]
+
+
+def search_with_icontains(queryset, word):
+    matches = Q(diagnosis__icontains=word) | Q(treatment__icontains=word) | Q(notes__icontains=word)
+    return list(queryset.filter(matches).select_related('doctor', 'patient').order_by('-created_at')[:LIMIT])
+
+
+def timed(function, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--doctors', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    results = []
+    try:
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            doctor_id = seed(args.records, args.doctors)
+        scopes = [('all records', MedicalRecord.objects.all()),
+                  ('one doctor', MedicalRecord.objects.filter(doctor_id=doctor_id))]
+        for word in (RARE_WORD, 'asthma'):
+            for scope, queryset in scopes:
+                indexed = timed(search_records, queryset, word, LIMIT)
+                scan = timed(search_with_icontains, queryset, word)
+                results.append((f'{word!r}, {scope}', indexed, scan))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(f'{args.records} records, {args.doctors} doctors, top {LIMIT} results')
+    print(f'{"":<32} {"full-text":>11} {"icontains":>11}')
+    for label, indexed, scan in results:
+        print(f'{label:<32} {indexed * 1000:8.1f} ms {scan * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark worker startup: importing ``wsgi.application`` and loading the
+URLconf (which Django does on a worker's first request), for each settings
+profile.
+
+Every run is a fresh interpreter, as a new worker process would be, and the
+median of ``--runs`` runs is reported. From the ``src`` directory:
+
+    python -m benchmarks.bench_startup [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROFILES = [
+    ('development settings', 'hospital_management_system.settings', {}),
+    ('production settings', 'hospital_management_system.settings_production', {'SECRET_KEY': 'benchmark'}),
+    ('production settings, API_DOCS=1', 'hospital_management_system.settings_production',
+     {'SECRET_KEY': 'benchmark', 'API_DOCS': '1'}),
+]
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from hospital_management_system.wsgi import application
+loaded = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(loaded - start, time.perf_counter() - loaded)
+"""
+
+
+def measure(settings_module, env, runs):
+    environment = {**os.environ, **env, 'DJANGO_SETTINGS_MODULE': settings_module}
+    application, urlconf = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], env=environment,
+                                capture_output=True, text=True, check=True).stdout
+        application_seconds, urlconf_seconds = map(float, output.split())
+        application.append(application_seconds * 1000)
+        urlconf.append(urlconf_seconds * 1000)
+    return statistics.median(application), statistics.median(urlconf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f'median of {args.runs} runs (ms)')
+    print(f'{"":<35} {"wsgi.application":>17} {"URLconf":>9} {"total":>9}')
+    for label, settings_module, env in PROFILES:
+        application, urlconf = measure(settings_module, env, args.runs)
+        print(f'{label:<35} {application:17.1f} {urlconf:9.1f} {application + urlconf:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark rendering of the doctor and patient list pages.
+
+Compares, for a page of in-memory rows (no database access):
+- an uncached template loader with no fragment cache (every render re-parses
+  the templates and renders every row),
+- the cached template loader with no fragment cache,
+- the cached template loader with warm row fragments.
+
+Run from the ``src`` directory:
+
+    python -m benchmarks.bench_templates [--rows 200] [--repeat 50]
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_management_system.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+from django.test.utils import override_settings
+
+from accounts.models import CustomUser
+
+
+def make_backend(cached):
+    loaders = settings.TEMPLATE_LOADERS
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    return DjangoTemplates({
+        'NAME': 'cached' if cached else 'uncached',
+        'DIRS': [settings.BASE_DIR / 'templates'],
+        'APP_DIRS': False,
+        'OPTIONS': {'loaders': loaders},
+    })
+
+
+def make_users(role, rows):
+    updated_at = datetime(2024, 9, 1, tzinfo=timezone.utc)
+    return [
+        CustomUser(
+            pk=index + 1, role=role, full_name=f'{role.title()} {index}', email=f'{role}{index}@example.com',
+            specialization='Cardiology', gender='female', updated_at=updated_at,
+        )
+        for index in range(rows)
+    ]
+
+
+def time_render(backend, template_name, context, repeat):
+    backend.get_template(template_name).render(context)  # Warm loader and fragment caches
+    start = time.perf_counter()
+    for _ in range(repeat):
+        backend.get_template(template_name).render(context)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    pages = [
+        ('accounts/doctor_list.html', {'doctors': make_users('doctor', args.rows), 'list_name': "Doctor's List"}),
+        ('patients/patient_list.html', {'patients': make_users('patient', args.rows), 'list_name': "Patient's List"}),
+    ]
+    dummy = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    print(f'{"template":<30} {"uncached loader":>16} {"cached loader":>14} {"warm fragments":>15}   (ms/render, {args.rows} rows)')
+    for template_name, context in pages:
+        with override_settings(CACHES=dummy):
+            uncached = time_render(make_backend(cached=False), template_name, context, args.repeat)
+            cached = time_render(make_backend(cached=True), template_name, context, args.repeat)
+        with override_settings(CACHES=locmem):
+            fragments = time_render(make_backend(cached=True), template_name, context, args.repeat)
+        print(f'{template_name:<30} {uncached:>16.2f} {cached:>14.2f} {fragments:>15.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+API documentation: the OpenAPI schema and the Swagger UI.
+
+The schema is generated once, at build or deploy time, by
+``manage.py build_openapi_schema`` into ``settings.OPENAPI_SCHEMA_DIR``
+(``schema.json`` and ``schema.yaml``). Workers only serve those files, with
+an ETag. The Swagger UI is loaded from a CDN and fetches the JSON schema by
+its content hash, so browsers and caches can keep it until the next deploy.
+
+Without a prebuilt schema, when drf_yasg is installed (development), the
+schema is generated on its first request and kept for the life of the process.
+"""
+import hashlib
+import os
+from functools import lru_cache
+from django.apps import apps
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views import View
+from django.views.generic import TemplateView
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_FORMATS = {
+    'json': 'application/json',
+    'yaml': 'application/yaml',
+}
+
+# Responses requested by content hash never change
+VERSIONED_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def api_info():
+    """The title, version and contact of the API (requires drf_yasg)."""
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="HealthSync API",
+        default_version='v1',
+        description="API documentation for HealthSync",
+        contact=openapi.Contact(email="usjidn@gmail.com"),
+        license=openapi.License(name="BSD License"),
+    )
+
+
+def generate_schema():
+    """Introspect the API and return its OpenAPI schema (requires drf_yasg)."""
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    return OpenAPISchemaGenerator(info=api_info()).get_schema(request=None, public=True)
+
+
+def encode_schema(schema, fmt):
+    """The schema encoded as ``json`` or ``yaml`` bytes."""
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+
+    codec = OpenAPICodecJson(validators=[], pretty=True) if fmt == 'json' else OpenAPICodecYaml(validators=[])
+    return codec.encode(schema)
+
+
+def schema_path(fmt):
+    return os.path.join(settings.OPENAPI_SCHEMA_DIR, f'schema.{fmt}')
+
+
+def schema_etag(content):
+    return hashlib.sha256(content).hexdigest()[:20]
+
+
+@lru_cache(maxsize=8)
+def _read_schema(path, mtime):
+    # Keyed on the modification time, so a rebuilt schema is picked up
+    with open(path, 'rb') as schema_file:
+        content = schema_file.read()
+    return content, schema_etag(content)
+
+
+@lru_cache(maxsize=None)
+def _generated_schema(fmt):
+    logger.warning(f"No prebuilt OpenAPI schema in {settings.OPENAPI_SCHEMA_DIR}, generating it; "
+                   f"run 'manage.py build_openapi_schema' at deploy time")
+    content = encode_schema(generate_schema(), fmt)
+    return content, schema_etag(content)
+
+
+def load_schema(fmt):
+    """
+    Return ``(content, etag)`` of the schema in ``fmt``, or None when there is
+    no prebuilt schema and drf_yasg is not installed to generate one.
+    """
+    path = schema_path(fmt)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        if apps.is_installed('drf_yasg'):
+            return _generated_schema(fmt)
+        return None
+    return _read_schema(path, mtime)
+
+
+class OpenAPISchemaView(View):
+    """
+    Serve the OpenAPI schema as JSON or YAML, with an ETag.
+
+    A request carrying the current content hash (``?v=<etag>``, as made by the
+    Swagger UI) may be cached for a year; others are revalidated each time.
+    """
+
+    def get(self, request, fmt):
+        schema = load_schema(fmt)
+        if schema is None:
+            raise Http404('The API schema has not been built.')
+        content, etag = schema
+
+        response = HttpResponse(content, content_type=SCHEMA_FORMATS[fmt])
+        response['ETag'] = f'"{etag}"'
+        if request.GET.get('v') == etag:
+            patch_cache_control(response, public=True, max_age=VERSIONED_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+        return get_conditional_response(request, etag=response['ETag'], response=response)
+
+openapi_schema_view = OpenAPISchemaView.as_view()
+
+
+class SwaggerUIView(TemplateView):
+    """
+    The Swagger UI, pointed at the current version of the JSON schema.
+    """
+    template_name = 'api_docs/swagger_ui.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        schema_url = reverse('openapi-schema', kwargs={'fmt': 'json'})
+        schema = load_schema('json')
+        context['schema_url'] = f'{schema_url}?v={schema[1]}' if schema else schema_url
+        return context
+
+swagger_ui_view = SwaggerUIView.as_view()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,6 +55,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',  # By default, all views require authentication
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'accounts.renderers.ORJSONRenderer',
+        'accounts.renderers.MessagePackRenderer',  # Accept: application/msgpack
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 AUTHENTICATION_BACKENDS = [
@@ -76,6 +82,11 @@ CACHES = {
 }
 
 
+# API docs at /swagger/. The schema is built at deploy time with
+# ``manage.py build_openapi_schema`` into OPENAPI_SCHEMA_DIR.
+API_DOCS_ENABLED = True
+OPENAPI_SCHEMA_DIR = os.environ.get('OPENAPI_SCHEMA_DIR', BASE_DIR / 'openapi')
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Bearer': {
@@ -91,19 +102,20 @@ SWAGGER_SETTINGS = {
 
 
 
-# settings.py
-import os
-
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'accounts.compression.CompressionMiddleware',  # Before anything that reads or changes the response body
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',  # Keep only one instance
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.db_routing.ReplicaPinningMiddleware',  # Inactive without a read replica
+    'accounts.profiling.ProfilingMiddleware',  # Inactive unless PROFILING_ENABLED
+    'accounts.slow_queries.SlowQueryMiddleware',  # Inactive when SLOW_QUERY_MS is 0
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',  # Corrected middleware
@@ -112,12 +124,21 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'hospital_management_system.urls'
 
+# Templates are parsed once per process and kept by the cached loader (the
+# development autoreloader still resets it when a template file changes).
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -134,12 +155,108 @@ WSGI_APPLICATION = 'hospital_management_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# Selected by environment variables. DB_ENGINE=postgresql uses PostgreSQL
+# (requires psycopg 3, plus psycopg-pool when DB_POOL=1); otherwise the
+# single-node SQLite database is used, tuned for concurrent readers and writers.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'curapulse'),
+            'USER': os.environ.get('DB_USER', 'curapulse'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # A connection pool replaces persistent connections (Django rejects both together)
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '20')),
+                    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+                },
+            } if DB_POOL else {},
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'OPTIONS': {
+                # Take the write lock at BEGIN, so concurrent writers wait for
+                # the busy timeout instead of failing with "database is locked"
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+                # WAL lets readers run alongside the writer; synchronous=NORMAL
+                # is durable across application crashes in WAL mode
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA mmap_size=134217728;'
+                ),
+            },
+        }
+    }
+
+# Optional PostgreSQL read replica (DB_REPLICA_HOST). Read-only views and
+# report jobs read from it; see accounts.db_routing.
+if DB_ENGINE == 'postgresql' and os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    READ_REPLICA_ALIAS = 'replica'
+else:
+    READ_REPLICA_ALIAS = None
+
+DATABASE_ROUTERS = ['accounts.db_routing.ReplicaRouter'] if READ_REPLICA_ALIAS else []
+
+# Seconds a client's reads stay on the primary after it writes
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '5'))
+
+# Completed and cancelled appointments older than this many days are moved to
+# the archive tables by ``manage.py archive_appointments``
+APPOINTMENT_ARCHIVE_DAYS = int(os.environ.get('APPOINTMENT_ARCHIVE_DAYS', '365'))
+
+# Appointments a doctor can take per working day (doctor utilization analytics)
+DOCTOR_DAILY_CAPACITY = int(os.environ.get('DOCTOR_DAILY_CAPACITY', '16'))
+
+# Change feed (accounts.outbox): events are kept this many days by
+# ``manage.py prune_outbox``
+OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', '7'))
+
+# Record access audit log (accounts.audit): buffered accesses are written in
+# one insert once there are this many, or the oldest is this many seconds old
+AUDIT_FLUSH_SIZE = int(os.environ.get('AUDIT_FLUSH_SIZE', '100'))
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', '5'))
+
+# Request profiling (accounts.profiling): superusers profile a page by adding
+# ?profile to its URL, and this fraction of all requests is profiled
+PROFILING_ENABLED = os.environ.get('PROFILING', '0') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_MAX_QUERIES = 1000  # SQL queries stored per profile
+PROFILING_KEEP = 500  # Newest profiles kept
+
+# Slow query log (accounts.slow_queries): queries taking this many milliseconds
+# or more are stored with their EXPLAIN plan; 0 disables the log
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+
+# Broker of the live dashboard events (accounts.events): 'memory' for a single
+# ASGI process, 'redis' to reach clients connected to any process
+EVENT_BROKER = os.environ.get('EVENT_BROKER', 'memory')
+EVENT_REDIS_URL = os.environ.get('EVENT_REDIS_URL', 'redis://127.0.0.1:6379/2')
 
 
 # Password validation
@@ -0,0 +1,35 @@
+"""
+Production settings for hospital_management_system.
+
+Select with DJANGO_SETTINGS_MODULE=hospital_management_system.settings_production.
+
+Extends the development settings, leaving out the development-only apps and
+middleware (django-debug-toolbar and drf-yasg) so that workers import and
+initialize less at boot. crispy_forms is kept: the templates render forms
+with it. The API docs, when enabled, serve the schema prebuilt by
+``manage.py build_openapi_schema``, which does not need drf-yasg at runtime.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host]
+
+# Always replaces the development key pulled in above, which is public
+SECRET_KEY = os.environ.get('SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('The SECRET_KEY environment variable must be set in production.')
+
+# Serve the Swagger UI and the prebuilt schema at /swagger/
+API_DOCS_ENABLED = os.environ.get('API_DOCS', '0') == '1'
+
+DEV_APPS = ['debug_toolbar', 'drf_yasg']
+DEV_MIDDLEWARE = ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEV_APPS]
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in DEV_MIDDLEWARE]
@@ -14,55 +14,31 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
-import debug_toolbar
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework import permissions
+from django.apps import apps
 from django.conf import settings
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from rest_framework import permissions
-
-# Define the security scheme for Bearer token
-schema_view = get_schema_view(
-    openapi.Info(
-        title="HealthSync API",
-        default_version='v1',
-        description="API documentation for HealthSync",
-        contact=openapi.Contact(email="usjidn@gmail.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-    # Security definition for Bearer token
-    authentication_classes=[],  # Optional, if your API has specific authentication
-)
-
-# Security scheme for Bearer token
-schema_view = get_schema_view(
-    openapi.Info(
-        title="HealthSync API",
-
-         
-        default_version='v1',
-        description="API documentation for HealthSync",
-        contact=openapi.Contact(email="usjidn@gmail.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from django.contrib import admin
+from django.urls import path, include, re_path
 
-# Update the urlpatterns to include swagger with security settings
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include("accounts.urls")),
-    path('__debug__/', include(debug_toolbar.urls)),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),  # Swagger UI
 ]
 
+# Development-only apps are left out of the production settings
+if apps.is_installed('debug_toolbar'):
+    import debug_toolbar
+
+    urlpatterns.append(path('__debug__/', include(debug_toolbar.urls)))
+
+if settings.API_DOCS_ENABLED:
+    from .api_docs import openapi_schema_view, swagger_ui_view
+
+    # Serves the schema prebuilt by 'manage.py build_openapi_schema'
+    urlpatterns += [
+        path('swagger/', swagger_ui_view, name='schema-swagger-ui'),
+        re_path(r'^swagger/schema\.(?P<fmt>json|yaml)$', openapi_schema_view, name='openapi-schema'),
+    ]
+
 admin.site.site_header = "CuraPulse"
 admin.site.site_title = "CuraPulse Admin Portal"    
 admin.site.index_title = "CuraPulse Admin Portal"